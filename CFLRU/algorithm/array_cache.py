@@ -0,0 +1,112 @@
+"""
+Array-backed 的 cache 結構
+
+page_id 需先經過 trace_format 的 dense 重新編號 (0..M-1)，節點直接以 page_id 當 index:
+    - 雙向鏈結串列的 prev / next 存在 array('i') (每頁 4 + 4 bytes)
+    - state / dirty 各用一個 bytearray (每頁 1 byte)
+不需要 dict entry 與 Page 物件，每頁記憶體從數百 bytes 降到數十 bytes。
+"""
+from array import array
+
+
+class PageTable:
+    """
+    以 dense page_id 為 index 的 per-page 欄位
+    :param num_pages: 預先配置的頁數 (page_id 超過時自動擴充)
+    :param links: 需要幾組 prev/next (一個 page 同時只能屬於同一組 links 中的一條串列)
+    """
+    def __init__(self, num_pages=0, links=1):
+        self.links = [(array('i'), array('i')) for _ in range(links)]
+        self.state = bytearray()  # 0 = 不在 cache，其餘由演算法自訂 (例如屬於哪一段串列)
+        self.dirty = bytearray()  # 1 = Dirty Page
+        self.grow(num_pages)
+
+    def __len__(self):
+        return len(self.state)
+
+    def grow(self, num_pages):
+        """擴充到至少 num_pages 頁 (每次至少翻倍，攤銷 O(1))"""
+        size = len(self.state)
+        if num_pages <= size:
+            return
+        extra = max(num_pages, 2 * size) - size
+        for prev, nxt in self.links:
+            prev.extend(array('i', [-1]) * extra)
+            nxt.extend(array('i', [-1]) * extra)
+        self.state.extend(bytes(extra))
+        self.dirty.extend(bytes(extra))
+
+
+class IndexList:
+    """
+    index-based 雙向鏈結串列，節點 i 的前後節點存在共用的 prev[i] / next[i]。
+    head 為 LRU 端 (最舊)，tail 為 MRU 端 (最新)，-1 代表沒有節點。
+    """
+    __slots__ = ("prev", "next", "head", "tail", "size")
+
+    def __init__(self, prev, nxt):
+        self.prev = prev
+        self.next = nxt
+        self.head = -1
+        self.tail = -1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """LRU -> MRU 依序產生 index"""
+        i = self.head
+        while i != -1:
+            yield i
+            i = self.next[i]
+
+    def push_back(self, i):
+        tail = self.tail
+        self.prev[i] = tail
+        self.next[i] = -1
+        if tail == -1:
+            self.head = i
+        else:
+            self.next[tail] = i
+        self.tail = i
+        self.size += 1
+
+    def push_front(self, i):
+        head = self.head
+        self.prev[i] = -1
+        self.next[i] = head
+        if head == -1:
+            self.tail = i
+        else:
+            self.prev[head] = i
+        self.head = i
+        self.size += 1
+
+    def remove(self, i):
+        p = self.prev[i]
+        n = self.next[i]
+        if p == -1:
+            self.head = n
+        else:
+            self.next[p] = n
+        if n == -1:
+            self.tail = p
+        else:
+            self.prev[n] = p
+        self.size -= 1
+
+    def pop_front(self):
+        i = self.head
+        self.remove(i)
+        return i
+
+    def pop_back(self):
+        i = self.tail
+        self.remove(i)
+        return i
+
+    def move_to_back(self, i):
+        if self.tail != i:
+            self.remove(i)
+            self.push_back(i)
@@ -1,17 +1,45 @@
-from collections import OrderedDict, defaultdict, deque
-import math
+from collections import OrderedDict
+from array import array
+import heapq
 
-class Page:
-    """代表一個記憶體頁面"""
-    def __init__(self, page_id, is_dirty=False):
-        self.page_id = page_id
-        self.is_dirty = is_dirty
+import numpy as np
 
-    def __repr__(self):
-        return f"Page({self.page_id}, Dirty={self.is_dirty})"
+from algorithm.spec import (Page, ReplacementAlgorithm, BatchResult, HIT, MISS, MISS_DIRTY_EVICT,
+                            pack_pages, unpack_pages)
 
 
-class BeladyMINAlgorithm:
+def build_next_use(trace):
+    """
+    由後往前掃一次 trace，建立 next_use 陣列:
+        next_use[i] = page trace[i] 下一次出現的位置，不再出現則為 len(trace)
+    用 array 存放 (每筆 4 或 8 bytes)，不保留每個 index 的 Python int 物件。
+    """
+    n = len(trace)
+    typecode = 'i' if n < 2**31 - 1 else 'q'
+
+    # trace_format.Trace 有 page_ids 欄位: 用 stable argsort 向量化計算
+    page_ids = getattr(trace, 'page_ids', None)
+    if page_ids is not None:
+        order = np.argsort(page_ids, kind='stable')
+        sorted_ids = page_ids[order]
+        same = sorted_ids[1:] == sorted_ids[:-1]
+        next_np = np.full(n, n, dtype=np.int32 if typecode == 'i' else np.int64)
+        next_np[order[:-1][same]] = order[1:][same]
+        next_use = array(typecode)
+        next_use.frombytes(next_np.tobytes())
+        return next_use
+
+    next_use = array(typecode, [n]) * n
+
+    last_seen = {}  # page_id -> 目前看到 (最靠前) 的位置
+    for idx in range(n - 1, -1, -1):
+        pid = trace[idx][0]
+        next_use[idx] = last_seen.get(pid, n)
+        last_seen[pid] = idx
+    return next_use
+
+
+class BeladyMINAlgorithm(ReplacementAlgorithm):
     """
     Belady's MIN / OPT
     介面完全比照 LRU:
@@ -22,6 +50,9 @@ class BeladyMINAlgorithm:
     Framework 只要在跑之前做:
         algo.trace = trace
     第一次 access_page 會自動 preprocess。
+
+    受害者用 max-heap (next use 最晚者優先) 挑選，Hit 時直接推入新的 entry，
+    舊 entry 留在 heap 裡，pop 到時再檢查是否過期 (lazy invalidation)。
     """
     def __init__(self, capacity):
         self.capacity = capacity
@@ -30,8 +61,15 @@ class BeladyMINAlgorithm:
         # 由 framework 塞進來的完整 trace
         self.trace = None
 
-        # positions[page_id] = deque([future_index1, future_index2, ...])
-        self.positions = defaultdict(deque)
+        # next_use[i] = 第 i 次 access 的 page 下一次被使用的位置 (len(trace) 代表不再使用)
+        self.next_use = None
+        self._never = 0
+
+        # heap entry: (-next_use, 載入時間, page_id)
+        # next use 相同 (都不再使用) 時，先載入的先踢，與逐一掃描 cache_map 的結果一致
+        self._heap = []
+        self._next_of = {}    # page_id -> 目前有效的 next use
+        self._loaded_at = {}  # page_id -> 載入 cache 的時間點
 
         self.t = 0
         self._built = False
@@ -39,31 +77,49 @@ class BeladyMINAlgorithm:
     def get_name(self):
         return "Belady MIN (OPT)"
 
-    def _build_positions(self):
-        """根據 self.trace 建未來位置表（只做一次）"""
+    def _build_next_use(self):
+        """根據 self.trace 建 next_use 陣列（只做一次）"""
         if self.trace is None:
             raise RuntimeError(
                 "BeladyMINAlgorithm requires full future trace.\n"
                 "Please set algo.trace = trace in framework before simulation."
             )
 
-        self.positions.clear()
-        for idx, (pid, _) in enumerate(self.trace):
-            self.positions[pid].append(idx)
+        self.next_use = build_next_use(self.trace)
+        self._never = len(self.next_use)
 
-        self.t = 0
+        # t 不歸零: 從 checkpoint 還原時 t 已經是中斷的位置
         self._built = True
 
-    def _consume_now(self, page_id):
-        """把現在這次出現的位置從佇列移掉"""
-        dq = self.positions[page_id]
-        if dq and dq[0] == self.t:
-            dq.popleft()
-
-    def _next_use(self, page_id):
-        """回傳下一次使用時間點，若不再使用則 inf"""
-        dq = self.positions[page_id]
-        return dq[0] if dq else math.inf
+    def _push(self, page_id, next_use):
+        """更新 page 的 next use 並推入 heap；過期 entry 太多時重建 heap"""
+        self._next_of[page_id] = next_use
+        heap = self._heap
+        heapq.heappush(heap, (-next_use, self._loaded_at[page_id], page_id))
+
+        if len(heap) > 2 * self.capacity + 64:
+            if self.stats is not None:
+                self.stats.count("heap.rebuild")
+                self.stats.count("heap.rebuild_dropped", len(heap) - len(self._next_of))
+            heap[:] = [(-nu, self._loaded_at[pid], pid) for pid, nu in self._next_of.items()]
+            heapq.heapify(heap)
+
+    def _pop_victim(self):
+        """取出 next use 最晚的 page_id，跳過已過期的 entry"""
+        heap = self._heap
+        next_of = self._next_of
+        popped = 0
+        while True:
+            neg_nu, _, pid = heapq.heappop(heap)
+            popped += 1
+            if next_of.get(pid) == -neg_nu:
+                del next_of[pid]
+                del self._loaded_at[pid]
+                if self.stats is not None:
+                    # 每次踢人實際 pop 了幾個 entry (1 + 過期 entry 數)
+                    self.stats.observe("heap.pops_per_eviction", popped)
+                    self.stats.observe("heap.size", len(heap))
+                return pid
 
     def access_page(self, page_id, is_write):
         """
@@ -71,13 +127,14 @@ class BeladyMINAlgorithm:
         輸出: (is_hit, victim_page)
         """
         if not self._built:
-            self._build_positions()
+            self._build_next_use()
 
         victim = None
         is_hit = False
 
-        # 先消耗掉現在這次 access 的位置
-        self._consume_now(page_id)
+        # 這次 access 之後，此 page 的下一次使用時間
+        t = self.t
+        nu = self.next_use[t] if t < self._never else self._never
 
         # --- Case 1: Hit ---
         if page_id in self.cache_map:
@@ -92,19 +149,97 @@ class BeladyMINAlgorithm:
 
             if len(self.cache_map) >= self.capacity:
                 # 受害者 = next use 最晚(或不再使用)
-                victim_id = None
-                farthest = -1
-
-                for pid_in_cache in self.cache_map.keys():
-                    nu = self._next_use(pid_in_cache)
-                    if nu > farthest:
-                        farthest = nu
-                        victim_id = pid_in_cache
-
+                victim_id = self._pop_victim()
                 victim = self.cache_map.pop(victim_id)
 
             new_page = Page(page_id, is_dirty=is_write)
             self.cache_map[page_id] = new_page
+            self._loaded_at[page_id] = t
+
+        self._push(page_id, nu)
 
         self.t += 1
         return is_hit, victim
+
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        """
+        批次版 access_page，結果與逐筆呼叫完全相同。
+        Miss 時重複使用被踢掉的 Page 物件，不另外配置。
+        """
+        if not self._built:
+            self._build_next_use()
+
+        cache_map = self.cache_map
+        next_use = self.next_use
+        never = self._never
+        capacity = self.capacity
+        loaded_at = self._loaded_at
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+
+        t = self.t
+        for i, page_id in enumerate(page_ids):
+            is_write = is_writes[i]
+            nu = next_use[t] if t < never else never
+
+            page = cache_map.get(page_id)
+            if page is not None:
+                hits += 1
+                if is_write:
+                    page.is_dirty = True
+                code = HIT
+            else:
+                misses += 1
+                code = MISS
+                if len(cache_map) >= capacity:
+                    page = cache_map.pop(self._pop_victim())
+                    if page.is_dirty:
+                        dirty_evictions += 1
+                        code = MISS_DIRTY_EVICT
+                    page.page_id = page_id
+                    page.is_dirty = is_write
+                else:
+                    page = Page(page_id, is_dirty=is_write)
+                cache_map[page_id] = page
+                loaded_at[page_id] = t
+
+            self._push(page_id, nu)
+            t += 1
+            if results is not None:
+                results[i] = code
+
+        self.t = t
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def access_run(self, page_id, count, is_write):
+        """
+        連續 count 次存取同一個 page: 第一次照常處理，之後都是 Hit，
+        t 直接前進 count，page 的 next use 改成 run 最後一次存取的 next use
+        (中間的 heap entry 推入後也會立刻過期，省略不影響踢人順序)
+        """
+        result = self.access_page(page_id, is_write)
+        if count > 1:
+            self.t += count - 1
+            last = self.t - 1
+            self._push(page_id, self.next_use[last] if last < self._never else self._never)
+        return result
+
+    def get_state(self):
+        """next_use 可由 trace 重建，不需保存；heap 只保存每個 page 目前有效的 entry"""
+        pids = list(self.cache_map)
+        return {
+            "t": self.t,
+            "pages": pack_pages((pid, self.cache_map[pid].is_dirty) for pid in pids),
+            "next_of": array('q', (self._next_of[pid] for pid in pids)),
+            "loaded_at": array('q', (self._loaded_at[pid] for pid in pids)),
+        }
+
+    def set_state(self, state):
+        self.t = state["t"]
+        self.cache_map = OrderedDict((pid, Page(pid, d)) for pid, d in unpack_pages(state["pages"]))
+        pids = list(self.cache_map)
+        self._next_of = dict(zip(pids, state["next_of"]))
+        self._loaded_at = dict(zip(pids, state["loaded_at"]))
+        # 去掉過期 entry 後重建 heap，pop 的順序與原本相同
+        self._heap = [(-self._next_of[pid], self._loaded_at[pid], pid) for pid in pids]
+        heapq.heapify(self._heap)
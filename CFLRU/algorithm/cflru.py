@@ -1,32 +1,33 @@
 import collections
 
+from algorithm.spec import (Page, ReplacementAlgorithm, BatchResult, HIT, MISS, MISS_DIRTY_EVICT,
+                            pack_pages, unpack_pages)
+from algorithm.array_cache import PageTable, IndexList
+
 # ==========================================
 # CFLRU 演算法實作 (符合 Framework 介面)
 # ==========================================
 
-class Page:
-    """基本頁面物件"""
-    def __init__(self, page_id, is_dirty=False):
-        self.page_id = page_id
-        self.is_dirty = is_dirty
-
-    def __repr__(self):
-        return f"Page({self.page_id}, D={self.is_dirty})"
+class CleanFirstWindowMixin:
+    """
+    Clean-First Window 的大小與 dynamic 模式的 Hill Climbing 調整 (CFLRUAlgorithm / ClockCFLRUAlgorithm 共用)
+    子類別負責在 Miss 時累計 period_reads、踢掉 Dirty Page 時累計 period_writes，並每 dynamic_period 次
+    access 呼叫 adjust_window；視窗大小改變後需要搬動資料結構的子類別覆寫 _window_resized。
+    """
+    # checkpoint 時需要保存的視窗調整狀態
+    TUNING_FIELDS = ("window_size", "op_count", "prev_period_cost", "window_direction",
+                     "period_reads", "period_writes")
 
-class CFLRUAlgorithm:
-    def __init__(self, capacity, window_size_ratio=0.25, mode='dynamic', dynamic_period=1000):
-        self.capacity = capacity
-        # OrderedDict: 右邊是 MRU (最新)，左邊是 LRU (最舊)
-        self.cache = collections.OrderedDict() 
-        
-        # CFLRU 特有參數
+    def _init_window(self, capacity, window_size_ratio, mode, dynamic_period, write_cost):
         self.mode = mode # 'static' or 'dynamic'
         # 初始視窗大小 (依據論文建議，約為 Cache 的 1/4 或 1/2)
         self.window_size = int(capacity * window_size_ratio)
-        
+
         # --- Dynamic 調整專用參數 (僅供內部演算法調整視窗使用) ---
         # 注意：這些不是給 Framework 計分用的，是給演算法自己「爬山」用的
         self.dynamic_period = dynamic_period
+        # 週期成本中一次 Dirty Eviction (Flash Write) 相對於一次 Read 的權重
+        self.write_cost = write_cost
         self.op_count = 0
         self.prev_period_cost = float('inf')
         self.window_direction = 1 
@@ -34,43 +35,135 @@ class CFLRUAlgorithm:
         self.period_reads = 0
         self.period_writes = 0
 
-    def get_name(self):
-        return f"CFLRU-{self.mode.capitalize()}"
-
     def get_current_window_size(self):
         return max(0, min(self.capacity, self.window_size))
 
+    def _window_move(self, current_cost):
+        """這個週期 window_size 要移動的量 (預設為盲目爬山)"""
+        # 如果成本變高了，代表上次調整方向錯誤，反轉方向
+        if current_cost > self.prev_period_cost:
+            self.window_direction *= -1
+            if self.stats is not None:
+                self.stats.count("adjust.reverse")
+        return self.window_direction * self.window_step
+
+    def _window_resized(self):
+        """window_size 改變之後呼叫 (預設不需要做任何事)"""
+
+    def adjust_window(self):
+        """
+        動態調整視窗大小 (Hill Climbing 演算法)
+        """
+        # 計算本週期成本 (Cost = Read + write_cost * Write，預設 write_cost = 8)
+        current_cost = self.period_reads + self.write_cost * self.period_writes
+
+        # 應用調整
+        self.window_size += self._window_move(current_cost)
+        
+        # 邊界檢查
+        self.window_size = max(0, min(self.capacity, self.window_size))
+        self._window_resized()
+
+        if self.stats is not None:
+            self.stats.record("window_size", self.window_size)
+            self.stats.record("period_cost", current_cost)
+        
+        # 重置週期數據
+        self.prev_period_cost = current_cost
+        self.period_reads = 0
+        self.period_writes = 0
+
+    def _tuning_state(self):
+        return {name: getattr(self, name) for name in self.TUNING_FIELDS}
+
+    def _set_tuning_state(self, state):
+        for name in self.TUNING_FIELDS:
+            setattr(self, name, state[name])
+
+
+class CFLRUAlgorithm(CleanFirstWindowMixin, ReplacementAlgorithm):
+    def __init__(self, capacity, window_size_ratio=0.25, mode='dynamic', dynamic_period=1000, write_cost=8,
+                 tuner='hill', ghost_pages=256):
+        """
+        :param tuner: dynamic 模式的視窗調整方式
+            'hill'  : 盲目爬山，每個週期移動 window_step，成本變高就反轉方向
+            'ghost' : 用 GhostWindows 同時估計 W - step / W / W + step 的成本，直接跳到最好的
+        :param ghost_pages: ghost 模式下每個影子 cache 的容量上限 (記憶體上限)；
+                            取樣率另有 GHOST_MAX_RATE 上限，執行成本見 GhostWindows
+        """
+        self.capacity = capacity
+        # LRU List 切成兩段 OrderedDict，右邊是 MRU (最新)，左邊是 LRU (最舊)
+        # 整體順序 = window + main，window 固定是 LRU 端的前 window_size 頁
+        self.window = collections.OrderedDict()
+        self.main = collections.OrderedDict()
+        # window 內的 Clean Page (與 window 同樣的 LRU 順序)，踢人時直接取最左邊
+        self.window_clean = collections.OrderedDict()
+        
+        # CFLRU 特有參數 (視窗大小與 dynamic 調整)
+        self._init_window(capacity, window_size_ratio, mode, dynamic_period, write_cost)
+
+        if tuner not in ('hill', 'ghost'):
+            raise ValueError(f"unknown tuner: {tuner}")
+        self.tuner = tuner
+        self.ghost = None
+        if mode == 'dynamic' and tuner == 'ghost':
+            self.ghost = GhostWindows(capacity, self.window_size, self.window_step, write_cost, ghost_pages)
+
+    def get_name(self):
+        name = f"CFLRU-{self.mode.capitalize()}"
+        return name + "-Ghost" if self.ghost is not None else name
+
+    @property
+    def cache(self):
+        """完整的 LRU List (LRU -> MRU)，僅供顯示/除錯用，每次呼叫都會複製"""
+        merged = collections.OrderedDict(self.window)
+        merged.update(self.main)
+        return merged
+
     def access_page(self, page_id, is_write):
         """
         Framework 呼叫此函式。
         回傳: (is_hit, victim_page)
         """
         self.op_count += 1
+        if self.ghost is not None:
+            self.ghost.access(page_id, is_write)
         
         is_hit = False
         victim = None
         
         # 1. Check Hit/Miss
-        if page_id in self.cache:
-            # === HIT ===
+        page = self.main.get(page_id)
+        if page is not None:
+            # === HIT (在 window 外) ===
             is_hit = True
-            page = self.cache.pop(page_id)
             if is_write:
                 page.is_dirty = True
-            self.cache[page_id] = page # Move to MRU
+            self.main.move_to_end(page_id) # Move to MRU
         else:
-            # === MISS ===
-            is_hit = False
-            # 內部計數，供動態調整參考
-            self.period_reads += 1 
-            
-            # 檢查容量
-            if len(self.cache) >= self.capacity:
-                victim = self.evict() # 呼叫踢人邏輯
-            
-            # 建立新頁面並加入 MRU
-            new_page = Page(page_id, is_dirty=is_write)
-            self.cache[page_id] = new_page
+            page = self.window.pop(page_id, None)
+            if page is not None:
+                # === HIT (在 window 內) ===
+                is_hit = True
+                self.window_clean.pop(page_id, None)
+                if is_write:
+                    page.is_dirty = True
+                self.main[page_id] = page # Move to MRU
+            else:
+                # === MISS ===
+                is_hit = False
+                # 內部計數，供動態調整參考
+                self.period_reads += 1 
+                
+                # 檢查容量
+                if len(self.window) + len(self.main) >= self.capacity:
+                    victim = self.evict() # 呼叫踢人邏輯
+                
+                # 建立新頁面並加入 MRU
+                new_page = Page(page_id, is_dirty=is_write)
+                self.main[page_id] = new_page
+            # window 少了一頁或 cache 多了一頁，移動 window 邊界
+            self._rebalance()
 
         # 2. Dynamic Adjustment (如果是 dynamic 模式，每隔一段時間調整一次)
         if self.mode == 'dynamic' and self.op_count % self.dynamic_period == 0:
@@ -79,31 +172,210 @@ class CFLRUAlgorithm:
         # 3. 回傳結果給 Framework
         return is_hit, victim
 
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        """
+        批次版 access_page，結果 (含 op_count 觸發的 adjust_window) 與逐筆呼叫完全相同。
+        Miss 時重複使用被踢掉的 Page 物件，不另外配置。
+        """
+        window = self.window
+        main = self.main
+        window_clean = self.window_clean
+        capacity = self.capacity
+        dynamic = self.mode == 'dynamic'
+        period = self.dynamic_period
+        ghost = self.ghost
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+
+        for i, page_id in enumerate(page_ids):
+            is_write = is_writes[i]
+            self.op_count += 1
+            if ghost is not None:
+                ghost.access(page_id, is_write)
+
+            page = main.get(page_id)
+            if page is not None:
+                hits += 1
+                if is_write:
+                    page.is_dirty = True
+                main.move_to_end(page_id)
+                code = HIT
+            else:
+                page = window.pop(page_id, None)
+                if page is not None:
+                    hits += 1
+                    window_clean.pop(page_id, None)
+                    if is_write:
+                        page.is_dirty = True
+                    main[page_id] = page
+                    code = HIT
+                else:
+                    misses += 1
+                    code = MISS
+                    self.period_reads += 1
+                    if len(window) + len(main) >= capacity:
+                        page = self.evict()
+                        if page.is_dirty:
+                            dirty_evictions += 1
+                            code = MISS_DIRTY_EVICT
+                        page.page_id = page_id
+                        page.is_dirty = is_write
+                    else:
+                        page = Page(page_id, is_dirty=is_write)
+                    main[page_id] = page
+                self._rebalance()
+
+            if dynamic and self.op_count % period == 0:
+                self.adjust_window()
+            if results is not None:
+                results[i] = code
+
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def access_run(self, page_id, count, is_write):
+        """
+        連續 count 次存取同一個 page，結果與逐筆呼叫 access_page 相同。
+        第一次照常處理；之後的存取都是 MRU page 的 Hit，重複幾次結果都一樣，
+        所以在 dynamic_period 的週期邊界切開: 每段只做一次 _touch，再照原本的時間點呼叫 adjust_window。
+        """
+        result = self.access_page(page_id, is_write)
+        remaining = count - 1
+        dynamic = self.mode == 'dynamic'
+        while remaining:
+            step = remaining
+            if dynamic:
+                step = min(step, self.dynamic_period - self.op_count % self.dynamic_period)
+            self.op_count += step
+            if self.ghost is not None:
+                self.ghost.access_run(page_id, step, is_write)
+            self._touch(page_id, is_write)
+            if dynamic and self.op_count % self.dynamic_period == 0:
+                self.adjust_window()
+            remaining -= step
+        return result
+
+    def access_runs(self, page_ids, counts, is_writes):
+        """
+        批次版 access_run，結果與逐筆呼叫完全相同。
+        不會跨過週期邊界的 run 只需處理第一次存取 (之後的 Hit 不改變任何狀態)，直接內嵌；
+        跨過邊界的 run 交給 access_run 切段處理。
+        """
+        window = self.window
+        main = self.main
+        window_clean = self.window_clean
+        capacity = self.capacity
+        dynamic = self.mode == 'dynamic'
+        period = self.dynamic_period
+        ghost = self.ghost
+        hits = misses = dirty_evictions = 0
+
+        for i, page_id in enumerate(page_ids):
+            count = counts[i]
+            is_write = is_writes[i]
+            if dynamic and self.op_count % period + count >= period:
+                is_hit, victim = self.access_run(page_id, count, is_write)
+                hits += count - 1
+                if is_hit:
+                    hits += 1
+                else:
+                    misses += 1
+                    if victim is not None and victim.is_dirty:
+                        dirty_evictions += 1
+                continue
+
+            self.op_count += count
+            hits += count - 1
+            if ghost is not None:
+                ghost.access_run(page_id, count, is_write)
+
+            page = main.get(page_id)
+            if page is not None:
+                hits += 1
+                if is_write:
+                    page.is_dirty = True
+                main.move_to_end(page_id)
+            else:
+                page = window.pop(page_id, None)
+                if page is not None:
+                    hits += 1
+                    window_clean.pop(page_id, None)
+                    if is_write:
+                        page.is_dirty = True
+                    main[page_id] = page
+                else:
+                    misses += 1
+                    self.period_reads += 1
+                    if len(window) + len(main) >= capacity:
+                        page = self.evict()
+                        if page.is_dirty:
+                            dirty_evictions += 1
+                        page.page_id = page_id
+                        page.is_dirty = is_write
+                    else:
+                        page = Page(page_id, is_dirty=is_write)
+                    main[page_id] = page
+                self._rebalance()
+
+        return BatchResult(hits, misses, dirty_evictions, None)
+
+    def _touch(self, page_id, is_write):
+        """已在 cache 中的 page 再被存取一次 (access_page 的 Hit 路徑，不計 op_count)"""
+        page = self.main.get(page_id)
+        if page is not None:
+            if is_write:
+                page.is_dirty = True
+            self.main.move_to_end(page_id)
+        else:
+            page = self.window.pop(page_id)
+            self.window_clean.pop(page_id, None)
+            if is_write:
+                page.is_dirty = True
+            self.main[page_id] = page
+            self._rebalance()
+
+    def _rebalance(self):
+        """
+        移動 window 邊界，讓 window 剛好是 LRU 端的前 window_size 頁。
+        每次 access 最多搬一頁；只有 adjust_window 改變大小時才會搬 window_step 頁。
+        """
+        target = self.get_current_window_size()
+        window = self.window
+        main = self.main
+        
+        # window 不足: 從 main 的 LRU 端補進 window 的 MRU 端
+        while len(window) < target and main:
+            pid, page = main.popitem(last=False)
+            window[pid] = page
+            if not page.is_dirty:
+                self.window_clean[pid] = page
+        
+        # window 過大: 把 window 的 MRU 端還給 main 的 LRU 端
+        while len(window) > target:
+            pid, page = window.popitem()
+            self.window_clean.pop(pid, None)
+            main[pid] = page
+            main.move_to_end(pid, last=False)
+
     def evict(self):
         """
         CFLRU 核心踢人邏輯：
         在 LRU 端 (List 頭部) 的 Window 範圍內，優先找乾淨的踢。
+        window_clean 已依 LRU 順序排好，因此不需要掃描 window，O(1) 即可找到受害者。
         回傳: 被踢掉的 Page 物件
         """
-        window_size = self.get_current_window_size()
-        
-        # 取得 LRU 端的前 window_size 個候選頁面 (OrderedDict keys 回傳順序為 LRU->MRU)
-        candidates = list(self.cache.keys())[:window_size] 
-        
-        victim_id = None
-        
-        # 策略：優先找 Clean Page
-        for pid in candidates:
-            if not self.cache[pid].is_dirty:
-                victim_id = pid
-                break
-        
-        # 如果沒找到 (全髒) 或 Window=0，退化回標準 LRU (踢最舊的)
-        if victim_id is None:
-            victim_id = next(iter(self.cache))
-            
-        # 執行移除
-        victim_page = self.cache.pop(victim_id)
+        if self.stats is not None:
+            self._record_eviction()
+
+        # 策略：優先找 Window 內最舊的 Clean Page
+        if self.window_clean:
+            victim_id, victim_page = self.window_clean.popitem(last=False)
+            del self.window[victim_id]
+        # 如果沒找到 (全髒)，退化回標準 LRU (踢最舊的)
+        elif self.window:
+            victim_id, victim_page = self.window.popitem(last=False)
+        # Window=0 時 window 為空，最舊的頁面在 main 的 LRU 端
+        else:
+            victim_id, victim_page = self.main.popitem(last=False)
         
         # 如果踢掉的是髒頁面，記錄內部成本供動態調整參考
         if victim_page.is_dirty:
@@ -111,24 +383,467 @@ class CFLRUAlgorithm:
             
         return victim_page
 
-    def adjust_window(self):
+    def _record_eviction(self):
         """
-        動態調整視窗大小 (Hill Climbing 演算法)
+        (instrumentation 開啟時) 記錄這次踢人的結果，以及原本逐一掃描 window 的作法要掃幾頁。
+        掃描長度需要走訪 window，只在 instrumentation 開啟時計算。
         """
-        # 計算本週期成本 (Cost = Read + 8 * Write)
-        current_cost = self.period_reads + 8 * self.period_writes
-        
-        # 如果成本變高了，代表上次調整方向錯誤，反轉方向
-        if current_cost > self.prev_period_cost:
-            self.window_direction *= -1
-        
-        # 應用調整
-        self.window_size += (self.window_direction * self.window_step)
-        
-        # 邊界檢查
-        self.window_size = max(0, min(self.capacity, self.window_size))
-        
-        # 重置週期數據
-        self.prev_period_cost = current_cost
-        self.period_reads = 0
-        self.period_writes = 0
\ No newline at end of file
+        if len(self.window_clean):
+            self.stats.count("evict.clean_in_window")
+            victim_id = next(iter(self.window_clean))
+            for scanned, pid in enumerate(self.window, 1):
+                if pid == victim_id:
+                    break
+        elif len(self.window):
+            self.stats.count("evict.fallback_lru")
+            scanned = len(self.window)
+        else:
+            self.stats.count("evict.empty_window")
+            scanned = 0
+        self.stats.observe("evict.window_scan_length", scanned)
+
+    def _window_move(self, current_cost):
+        if self.ghost is None:
+            return super()._window_move(current_cost)
+        # Ghost: 直接採用影子 cache 中成本最低的視窗大小
+        choice = self.ghost.best_choice()
+        if self.stats is not None:
+            self.stats.count(("adjust.shrink", "adjust.stay", "adjust.grow")[choice + 1])
+        return choice * self.window_step
+
+    def _window_resized(self):
+        self._rebalance()
+        if self.ghost is not None:
+            self.ghost.recenter(self.window_size)
+
+    def get_state(self):
+        state = self._tuning_state()
+        state["window"] = pack_pages(self._export_segment(self.window))
+        state["main"] = pack_pages(self._export_segment(self.main))
+        if self.ghost is not None:
+            state["ghost"] = self.ghost.get_state()
+        return state
+
+    def set_state(self, state):
+        self._set_tuning_state(state)
+        self._import_segments(unpack_pages(state["window"]), unpack_pages(state["main"]))
+        if self.ghost is not None:
+            self.ghost.set_state(state["ghost"])
+
+    def _export_segment(self, segment):
+        """依 LRU -> MRU 順序產生 (page_id, is_dirty)"""
+        return ((pid, page.is_dirty) for pid, page in segment.items())
+
+    def _import_segments(self, window_pages, main_pages):
+        self.window = collections.OrderedDict((pid, Page(pid, d)) for pid, d in window_pages)
+        self.main = collections.OrderedDict((pid, Page(pid, d)) for pid, d in main_pages)
+        self.window_clean = collections.OrderedDict(
+            (pid, page) for pid, page in self.window.items() if not page.is_dirty)
+
+
+class ClusteredCFLRUAlgorithm(CFLRUAlgorithm):
+    """
+    以 erase block 為單位寫回的 CFLRU: 置換邏輯與 CFLRUAlgorithm 相同，
+    但 Dirty Page 被踢掉時，同一個 block (page_id // pages_per_block) 中其他還在 cache 的 Dirty Page
+    也一起寫回 (一次 write op)，這些 page 留在原本的位置、變成 Clean Page。
+    之後需要空間時它們可以直接踢掉，不必再各自寫一次 Flash。
+
+    每次寫回的 page 數依序記錄下來，Framework 以 pop_flush_sizes() 取出並用 block-aware 成本模型計分
+    (見 simulate_framework.BlockCostModel)。
+    批次介面逐筆走 access_page (不使用父類別內嵌的 Hit 路徑)。
+    """
+    access_batch = ReplacementAlgorithm.access_batch
+    access_runs = ReplacementAlgorithm.access_runs
+
+    def __init__(self, capacity, window_size_ratio=0.25, mode='dynamic', dynamic_period=1000, write_cost=8,
+                 tuner='hill', ghost_pages=256, pages_per_block=64):
+        """
+        :param pages_per_block: 每個 erase block 的 page 數，page_id // pages_per_block 相同的 page 一起寫回
+        """
+        super().__init__(capacity, window_size_ratio, mode, dynamic_period, write_cost, tuner, ghost_pages)
+        if pages_per_block < 1:
+            raise ValueError(f"pages_per_block must be at least 1, got {pages_per_block}")
+        self.pages_per_block = pages_per_block
+        # block -> cache 中屬於這個 block 的 Dirty Page
+        self.dirty_by_block = {}
+        # page_id -> 最後一次被存取的 op_count。LRU List 的順序就是存取順序，
+        # 寫回後變成 Clean 的 window page 依此排序再放進 window_clean
+        self._stamp = {}
+        self._flush_sizes = []
+
+    def get_name(self):
+        return f"{super().get_name()}-Clustered{self.pages_per_block}"
+
+    def access_page(self, page_id, is_write):
+        self._stamp[page_id] = self.op_count + 1
+        result = super().access_page(page_id, is_write)
+        if is_write:
+            block = self.dirty_by_block.get(page_id // self.pages_per_block)
+            if block is None:
+                self.dirty_by_block[page_id // self.pages_per_block] = {page_id}
+            else:
+                block.add(page_id)
+        return result
+
+    def evict(self):
+        victim = super().evict()
+        del self._stamp[victim.page_id]
+        if victim.is_dirty:
+            block = self.dirty_by_block.pop(victim.page_id // self.pages_per_block)
+            block.discard(victim.page_id)
+            self._flush(block)
+            self._flush_sizes.append(1 + len(block))
+            if self.stats is not None:
+                self.stats.observe("flush.pages", 1 + len(block))
+        return victim
+
+    def _flush(self, page_ids):
+        """
+        把 page_ids (同一個 block 的 Dirty Page) 就地寫回變成 Clean。
+        只有 window_clean 是空的時候才會踢 Dirty Page，所以 window 中寫回的 page 依存取順序排好後
+        直接放進 window_clean，順序仍與 window 一致
+        """
+        window = self.window
+        in_window = []
+        for pid in page_ids:
+            page = window.get(pid)
+            if page is None:
+                page = self.main[pid]
+            else:
+                in_window.append(pid)
+            page.is_dirty = False
+        in_window.sort(key=self._stamp.__getitem__)
+        for pid in in_window:
+            self.window_clean[pid] = window[pid]
+
+    def pop_flush_sizes(self):
+        """取出上次呼叫之後每次寫回的 page 數 (每個 Dirty Eviction 一筆，依發生順序)"""
+        sizes = self._flush_sizes
+        self._flush_sizes = []
+        return sizes
+
+    def _import_segments(self, window_pages, main_pages):
+        super()._import_segments(window_pages, main_pages)
+        # 依 LRU -> MRU 順序重新編號 (都小於之後的 op_count)，並重建 dirty_by_block
+        pages = list(self.window.values()) + list(self.main.values())
+        self._stamp = {page.page_id: self.op_count - len(pages) + i for i, page in enumerate(pages)}
+        self.dirty_by_block = {}
+        for page in pages:
+            if page.is_dirty:
+                self.dirty_by_block.setdefault(page.page_id // self.pages_per_block, set()).add(page.page_id)
+        self._flush_sizes = []
+
+
+_HASH_MULT = 0x9E3779B97F4A7C15  # Fibonacci hashing
+_HASH_MASK = (1 << 64) - 1
+_HASH_BITS = 24
+# Ghost 影子 cache 的取樣率上限: 容量小於 ghost_pages 時也只重播這個比例的 page，
+# 三個影子的更新成本最多約為主 cache 的 3 * GHOST_MAX_RATE 倍
+GHOST_MAX_RATE = 1 / 16
+# 影子 cache 至少保留的 page 數 (太小時視窗只剩 0 / 1 兩種，估計沒有意義)，極小的 cache 因此取樣率較高
+GHOST_MIN_PAGES = 8
+
+
+class GhostWindows:
+    """
+    Ghost 視窗調整用的影子 cache: 三個 static CFLRU，視窗分別為 W - step / W / W + step。
+    只保留 hash 落在取樣範圍內的 page (SHARDS 的 spatial sampling，見 sampling.py)，
+    影子 cache 容量 = capacity * rate，rate = min(max_rate, ghost_pages / capacity)
+    (但影子至少保留 GHOST_MIN_PAGES 個 page)。
+    成本: 每次 access 都要算一次 hash，只有被取樣的 page (比例 rate) 才更新三個影子 cache，
+    預設 max_rate = 1/16 時額外的工作約為主 cache 的 3/16；容量小於 8 * 16 個 page 時取樣率較高，
+    最多三倍 (rate = 1)。另外 ghost 模式的批次介面不能走只有 Hit 的快速路徑，
+    整體通常比 hill climbing 慢約 1.5 - 2 倍。
+    每個影子的成本以 decay 做指數平均，避免取樣後單一週期的雜訊讓視窗來回跳動。
+    """
+    def __init__(self, capacity, window_size, window_step, write_cost=8, ghost_pages=256, decay=0.5,
+                 max_rate=GHOST_MAX_RATE):
+        """
+        :param ghost_pages: 影子 cache 的容量上限 (大 cache 時決定取樣率)
+        :param max_rate: 取樣率上限 (小 cache 時決定取樣率)
+        """
+        if capacity > 0:
+            rate = min(max_rate, ghost_pages / capacity)
+            self.rate = min(1.0, max(rate, GHOST_MIN_PAGES / capacity))
+        else:
+            self.rate = 1.0
+        self.threshold = int(self.rate * (1 << _HASH_BITS))
+        self.write_cost = write_cost
+        self.decay = decay
+        shadow_capacity = max(1, round(capacity * self.rate))
+        self.step = max(1, round(window_step * self.rate))
+        self.shadows = [CFLRUAlgorithm(shadow_capacity, 0, mode='static') for _ in range(3)]
+        self.scores = [0.0, 0.0, 0.0]
+        self.center = None
+        self.recenter(window_size)
+
+    def access(self, page_id, is_write):
+        if self.rate < 1.0 and ((page_id * _HASH_MULT) & _HASH_MASK) >> (64 - _HASH_BITS) >= self.threshold:
+            return
+        for shadow in self.shadows:
+            shadow.access_page(page_id, is_write)
+
+    def access_run(self, page_id, count, is_write):
+        if self.rate < 1.0 and ((page_id * _HASH_MULT) & _HASH_MASK) >> (64 - _HASH_BITS) >= self.threshold:
+            return
+        for shadow in self.shadows:
+            shadow.access_run(page_id, count, is_write)
+
+    def best_choice(self):
+        """
+        把本週期成本累計進 scores，回傳成本最低的影子:
+        -1 (縮小) / 0 (不變) / +1 (放大)，平手時不變
+        """
+        scores = self.scores
+        for i, shadow in enumerate(self.shadows):
+            scores[i] = self.decay * scores[i] + shadow.period_reads + self.write_cost * shadow.period_writes
+            shadow.period_reads = 0
+            shadow.period_writes = 0
+        best = 1
+        for i in (0, 2):
+            if scores[i] < scores[best]:
+                best = i
+        return best - 1
+
+    def recenter(self, window_size):
+        """
+        以新的 window_size 為中心重新設定三個影子的視窗。
+        中心移動一格時，原本在新中心位置的影子 (與其成本) 直接沿用，只有落到外側的那個影子重新指派。
+        """
+        center = round(window_size * self.rate)
+        if self.center is not None and center != self.center:
+            shadows = self.shadows
+            scores = self.scores
+            if center > self.center:
+                # [S-, S0, S+] -> [S0, S+, S-]，新的外側先沿用 S+ 的成本
+                self.shadows = [shadows[1], shadows[2], shadows[0]]
+                self.scores = [scores[1], scores[2], scores[2]]
+            else:
+                self.shadows = [shadows[2], shadows[0], shadows[1]]
+                self.scores = [scores[0], scores[0], scores[1]]
+        self.center = center
+        for offset, shadow in zip((-self.step, 0, self.step), self.shadows):
+            shadow.window_size = center + offset
+            shadow._rebalance()
+
+    def get_state(self):
+        return {"scores": list(self.scores), "center": self.center,
+                "shadows": [shadow.get_state() for shadow in self.shadows]}
+
+    def set_state(self, state):
+        self.scores = list(state["scores"])
+        self.center = state["center"]
+        for shadow, shadow_state in zip(self.shadows, state["shadows"]):
+            shadow.set_state(shadow_state)
+
+
+# PageTable.state 的值
+_IN_MAIN = 1
+_IN_WINDOW = 2
+
+class ArrayCFLRUAlgorithm(CFLRUAlgorithm):
+    """
+    Array-backed 的 CFLRU，結果與 CFLRUAlgorithm 相同 (window 調整邏輯直接沿用父類別)。
+    page_id 必須是 dense 編號 (trace_format.load_trace(path, dense=True))。
+    main / window 兩段串列共用第一組 prev/next，window 內的 Clean Page 串列用第二組。
+    """
+    # 讓 Framework 知道要用 dense page_id 載入 trace
+    dense_page_ids = True
+
+    def __init__(self, capacity, window_size_ratio=0.25, mode='dynamic', dynamic_period=1000, write_cost=8,
+                 tuner='hill', ghost_pages=256, num_pages=0):
+        super().__init__(capacity, window_size_ratio, mode, dynamic_period, write_cost, tuner, ghost_pages)
+        self.table = PageTable(num_pages, links=2)
+        (prev, nxt), (clean_prev, clean_next) = self.table.links
+        self.window = IndexList(prev, nxt)
+        self.main = IndexList(prev, nxt)
+        self.window_clean = IndexList(clean_prev, clean_next)
+
+    def get_name(self):
+        return f"{super().get_name()} (Array)"
+
+    @property
+    def cache(self):
+        """完整的 LRU List (LRU -> MRU)，僅供顯示/除錯用"""
+        dirty = self.table.dirty
+        merged = collections.OrderedDict()
+        for segment in (self.window, self.main):
+            for pid in segment:
+                merged[pid] = Page(pid, bool(dirty[pid]))
+        return merged
+
+    def _access(self, page_id, is_write):
+        """
+        回傳 (code, victim_id)，code 為 HIT / MISS / MISS_DIRTY_EVICT，沒有踢人時 victim_id = -1
+        """
+        self.op_count += 1
+        if self.ghost is not None:
+            self.ghost.access(page_id, is_write)
+        table = self.table
+        if page_id >= len(table):
+            table.grow(page_id + 1)
+        state = table.state
+        dirty = table.dirty
+
+        code = HIT
+        victim_id = -1
+        where = state[page_id]
+        if where == _IN_MAIN:
+            # === HIT (在 window 外) ===
+            if is_write:
+                dirty[page_id] = 1
+            self.main.move_to_back(page_id)
+        else:
+            if where == _IN_WINDOW:
+                # === HIT (在 window 內) ===
+                self.window.remove(page_id)
+                if not dirty[page_id]:
+                    self.window_clean.remove(page_id)
+                if is_write:
+                    dirty[page_id] = 1
+            else:
+                # === MISS ===
+                code = MISS
+                self.period_reads += 1
+                if self.window.size + self.main.size >= self.capacity:
+                    victim_id = self._evict_index()
+                    if dirty[victim_id]:
+                        code = MISS_DIRTY_EVICT
+                dirty[page_id] = 1 if is_write else 0
+            self.main.push_back(page_id)
+            state[page_id] = _IN_MAIN
+            self._rebalance()
+
+        if self.mode == 'dynamic' and self.op_count % self.dynamic_period == 0:
+            self.adjust_window()
+        return code, victim_id
+
+    def access_page(self, page_id, is_write):
+        code, victim_id = self._access(page_id, is_write)
+        if code == HIT:
+            return True, None
+        victim = None
+        if victim_id != -1:
+            victim = Page(victim_id, is_dirty=code == MISS_DIRTY_EVICT)
+        return False, victim
+
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+        access = self._access
+        for i, page_id in enumerate(page_ids):
+            code = access(page_id, is_writes[i])[0]
+            if code == HIT:
+                hits += 1
+            else:
+                misses += 1
+                if code == MISS_DIRTY_EVICT:
+                    dirty_evictions += 1
+            if results is not None:
+                results[i] = code
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def access_runs(self, page_ids, counts, is_writes):
+        """同 CFLRUAlgorithm.access_runs；ghost 模式的影子 cache 需要逐 run 更新，一律走 access_run"""
+        hits = misses = dirty_evictions = 0
+        access = self._access
+        dynamic = self.mode == 'dynamic'
+        period = self.dynamic_period
+        simple = self.ghost is None
+        for i, page_id in enumerate(page_ids):
+            count = counts[i]
+            hits += count - 1
+            if simple and not (dynamic and self.op_count % period + count >= period):
+                code = access(page_id, is_writes[i])[0]
+                self.op_count += count - 1
+            else:
+                is_hit, victim = self.access_run(page_id, count, is_writes[i])
+                code = HIT if is_hit else MISS_DIRTY_EVICT if victim is not None and victim.is_dirty else MISS
+            if code == HIT:
+                hits += 1
+            else:
+                misses += 1
+                if code == MISS_DIRTY_EVICT:
+                    dirty_evictions += 1
+        return BatchResult(hits, misses, dirty_evictions, None)
+
+    def _touch(self, page_id, is_write):
+        table = self.table
+        dirty = table.dirty
+        if table.state[page_id] == _IN_MAIN:
+            if is_write:
+                dirty[page_id] = 1
+            self.main.move_to_back(page_id)
+        else:
+            self.window.remove(page_id)
+            if not dirty[page_id]:
+                self.window_clean.remove(page_id)
+            if is_write:
+                dirty[page_id] = 1
+            self.main.push_back(page_id)
+            table.state[page_id] = _IN_MAIN
+            self._rebalance()
+
+    def _rebalance(self):
+        target = self.get_current_window_size()
+        state = self.table.state
+        dirty = self.table.dirty
+        window = self.window
+        main = self.main
+
+        while window.size < target and main.size:
+            pid = main.pop_front()
+            window.push_back(pid)
+            state[pid] = _IN_WINDOW
+            if not dirty[pid]:
+                self.window_clean.push_back(pid)
+
+        while window.size > target:
+            pid = window.pop_back()
+            if not dirty[pid]:
+                self.window_clean.remove(pid)
+            main.push_front(pid)
+            state[pid] = _IN_MAIN
+
+    def _evict_index(self):
+        """與 CFLRUAlgorithm.evict 相同的選擇順序，回傳被踢掉的 page_id"""
+        if self.stats is not None:
+            self._record_eviction()
+
+        if self.window_clean.size:
+            victim_id = self.window_clean.pop_front()
+            self.window.remove(victim_id)
+        elif self.window.size:
+            victim_id = self.window.pop_front()
+        else:
+            victim_id = self.main.pop_front()
+
+        self.table.state[victim_id] = 0
+        if self.table.dirty[victim_id]:
+            self.period_writes += 1
+        return victim_id
+
+    def evict(self):
+        victim_id = self._evict_index()
+        return Page(victim_id, is_dirty=bool(self.table.dirty[victim_id]))
+
+    def _export_segment(self, segment):
+        dirty = self.table.dirty
+        return ((pid, bool(dirty[pid])) for pid in segment)
+
+    def _import_segments(self, window_pages, main_pages):
+        table = PageTable(len(self.table), links=2)
+        (prev, nxt), (clean_prev, clean_next) = table.links
+        self.table = table
+        self.window = IndexList(prev, nxt)
+        self.main = IndexList(prev, nxt)
+        self.window_clean = IndexList(clean_prev, clean_next)
+        for segment, where, pages in ((self.window, _IN_WINDOW, window_pages), (self.main, _IN_MAIN, main_pages)):
+            for pid, is_dirty in pages:
+                if pid >= len(table):
+                    table.grow(pid + 1)
+                segment.push_back(pid)
+                table.state[pid] = where
+                table.dirty[pid] = 1 if is_dirty else 0
+                if where == _IN_WINDOW and not is_dirty:
+                    self.window_clean.push_back(pid)
@@ -0,0 +1,241 @@
+from array import array
+
+from algorithm.spec import Page, ReplacementAlgorithm, BatchResult, HIT, MISS, MISS_DIRTY_EVICT
+from algorithm.cflru import CleanFirstWindowMixin
+
+# ==========================================
+# CLOCK 版 CFLRU (Clean-First CLOCK)
+# ==========================================
+
+class ClockCFLRUAlgorithm(CleanFirstWindowMixin, ReplacementAlgorithm):
+    """
+    用 CLOCK 近似 CFLRU: Hit 只設定 reference bit (與 dirty bit)，不需要搬動任何串列。
+
+    Cache 是一個環狀 array，每個 frame 有 reference bit 與 dirty bit。踢人時指針 (hand) 往前掃:
+        - reference bit = 1 : 清成 0 給第二次機會 (second chance)
+        - 未被 reference 的 Clean Page : 直接踢掉
+        - 未被 reference 的 Dirty Page : 這一圈先略過 (deferred 計數 + 1)，一次掃描最多略過 window_size 個；
+          超過時退化成 CLOCK，直接踢掉 hand 所在的 Dirty Page；
+          已經被略過 max_defer 圈、之間都沒再被 reference 的 Dirty Page 也會被踢
+    新載入的 page reference bit 為 0 (只用一次的 page 第一圈就會被踢)。
+    每次 reference 最多換到 max_defer 次略過，hand 只往前走，均攤每次踢人為 O(max_defer)。
+    window_size 的意義與 CFLRU 的 Clean-First Window 相同 (可容忍的 Dirty Page 數)，
+    dynamic 模式沿用 CFLRU 的 Hill Climbing 調整 (CleanFirstWindowMixin)。
+    """
+    def __init__(self, capacity, window_size_ratio=0.25, mode='dynamic', dynamic_period=1000, write_cost=8,
+                 max_defer=4):
+        """
+        :param max_defer: Dirty Page 每次被 reference 之後最多可以被略過幾圈 (1 ~ 255)，
+                          越大越接近 CFLRU 的 Clean-First 效果，掃描成本也越高
+        """
+        if not 1 <= max_defer <= 255:
+            raise ValueError(f"max_defer must be in [1, 255], got {max_defer}")
+        self.capacity = capacity
+        self.frames = []                  # frame -> page_id
+        self.ref = bytearray(capacity)    # frame -> reference bit
+        self.dirty = bytearray(capacity)  # frame -> dirty bit
+        self.deferred = bytearray(capacity)  # frame -> 上次被 reference 之後被略過的圈數
+        self.slot_of = {}                 # page_id -> frame
+        self.hand = 0
+        self.max_defer = max_defer
+        self._init_window(capacity, window_size_ratio, mode, dynamic_period, write_cost)
+
+    def get_name(self):
+        return f"CLOCK-CFLRU-{self.mode.capitalize()}"
+
+    @property
+    def cache(self):
+        """目前 cache 內容 (從 hand 開始的 CLOCK 順序)，僅供顯示/除錯用"""
+        n = len(self.frames)
+        start = self.hand if self.hand < n else 0
+        order = list(range(start, n)) + list(range(0, start))
+        return {self.frames[i]: Page(self.frames[i], bool(self.dirty[i])) for i in order}
+
+    def _find_victim(self):
+        """從 hand 開始掃描，回傳要踢掉的 frame (hand 只往前走，移到它的下一格)"""
+        ref = self.ref
+        dirty = self.dirty
+        deferred = self.deferred
+        n = self.capacity
+        window = self.get_current_window_size()
+        hand = self.hand
+        skipped = 0
+        scanned = 0
+
+        while True:
+            scanned += 1
+            if ref[hand]:
+                ref[hand] = 0
+                deferred[hand] = 0
+            elif not dirty[hand] or deferred[hand] >= self.max_defer or skipped >= window:
+                victim = hand
+                break
+            else:
+                # 未被 reference 的 Dirty Page: 這一圈先略過
+                deferred[hand] += 1
+                skipped += 1
+            hand += 1
+            if hand == n:
+                hand = 0
+
+        if self.stats is not None:
+            self.stats.count("evict.clean" if not dirty[victim] else "evict.dirty")
+            self.stats.observe("evict.scan_length", scanned)
+
+        self.hand = victim + 1 if victim + 1 < n else 0
+        return victim
+
+    def _access(self, page_id, is_write):
+        """回傳 (code, victim_id)，沒有踢人時 victim_id = -1"""
+        self.op_count += 1
+        code = HIT
+        victim_id = -1
+
+        slot = self.slot_of.get(page_id)
+        if slot is not None:
+            # === HIT: 只設定 bit ===
+            self.ref[slot] = 1
+            if is_write:
+                self.dirty[slot] = 1
+        else:
+            # === MISS ===
+            code = MISS
+            self.period_reads += 1
+            if len(self.frames) < self.capacity:
+                slot = len(self.frames)
+                self.frames.append(page_id)
+            else:
+                slot = self._find_victim()
+                victim_id = self.frames[slot]
+                del self.slot_of[victim_id]
+                if self.dirty[slot]:
+                    code = MISS_DIRTY_EVICT
+                    self.period_writes += 1
+                self.frames[slot] = page_id
+            self.slot_of[page_id] = slot
+            self.ref[slot] = 0
+            self.dirty[slot] = 1 if is_write else 0
+            self.deferred[slot] = 0
+
+        if self.mode == 'dynamic' and self.op_count % self.dynamic_period == 0:
+            self.adjust_window()
+        return code, victim_id
+
+    def access_page(self, page_id, is_write):
+        code, victim_id = self._access(page_id, is_write)
+        if code == HIT:
+            return True, None
+        victim = None
+        if victim_id != -1:
+            victim = Page(victim_id, is_dirty=code == MISS_DIRTY_EVICT)
+        return False, victim
+
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        """批次版 access_page，Hit 的路徑直接內嵌 (只有 dict 查詢與設定 bit)"""
+        slot_of = self.slot_of
+        ref = self.ref
+        dirty = self.dirty
+        access = self._access
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+
+        for i, page_id in enumerate(page_ids):
+            slot = slot_of.get(page_id)
+            if slot is not None and (self.op_count + 1) % self.dynamic_period:
+                # Hit 且不會觸發 adjust_window
+                self.op_count += 1
+                ref[slot] = 1
+                if is_writes[i]:
+                    dirty[slot] = 1
+                hits += 1
+                code = HIT
+            else:
+                code = access(page_id, is_writes[i])[0]
+                if code == HIT:
+                    hits += 1
+                else:
+                    misses += 1
+                    if code == MISS_DIRTY_EVICT:
+                        dirty_evictions += 1
+            if results is not None:
+                results[i] = code
+
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def _access_run(self, page_id, count, is_write):
+        """
+        連續 count 次存取同一個 page，回傳第一次存取的 (code, victim_id)。
+        之後的 count - 1 次 Hit 只會把 reference bit 設成 1，op_count 一次前進，
+        經過幾個週期邊界就呼叫幾次 adjust_window (調整只看週期計數，與 bit 無關)
+        """
+        result = self._access(page_id, is_write)
+        remaining = count - 1
+        if remaining:
+            self.ref[self.slot_of[page_id]] = 1
+            crossed = 0
+            if self.mode == 'dynamic':
+                period = self.dynamic_period
+                crossed = (self.op_count + remaining) // period - self.op_count // period
+            self.op_count += remaining
+            for _ in range(crossed):
+                self.adjust_window()
+        return result
+
+    def access_run(self, page_id, count, is_write):
+        code, victim_id = self._access_run(page_id, count, is_write)
+        if code == HIT:
+            return True, None
+        victim = None
+        if victim_id != -1:
+            victim = Page(victim_id, is_dirty=code == MISS_DIRTY_EVICT)
+        return False, victim
+
+    def access_runs(self, page_ids, counts, is_writes):
+        """批次版 access_run，不會跨過週期邊界的 Hit run 直接內嵌 (同 access_batch)"""
+        slot_of = self.slot_of
+        ref = self.ref
+        dirty = self.dirty
+        period = self.dynamic_period
+        access_run = self._access_run
+        hits = misses = dirty_evictions = 0
+
+        for i, page_id in enumerate(page_ids):
+            count = counts[i]
+            hits += count - 1
+            slot = slot_of.get(page_id)
+            if slot is not None and self.op_count % period + count < period:
+                self.op_count += count
+                ref[slot] = 1
+                if is_writes[i]:
+                    dirty[slot] = 1
+                hits += 1
+                continue
+            code = access_run(page_id, count, is_writes[i])[0]
+            if code == HIT:
+                hits += 1
+            else:
+                misses += 1
+                if code == MISS_DIRTY_EVICT:
+                    dirty_evictions += 1
+
+        return BatchResult(hits, misses, dirty_evictions, None)
+
+    def get_state(self):
+        state = self._tuning_state()
+        state.update({
+            "frames": array('q', self.frames),
+            "ref": bytes(self.ref),
+            "dirty": bytes(self.dirty),
+            "deferred": bytes(self.deferred),
+            "hand": self.hand,
+        })
+        return state
+
+    def set_state(self, state):
+        self.frames = list(state["frames"])
+        self.ref = bytearray(state["ref"])
+        self.dirty = bytearray(state["dirty"])
+        self.deferred = bytearray(state["deferred"])
+        self.slot_of = {pid: slot for slot, pid in enumerate(self.frames)}
+        self.hand = state["hand"]
+        self._set_tuning_state(state)
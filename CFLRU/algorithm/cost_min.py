@@ -0,0 +1,403 @@
+from collections import OrderedDict
+from array import array
+import heapq
+
+import numpy as np
+
+from algorithm.spec import (Page, ReplacementAlgorithm, BatchResult, HIT, MISS, MISS_DIRTY_EVICT,
+                            pack_pages, unpack_pages)
+from algorithm.beladys_min_algo import build_next_use
+
+# flash_cost_lower_bound: (節點數 + 弧數) x 容量不超過這個值時用 min-cost flow 求精確的 relaxation
+EXACT_LIMIT = 5_000_000
+
+
+class CostAwareGreedyAlgorithm(ReplacementAlgorithm):
+    """
+    考慮 dirty bit 的離線 (offline) 貪婪置換: 用未來資訊比較踢 Clean Page 與踢 Dirty Page 的成本。
+
+    踢掉 page p 的成本 cost(p) = (p 之後還會用到 ? read_cost : 0) + (p 是 dirty ? write_cost : 0)，
+    換到的是這個 frame 從現在到 p 的 next use 之間可以給別人用 (不再使用時為到 trace 結束)。
+    每次踢人挑 cost(p) / (next_use(p) - t) 最小的 page (每單位空出時間的成本最低)。
+    同一類 (clean / dirty) 的 page 成本相同，比值最小的就是 next use 最晚的那個，
+    所以只需要兩個以 next use 排序的 max-heap，比較兩邊的 top 即可，每次 access O(log capacity)。
+
+    這只是一個可以實際執行的置換策略 (成本的上界)，不是最佳解，成本也可能比 Belady MIN 或 CFLRU 高；
+    要比較「最好能做到多少」請用 flash_cost_lower_bound。
+
+    與 Belady MIN 相同，需要在模擬之前設定 algo.trace = trace。
+    """
+    def __init__(self, capacity, read_cost=1, write_cost=8):
+        """
+        :param read_cost: 一次 Miss 讀取的成本
+        :param write_cost: 一次 Dirty Page 寫回的成本 (與 simulate_framework 的計分相同為 8)
+        """
+        self.capacity = capacity
+        self.read_cost = read_cost
+        self.write_cost = write_cost
+        self.cache_map = OrderedDict()  # page_id -> Page
+
+        # 由 framework 塞進來的完整 trace
+        self.trace = None
+        self.next_use = None
+        self._never = 0
+
+        # heap entry: (-next_use, 載入時間, page_id)，Clean / Dirty 各一個；
+        # 過期的 entry (next use 已更新，或 Clean Page 被寫入變成 dirty) pop 到時再丟掉
+        self._clean_heap = []
+        self._dirty_heap = []
+        self._next_of = {}    # page_id -> 目前有效的 next use
+        self._loaded_at = {}  # page_id -> 載入 cache 的時間點
+
+        self.t = 0
+        self._built = False
+
+    def get_name(self):
+        return "Cost-Aware Greedy (Offline)"
+
+    def _build_next_use(self):
+        if self.trace is None:
+            raise RuntimeError(
+                "CostAwareGreedyAlgorithm requires full future trace.\n"
+                "Please set algo.trace = trace in framework before simulation."
+            )
+        self.next_use = build_next_use(self.trace)
+        self._never = len(self.next_use)
+        self._built = True
+
+    def _push(self, page_id, next_use, is_dirty):
+        """更新 page 的 next use 並推入對應的 heap；過期 entry 太多時重建兩個 heap"""
+        self._next_of[page_id] = next_use
+        heap = self._dirty_heap if is_dirty else self._clean_heap
+        heapq.heappush(heap, (-next_use, self._loaded_at[page_id], page_id))
+
+        if len(self._clean_heap) + len(self._dirty_heap) > 2 * self.capacity + 64:
+            if self.stats is not None:
+                self.stats.count("heap.rebuild")
+            self._rebuild_heaps()
+
+    def _rebuild_heaps(self):
+        clean = []
+        dirty = []
+        for pid, page in self.cache_map.items():
+            (dirty if page.is_dirty else clean).append((-self._next_of[pid], self._loaded_at[pid], pid))
+        heapq.heapify(clean)
+        heapq.heapify(dirty)
+        self._clean_heap = clean
+        self._dirty_heap = dirty
+
+    def _top(self, heap, is_dirty):
+        """丟掉 heap 頂端過期的 entry，回傳有效的頂端 entry (沒有時回傳 None)"""
+        next_of = self._next_of
+        cache_map = self.cache_map
+        while heap:
+            neg_nu, _, pid = entry = heap[0]
+            if next_of.get(pid) == -neg_nu and cache_map[pid].is_dirty == is_dirty:
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def _pop_victim(self):
+        """比較 Clean / Dirty 兩邊最好的候選，回傳要踢掉的 page_id"""
+        clean = self._top(self._clean_heap, False)
+        dirty = self._top(self._dirty_heap, True)
+        if dirty is None or clean is not None and self._prefer_clean(-clean[0], -dirty[0]):
+            heap, (_, _, pid) = self._clean_heap, clean
+            if self.stats is not None:
+                self.stats.count("evict.clean")
+        else:
+            heap, (_, _, pid) = self._dirty_heap, dirty
+            if self.stats is not None:
+                self.stats.count("evict.dirty")
+        heapq.heappop(heap)
+        del self._next_of[pid]
+        del self._loaded_at[pid]
+        return pid
+
+    def _prefer_clean(self, clean_nu, dirty_nu):
+        """
+        cost_clean / dist_clean <= cost_dirty / dist_dirty 時踢 Clean Page (相等時也踢 clean，不產生寫入)
+        dist 為現在到 next use 的距離 (不再使用時到 trace 結束)，交叉相乘避免除法
+        """
+        t = self.t
+        never = self._never
+        clean_cost = self.read_cost if clean_nu < never else 0
+        dirty_cost = self.write_cost + (self.read_cost if dirty_nu < never else 0)
+        return clean_cost * (dirty_nu - t) <= dirty_cost * (clean_nu - t)
+
+    def access_page(self, page_id, is_write):
+        if not self._built:
+            self._build_next_use()
+
+        victim = None
+        t = self.t
+        nu = self.next_use[t] if t < self._never else self._never
+
+        page = self.cache_map.get(page_id)
+        if page is not None:
+            is_hit = True
+            if is_write:
+                page.is_dirty = True
+        else:
+            is_hit = False
+            if len(self.cache_map) >= self.capacity:
+                victim = self.cache_map.pop(self._pop_victim())
+            page = Page(page_id, is_dirty=is_write)
+            self.cache_map[page_id] = page
+            self._loaded_at[page_id] = t
+
+        self._push(page_id, nu, page.is_dirty)
+        self.t += 1
+        return is_hit, victim
+
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        """批次版 access_page，結果與逐筆呼叫完全相同 (Miss 時重複使用被踢掉的 Page 物件)"""
+        if not self._built:
+            self._build_next_use()
+
+        cache_map = self.cache_map
+        next_use = self.next_use
+        never = self._never
+        capacity = self.capacity
+        loaded_at = self._loaded_at
+        push = self._push
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+
+        for i, page_id in enumerate(page_ids):
+            is_write = is_writes[i]
+            t = self.t
+            nu = next_use[t] if t < never else never
+
+            page = cache_map.get(page_id)
+            if page is not None:
+                hits += 1
+                if is_write:
+                    page.is_dirty = True
+                code = HIT
+            else:
+                misses += 1
+                code = MISS
+                if len(cache_map) >= capacity:
+                    page = cache_map.pop(self._pop_victim())
+                    if page.is_dirty:
+                        dirty_evictions += 1
+                        code = MISS_DIRTY_EVICT
+                    page.page_id = page_id
+                    page.is_dirty = is_write
+                else:
+                    page = Page(page_id, is_dirty=is_write)
+                cache_map[page_id] = page
+                loaded_at[page_id] = t
+
+            push(page_id, nu, page.is_dirty)
+            self.t = t + 1
+            if results is not None:
+                results[i] = code
+
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def access_run(self, page_id, count, is_write):
+        """同 BeladyMINAlgorithm.access_run: t 前進 count，next use 改成 run 最後一次存取的 next use"""
+        result = self.access_page(page_id, is_write)
+        if count > 1:
+            self.t += count - 1
+            last = self.t - 1
+            self._push(page_id, self.next_use[last] if last < self._never else self._never,
+                       self.cache_map[page_id].is_dirty)
+        return result
+
+    def get_state(self):
+        """next_use 可由 trace 重建，不需保存；heap 由有效的 entry 重建"""
+        pids = list(self.cache_map)
+        return {
+            "t": self.t,
+            "pages": pack_pages((pid, self.cache_map[pid].is_dirty) for pid in pids),
+            "next_of": array('q', (self._next_of[pid] for pid in pids)),
+            "loaded_at": array('q', (self._loaded_at[pid] for pid in pids)),
+        }
+
+    def set_state(self, state):
+        self.t = state["t"]
+        self.cache_map = OrderedDict((pid, Page(pid, d)) for pid, d in unpack_pages(state["pages"]))
+        pids = list(self.cache_map)
+        self._next_of = dict(zip(pids, state["next_of"]))
+        self._loaded_at = dict(zip(pids, state["loaded_at"]))
+        self._rebuild_heaps()
+
+
+def _keep_intervals(trace, read_cost, write_cost):
+    """
+    把 trace 轉成 interval: 第 i 次 access 的 page 到它下一次被存取 (或 trace 結束) 之間留在 cache。
+    interval 以弧 (start, end) 表示，佔用時間點 start .. end - 1 (第 i 次 access 為 start = i + 1)，
+    不佔用任何時間點的 interval (連續存取同一個 page / 最後一筆 access) 一定可以保留，直接略過。
+    回傳 (compulsory, starts, ends, read_w, write_w)
+        read_w  : 沒有保留時下一次存取一定 Miss (最後一次使用的 interval 為 0)
+        write_w : 第 i 次 access 是寫入時，沒有保留代表這段期間踢掉了 Dirty Page
+    """
+    n = len(trace)
+    next_use = build_next_use(trace)
+    nxt = np.frombuffer(next_use, dtype=np.dtype(next_use.typecode)).astype(np.int64)
+    is_writes = np.asarray(trace.is_writes).astype(bool)
+    starts = np.arange(1, n + 1, dtype=np.int64)
+    reused = nxt < n
+    compulsory = n - int(np.count_nonzero(reused))
+
+    read_w = np.where(reused, read_cost, 0)
+    write_w = np.where(is_writes, write_cost, 0)
+    keep = (nxt > starts) & (read_w + write_w > 0)
+    return compulsory, starts[keep], nxt[keep], read_w[keep], write_w[keep]
+
+
+def _max_unit_intervals(starts, ends, slots):
+    """
+    每個時間點最多 slots 個 interval 時，最多能保留幾個 interval (權重相同)。
+    依起點掃描，超過 slots 時丟掉終點最晚的 (與 Belady MIN 相同的論證，此貪婪法為最佳解)
+    """
+    if slots <= 0:
+        return 0
+    ending = []   # (end, id)，找出已經結束的 interval
+    latest = []   # (-end, id)，找出終點最晚的 interval
+    state = bytearray(len(starts))  # 0 = 保留中, 1 = 丟掉, 2 = 已結束
+    active = kept = 0
+    for k, (u, v) in enumerate(zip(starts, ends)):
+        while ending and ending[0][0] <= u:
+            j = heapq.heappop(ending)[1]
+            if state[j] == 0:
+                state[j] = 2
+                active -= 1
+                kept += 1
+        heapq.heappush(ending, (v, k))
+        heapq.heappush(latest, (-v, k))
+        active += 1
+        if active > slots:
+            while True:
+                j = heapq.heappop(latest)[1]
+                if state[j] == 0:
+                    break
+            state[j] = 1
+            active -= 1
+    return kept + active
+
+
+def _max_kept_weight(n, starts, ends, weights, slots):
+    """
+    每個時間點最多 slots 個 interval 時，保留的 interval 權重總和的最大值 (精確解)。
+    時間軸上的節點 0 .. n，相鄰節點間的弧容量 slots、成本 0 (不保留)，interval 為容量 1、成本 -weight 的弧，
+    從 0 送 slots 單位的流到 n 的 min-cost flow (successive shortest path + Dijkstra potential)
+    """
+    if slots <= 0 or not len(starts):
+        return 0
+    to = []
+    cap = []
+    cost = []
+    adj = [[] for _ in range(n + 1)]
+
+    def add_arc(u, v, c, w):
+        adj[u].append(len(to))
+        to.append(v)
+        cap.append(c)
+        cost.append(w)
+        adj[v].append(len(to))
+        to.append(u)
+        cap.append(0)
+        cost.append(-w)
+
+    for t in range(n):
+        add_arc(t, t + 1, slots, 0)
+    for u, v, w in zip(starts, ends, weights):
+        add_arc(u, v, 1, -w)
+
+    # 初始 potential: 所有弧都往右，依節點順序即可求最短路徑
+    inf = float('inf')
+    pot = [inf] * (n + 1)
+    pot[0] = 0
+    for x in range(n + 1):
+        for e in adj[x]:
+            if cap[e] and pot[x] + cost[e] < pot[to[e]]:
+                pot[to[e]] = pot[x] + cost[e]
+
+    flow = 0
+    total = 0
+    while flow < slots:
+        dist = [inf] * (n + 1)
+        prev = [-1] * (n + 1)
+        dist[0] = 0
+        heap = [(0, 0)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            px = pot[x]
+            for e in adj[x]:
+                if cap[e]:
+                    y = to[e]
+                    nd = d + cost[e] + px - pot[y]
+                    if nd < dist[y]:
+                        dist[y] = nd
+                        prev[y] = e
+                        heapq.heappush(heap, (nd, y))
+        for x in range(n + 1):
+            if dist[x] < inf:
+                pot[x] += dist[x]
+        path_cost = pot[n] - pot[0]
+        if path_cost >= 0:
+            # 剩下的流量走不保留的弧即可，不會再增加保留的權重
+            break
+        f = slots - flow
+        y = n
+        while y:
+            e = prev[y]
+            f = min(f, cap[e])
+            y = to[e ^ 1]
+        y = n
+        while y:
+            e = prev[y]
+            cap[e] -= f
+            cap[e ^ 1] += f
+            y = to[e ^ 1]
+        flow += f
+        total += f * path_cost
+    return -total
+
+
+def flash_cost_lower_bound(trace, capacity, read_cost=1, write_cost=8, exact_limit=EXACT_LIMIT):
+    """
+    Miss * read_cost + Dirty Eviction * write_cost 的下界: 任何置換策略 (包含知道未來的最佳解)
+    在這個 trace 與容量下的成本都不會低於它。
+
+    第 i 次 access 之後，page 要嘛留在 cache 直到下一次存取 (保留 interval)，要嘛在這段期間被踢掉；
+    每個時間點除了正在存取的 page 之外最多保留 capacity - 1 個 interval。沒有保留的 interval 至少要付
+        read_cost  (之後還會用到時，下一次存取是 Miss)
+        write_cost (第 i 次 access 是寫入時，被踢掉的一定是 Dirty Page)
+    (之前寫入、延續到這段期間的 dirty 狀態不計，所以是下界)。成本 = Compulsory Miss + 沒有保留的 interval 權重，
+    保留權重的最大值是 interval 上的 min-cost flow:
+        - 規模不超過 exact_limit 時精確求解 (method = "min-cost-flow")
+        - 否則把權重拆成 read / write 兩部分，各自是等權重的問題，用貪婪法精確求解後相加，
+          保留權重被高估，仍然是下界 (method = "decomposed"，O(n log n))
+    :param trace: trace_format.Trace
+    :return: dict (total_access / capacity / compulsory_misses / total_cost / method)
+    """
+    n = len(trace)
+    compulsory, starts, ends, read_w, write_w = _keep_intervals(trace, read_cost, write_cost)
+    slots = capacity - 1
+    weights = read_w + write_w
+    total_weight = int(weights.sum())
+
+    if (n + len(starts)) * max(slots, 0) <= exact_limit:
+        kept = _max_kept_weight(n, starts.tolist(), ends.tolist(), weights.tolist(), slots)
+        method = "min-cost-flow"
+    else:
+        kept = 0
+        for w, unit in ((read_w, read_cost), (write_w, write_cost)):
+            mask = w > 0
+            kept += unit * _max_unit_intervals(starts[mask].tolist(), ends[mask].tolist(), slots)
+        method = "decomposed"
+
+    return {
+        "total_access": n,
+        "capacity": capacity,
+        "compulsory_misses": compulsory,
+        "total_cost": read_cost * compulsory + total_weight - kept,
+        "method": method,
+    }
@@ -0,0 +1,73 @@
+"""
+演算法內部的 instrumentation (計數器 / 分布 / 時間序列)
+
+演算法預設 self.stats = None，hot path 只多一個 `if stats is not None` 判斷；
+需要觀察內部行為時設 algo.stats = Instrumentation()，跑完再 save_json() 匯出。
+"""
+import json
+from collections import defaultdict
+
+
+class Histogram:
+    """log2 分桶的分布: bucket b 收 [2^(b-1), 2^b) 的整數，bucket 0 只收 0"""
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        value = int(value)
+        self.buckets[value.bit_length()] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            # key = bucket 的下界
+            "buckets": {str(0 if b == 0 else 1 << (b - 1)): n for b, n in sorted(self.buckets.items())},
+        }
+
+
+class Instrumentation:
+    """
+    收集演算法內部行為:
+        count(name)         : 計數器 (例如 CFLRU 踢到 Clean Page / 退化成 LRU 的次數)
+        observe(name, value): 分布 (例如 window 掃描長度、每次 access 的耗時)
+        record(name, value) : 時間序列 (例如每次 adjust_window 後的 window_size)
+    """
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.histograms = defaultdict(Histogram)
+        self.series = defaultdict(list)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def observe(self, name, value):
+        self.histograms[name].add(value)
+
+    def record(self, name, value):
+        self.series[name].append(value)
+
+    def to_dict(self):
+        return {
+            "counters": dict(self.counters),
+            "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            "series": dict(self.series),
+        }
+
+    def save_json(self, path, extra=None):
+        """匯出成 JSON；extra (例如模擬結果) 會放在 "run" 欄位"""
+        data = self.to_dict()
+        if extra is not None:
+            data["run"] = extra
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
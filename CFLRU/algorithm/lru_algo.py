@@ -1,15 +1,10 @@
 from collections import OrderedDict
 
-class Page:
-    """代表一個記憶體頁面"""
-    def __init__(self, page_id, is_dirty=False):
-        self.page_id = page_id
-        self.is_dirty = is_dirty
+from algorithm.spec import (Page, ReplacementAlgorithm, BatchResult, HIT, MISS, MISS_DIRTY_EVICT,
+                            pack_pages, unpack_pages)
+from algorithm.array_cache import PageTable, IndexList
 
-    def __repr__(self):
-        return f"Page({self.page_id}, Dirty={self.is_dirty})"
-
-class LRUAlgorithm:
+class LRUAlgorithm(ReplacementAlgorithm):
     def __init__(self, capacity):
         self.capacity = capacity
         # 使用 OrderedDict 來模擬 LRU
@@ -58,4 +53,164 @@ class LRUAlgorithm:
             self.cache[page_id] = new_page
 
         # 回傳給 Framework
-        return is_hit, victim
\ No newline at end of file
+        return is_hit, victim
+
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        """
+        批次版 access_page，結果與逐筆呼叫完全相同。
+        Hit 用 move_to_end 原地移動；Miss 時直接重複使用被踢掉的 Page 物件，不另外配置。
+        """
+        cache = self.cache
+        capacity = self.capacity
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+
+        for i, page_id in enumerate(page_ids):
+            is_write = is_writes[i]
+            page = cache.get(page_id)
+            if page is not None:
+                hits += 1
+                if is_write:
+                    page.is_dirty = True
+                cache.move_to_end(page_id)
+                code = HIT
+            else:
+                misses += 1
+                code = MISS
+                if len(cache) >= capacity:
+                    _, page = cache.popitem(last=False)
+                    if page.is_dirty:
+                        dirty_evictions += 1
+                        code = MISS_DIRTY_EVICT
+                    page.page_id = page_id
+                    page.is_dirty = is_write
+                else:
+                    page = Page(page_id, is_dirty=is_write)
+                cache[page_id] = page
+            if results is not None:
+                results[i] = code
+
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def access_run(self, page_id, count, is_write):
+        """run 中第一次之後的存取都是 MRU page 的 Hit，只會改變 dirty bit，第一次存取帶入 is_write 即可"""
+        return self.access_page(page_id, is_write)
+
+    def access_runs(self, page_ids, counts, is_writes):
+        batch = self.access_batch(page_ids, is_writes)
+        return batch._replace(hits=batch.hits + int(sum(counts)) - len(page_ids))
+
+    def get_state(self):
+        return {"pages": pack_pages((pid, page.is_dirty) for pid, page in self.cache.items())}
+
+    def set_state(self, state):
+        self.cache = OrderedDict((pid, Page(pid, is_dirty)) for pid, is_dirty in unpack_pages(state["pages"]))
+
+
+class ArrayLRUAlgorithm(ReplacementAlgorithm):
+    """
+    Array-backed 的 LRU，結果與 LRUAlgorithm 相同。
+    page_id 必須是 dense 編號 (trace_format.load_trace(path, dense=True))，
+    每頁只佔 PageTable 裡的 prev/next/state/dirty 約 10 bytes。
+    """
+    # 讓 Framework 知道要用 dense page_id 載入 trace
+    dense_page_ids = True
+
+    def __init__(self, capacity, num_pages=0):
+        self.capacity = capacity
+        self.table = PageTable(num_pages)
+        prev, nxt = self.table.links[0]
+        # order: [LRU (最舊) ... MRU (最新)]
+        self.lru = IndexList(prev, nxt)
+
+    def get_name(self):
+        return "Standard LRU (Array)"
+
+    @property
+    def cache(self):
+        """LRU -> MRU 的 Page 物件 (僅供顯示/除錯用)"""
+        dirty = self.table.dirty
+        return OrderedDict((pid, Page(pid, bool(dirty[pid]))) for pid in self.lru)
+
+    def _access(self, page_id, is_write):
+        """
+        回傳 (code, victim_id)，code 為 HIT / MISS / MISS_DIRTY_EVICT，沒有踢人時 victim_id = -1
+        """
+        table = self.table
+        if page_id >= len(table):
+            table.grow(page_id + 1)
+        state = table.state
+        dirty = table.dirty
+
+        if state[page_id]:
+            # --- Hit ---
+            if is_write:
+                dirty[page_id] = 1
+            self.lru.move_to_back(page_id)
+            return HIT, -1
+
+        # --- Miss ---
+        code = MISS
+        victim_id = -1
+        if self.lru.size >= self.capacity:
+            victim_id = self.lru.pop_front()
+            state[victim_id] = 0
+            if dirty[victim_id]:
+                code = MISS_DIRTY_EVICT
+
+        self.lru.push_back(page_id)
+        state[page_id] = 1
+        dirty[page_id] = 1 if is_write else 0
+        return code, victim_id
+
+    def access_page(self, page_id, is_write):
+        """
+        輸入: page_id (dense int), is_write (bool)
+        輸出: (is_hit, victim_page)，victim_page 只在踢人時才建立
+        """
+        code, victim_id = self._access(page_id, is_write)
+        if code == HIT:
+            return True, None
+        victim = None
+        if victim_id != -1:
+            victim = Page(victim_id, is_dirty=code == MISS_DIRTY_EVICT)
+        return False, victim
+
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+        access = self._access
+        for i, page_id in enumerate(page_ids):
+            code = access(page_id, is_writes[i])[0]
+            if code == HIT:
+                hits += 1
+            else:
+                misses += 1
+                if code == MISS_DIRTY_EVICT:
+                    dirty_evictions += 1
+            if results is not None:
+                results[i] = code
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def access_run(self, page_id, count, is_write):
+        """同 LRUAlgorithm.access_run"""
+        return self.access_page(page_id, is_write)
+
+    def access_runs(self, page_ids, counts, is_writes):
+        batch = self.access_batch(page_ids, is_writes)
+        return batch._replace(hits=batch.hits + int(sum(counts)) - len(page_ids))
+
+    def get_state(self):
+        dirty = self.table.dirty
+        return {"pages": pack_pages((pid, dirty[pid]) for pid in self.lru)}
+
+    def set_state(self, state):
+        self.table = PageTable(len(self.table))
+        prev, nxt = self.table.links[0]
+        self.lru = IndexList(prev, nxt)
+        for pid, is_dirty in unpack_pages(state["pages"]):
+            if pid >= len(self.table):
+                self.table.grow(pid + 1)
+            self.lru.push_back(pid)
+            self.table.state[pid] = 1
+            self.table.dirty[pid] = 1 if is_dirty else 0
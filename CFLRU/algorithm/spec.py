@@ -1,6 +1,19 @@
 # 定義algorithm寫法
+from array import array
+from collections import namedtuple
+
+# access_batch 的逐筆結果代碼
+MISS = 0              # Miss (沒有踢人，或踢掉的是 Clean Page)
+HIT = 1               # Hit
+MISS_DIRTY_EVICT = 2  # Miss 且踢掉了 Dirty Page (需要寫回 Flash)
+
+# access_batch 的回傳值: 整批的統計，results 為逐筆結果 (bytearray，未要求時為 None)
+BatchResult = namedtuple("BatchResult", ["hits", "misses", "dirty_evictions", "results"])
+
 class Page:
-    """代表一個記憶體頁面"""
+    """代表一個記憶體頁面 (所有演算法共用；__slots__ 省去每個物件的 __dict__)"""
+    __slots__ = ("page_id", "is_dirty")
+
     def __init__(self, page_id, is_dirty=False):
         self.page_id = page_id
         self.is_dirty = is_dirty
@@ -8,8 +21,28 @@ class Page:
     def __repr__(self):
         return f"Page({self.page_id}, Dirty={self.is_dirty})"
 
+def pack_pages(pages):
+    """
+    (page_id, is_dirty) 序列 -> (array('q') page_ids, bytearray dirty bits)
+    checkpoint 用的精簡編碼: 每頁 9 bytes，pickle 時直接以 bytes 寫出
+    """
+    ids = array('q')
+    dirty = bytearray()
+    for pid, is_dirty in pages:
+        ids.append(pid)
+        dirty.append(1 if is_dirty else 0)
+    return ids, dirty
+
+def unpack_pages(packed):
+    """pack_pages 的反向，依原順序產生 (page_id, is_dirty)"""
+    ids, dirty = packed
+    return zip(ids, map(bool, dirty))
+
 class ReplacementAlgorithm:
     """所有演算法都必須繼承這個父類別"""
+    # 選用的 instrumentation.Instrumentation；None 時演算法不記錄任何內部統計
+    stats = None
+
     def __init__(self, capacity):
         self.capacity = capacity  # Cache 最大容量
         self.cache = []           # 存放 Page 物件的列表
@@ -23,6 +56,76 @@ class ReplacementAlgorithm:
         """
         raise NotImplementedError("組員們，請實作這個函式！")
 
+    def access_batch(self, page_ids, is_writes, return_results=False):
+        """
+        一次處理一批 access (選用，Framework 偵測到就會改用這個介面)。
+        輸入: page_ids / is_writes 兩個等長序列 (例如 Trace.iter_chunks() 的 list)
+        回傳值: BatchResult(hits, misses, dirty_evictions, results)
+        - results: return_results=True 時為每筆的 HIT / MISS / MISS_DIRTY_EVICT 代碼
+
+        預設實作逐筆呼叫 access_page；子類別可覆寫成不配置 tuple / Page 的迴圈。
+        """
+        results = bytearray(len(page_ids)) if return_results else None
+        hits = misses = dirty_evictions = 0
+        for i, page_id in enumerate(page_ids):
+            is_hit, victim = self.access_page(page_id, is_writes[i])
+            if is_hit:
+                hits += 1
+                code = HIT
+            else:
+                misses += 1
+                code = MISS
+                if victim is not None and victim.is_dirty:
+                    dirty_evictions += 1
+                    code = MISS_DIRTY_EVICT
+            if results is not None:
+                results[i] = code
+        return BatchResult(hits, misses, dirty_evictions, results)
+
+    def access_run(self, page_id, count, is_write):
+        """
+        連續 count 次存取同一個 page (trace_format.collapse_runs 的一筆 run)，is_write 為 run 中是否有寫入。
+        回傳值: 第一次存取的 (is_hit, victim_page)；之後的 count - 1 次一定是 Hit (page 已在 MRU)。
+
+        預設實作逐筆呼叫 access_page；子類別可覆寫成一步完成，但結果必須與逐筆呼叫相同。
+        (本專案的演算法只在 Miss / 踢人時看 dirty bit，寫入落在 run 的哪一次不影響結果)
+        """
+        result = self.access_page(page_id, is_write)
+        for _ in range(count - 1):
+            self.access_page(page_id, is_write)
+        return result
+
+    def access_runs(self, page_ids, counts, is_writes):
+        """
+        一次處理一批 run (page_ids / counts / is_writes 三個等長序列)。
+        回傳值: BatchResult，hits 包含 run 中重複的存取，results 固定為 None
+        """
+        hits = misses = dirty_evictions = 0
+        access_run = self.access_run
+        for i, page_id in enumerate(page_ids):
+            count = counts[i]
+            is_hit, victim = access_run(page_id, count, is_writes[i])
+            hits += count - 1
+            if is_hit:
+                hits += 1
+            else:
+                misses += 1
+                if victim is not None and victim.is_dirty:
+                    dirty_evictions += 1
+        return BatchResult(hits, misses, dirty_evictions, None)
+
+    def get_state(self):
+        """
+        匯出完整的演算法狀態 (checkpoint 用，選用)。
+        回傳只含基本型別 / bytes / array 的 dict；set_state(get_state()) 之後繼續模擬，
+        結果必須與沒有中斷時完全相同。instrumentation (self.stats) 不包含在內。
+        """
+        raise NotImplementedError(f"{self.get_name()} 不支援 checkpoint")
+
+    def set_state(self, state):
+        """還原 get_state() 匯出的狀態 (演算法須以相同參數建立)"""
+        raise NotImplementedError(f"{self.get_name()} 不支援 checkpoint")
+
     def get_name(self):
         """回傳演算法名稱"""
         return "Unknown Algorithm"
\ No newline at end of file
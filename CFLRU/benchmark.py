@@ -0,0 +1,181 @@
+"""
+效能 Benchmark: 合成 workload x 演算法 x 容量
+
+量測每個組合的 accesses/sec、peak memory (tracemalloc) 與成本指標 (Miss Rate / Total Cost /
+Flash Writes)，並可與先前存下的 baseline JSON 比較:
+    - accesses/sec 低於 baseline 超過容忍值 -> SLOWDOWN
+    - 成本指標與 baseline 不同 (合成 trace 是固定的，結果應該完全一致) -> CHANGED
+有任何一項時以 exit code 1 結束，方便接在 CI 裡自動抓出 hot path 的退步。
+
+使用方式:
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json [--tolerance 0.15] [--quick]
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from algorithm.lru_algo import LRUAlgorithm
+from algorithm.cflru import CFLRUAlgorithm, ClusteredCFLRUAlgorithm
+from algorithm.clock_cflru import ClockCFLRUAlgorithm
+from algorithm.beladys_min_algo import BeladyMINAlgorithm
+from algorithm.cost_min import CostAwareGreedyAlgorithm
+from simulate_framework import run_simulation
+from synthetic_traces import zipf_trace, loop_trace, scan_flood_trace, phase_trace
+
+
+# workload 名稱 -> 產生 trace 的函式 (n = access 數)
+WORKLOADS = {
+    "zipf-0.8": lambda n: zipf_trace(n, num_pages=n // 10, skew=0.8, write_ratio=0.3),
+    "zipf-1.2": lambda n: zipf_trace(n, num_pages=n // 10, skew=1.2, write_ratio=0.3),
+    "zipf-write-heavy": lambda n: zipf_trace(n, num_pages=n // 10, skew=1.0, write_ratio=0.7),
+    "zipf-read-only": lambda n: zipf_trace(n, num_pages=n // 10, skew=1.0, write_ratio=0.0),
+    "loop": lambda n: loop_trace(n, loop_pages=n // 20, write_ratio=0.3),
+    "scan-flood": lambda n: scan_flood_trace(n, hot_pages=n // 20, flood_length=n // 50,
+                                             flood_every=n // 10, skew=1.0, write_ratio=0.3),
+    "phase-change": lambda n: phase_trace([
+        (zipf_trace, {"n": n // 4, "num_pages": n // 20, "skew": 1.0, "write_ratio": 0.1}),
+        (zipf_trace, {"n": n // 4, "num_pages": n // 10, "skew": 0.8, "write_ratio": 0.6}),
+        (loop_trace, {"n": n // 4, "loop_pages": n // 40, "write_ratio": 0.3}),
+        (zipf_trace, {"n": n - 3 * (n // 4), "num_pages": n // 20, "skew": 1.2, "write_ratio": 0.3}),
+    ]),
+}
+
+# 演算法名稱 -> 建立物件的函式
+ALGORITHMS = {
+    "lru": lambda cap: LRUAlgorithm(cap),
+    "cflru-static": lambda cap: CFLRUAlgorithm(cap, mode="static"),
+    "cflru-dynamic": lambda cap: CFLRUAlgorithm(cap, mode="dynamic"),
+    "cflru-ghost": lambda cap: CFLRUAlgorithm(cap, mode="dynamic", tuner="ghost"),
+    "cflru-clustered": lambda cap: ClusteredCFLRUAlgorithm(cap, mode="dynamic"),
+    "clock-cflru": lambda cap: ClockCFLRUAlgorithm(cap, mode="dynamic"),
+    "belady": lambda cap: BeladyMINAlgorithm(cap),
+    "cost-greedy": lambda cap: CostAwareGreedyAlgorithm(cap),
+}
+
+RATIOS = [0.01, 0.1]
+COST_METRICS = ("total_miss", "total_cost", "flash_writes")
+
+
+def run_one(algo_factory, trace, capacity, measure_memory=True, repeat=1):
+    """回傳一個組合的量測結果 (repeat 次取最快的一次)"""
+    best = None
+    for _ in range(repeat):
+        algo = algo_factory(capacity)
+        start = time.perf_counter()
+        result = run_simulation(algo, trace, progress=False)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    elapsed, result = best
+
+    peak = None
+    if measure_memory:
+        # tracemalloc 會拖慢執行，記憶體另外跑一次量測
+        tracemalloc.start()
+        run_simulation(algo_factory(capacity), trace, progress=False)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "capacity": capacity,
+        "elapsed_sec": elapsed,
+        "accesses_per_sec": result["total_access"] / elapsed if elapsed else 0.0,
+        "peak_memory_bytes": peak,
+        "miss_rate": result["miss_rate"],
+        **{k: result[k] for k in COST_METRICS},
+    }
+
+
+def run_benchmarks(n=200_000, workloads=None, algorithms=None, ratios=RATIOS,
+                   measure_memory=True, repeat=1):
+    """執行所有組合，回傳 {"meta": ..., "results": {"workload/algorithm/ratio": 量測結果}}"""
+    results = {}
+    for w_name in workloads or WORKLOADS:
+        trace = WORKLOADS[w_name](n)
+        working_set_size = len(np.unique(trace.page_ids))
+        for a_name in algorithms or ALGORITHMS:
+            for r in ratios:
+                capacity = max(5, int(working_set_size * r))
+                key = f"{w_name}/{a_name}/{r}"
+                results[key] = run_one(ALGORITHMS[a_name], trace, capacity, measure_memory, repeat)
+                m = results[key]
+                print(f"{key:<40} {m['accesses_per_sec']:>12,.0f} ops/s  "
+                      f"miss={m['miss_rate']:.2%}  cost={m['total_cost']:,}  writes={m['flash_writes']:,}")
+
+    return {
+        "meta": {
+            "accesses": n,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.15):
+    """
+    與 baseline 比較，回傳問題列表 (空列表代表沒有退步)
+    :param tolerance: accesses/sec 允許下降的比例
+    :raises ValueError: 兩邊的 access 數不同 (成本指標必然不同，無法比較)
+    """
+    if current["meta"]["accesses"] != baseline["meta"]["accesses"]:
+        raise ValueError(f"baseline 使用 {baseline['meta']['accesses']:,} 筆 access，"
+                         f"這次為 {current['meta']['accesses']:,} 筆，無法比較 (請用相同的 --accesses / --quick)")
+    problems = []
+    for key, base in baseline["results"].items():
+        cur = current["results"].get(key)
+        if cur is None:
+            continue
+        if cur["accesses_per_sec"] < base["accesses_per_sec"] * (1 - tolerance):
+            problems.append(f"SLOWDOWN {key}: {cur['accesses_per_sec']:,.0f} ops/s "
+                            f"(baseline {base['accesses_per_sec']:,.0f})")
+        for metric in COST_METRICS:
+            if cur[metric] != base[metric]:
+                problems.append(f"CHANGED  {key}: {metric} = {cur[metric]} (baseline {base[metric]})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成 workload 的效能 benchmark")
+    parser.add_argument("--accesses", type=int, default=200_000, help="每個 workload 的 access 數")
+    parser.add_argument("--quick", action="store_true", help="縮小為 20,000 筆 access")
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=None)
+    parser.add_argument("--algorithms", nargs="+", choices=list(ALGORITHMS), default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="每個組合重複次數 (取最快)")
+    parser.add_argument("--no-memory", action="store_true", help="不量測 peak memory")
+    parser.add_argument("--baseline", help="要比較的 baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="accesses/sec 允許下降的比例")
+    parser.add_argument("--save-baseline", help="把這次結果存成 baseline JSON")
+    args = parser.parse_args()
+
+    n = 20_000 if args.quick else args.accesses
+    current = run_benchmarks(n, args.workloads, args.algorithms,
+                             measure_memory=not args.no_memory, repeat=args.repeat)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        try:
+            problems = compare(current, baseline, args.tolerance)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        if problems:
+            print("\n".join(problems))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+模擬的 checkpoint 檔 (.ckpt)
+
+檔案結構 (little-endian):
+    Header (16 bytes): magic 'CFCK', version, payload 長度
+    payload          : pickle (protocol 5) 的 snapshot dict
+
+snapshot 內容 (見 simulate_framework.run_simulation):
+    algorithm / capacity / config / trace_length : 還原前檢查是否為同一個實驗
+                                          (config 為 result_cache.config_digest，演算法參數的雜湊)
+    offset                              : 已處理的 access 數 (trace 從這裡繼續)
+    total_miss / total_cost / flash_writes / write_ops
+    state                               : algo.get_state()，cache 內容以 array / bytes 保存
+寫檔時先寫到暫存檔再 os.replace，中途被中斷也不會留下損毀的 checkpoint。
+"""
+import os
+import pickle
+import struct
+
+
+MAGIC = b'CFCK'
+VERSION = 1
+# magic, version, payload 長度
+HEADER = struct.Struct('<4sH2xQ')
+
+
+def save_checkpoint(path, snapshot):
+    """以 atomic rename 寫出 snapshot，回傳檔案大小 (bytes)"""
+    payload = pickle.dumps(snapshot, protocol=5)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(payload)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return HEADER.size + len(payload)
+
+
+def load_checkpoint(path):
+    """讀取 snapshot dict"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError(f"{path}: checkpoint 檔不完整")
+        magic, version, length = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: 不是 CFCK checkpoint")
+        if version != VERSION:
+            raise ValueError(f"{path}: 不支援的版本 {version}")
+        payload = f.read(length)
+    if len(payload) != length:
+        raise ValueError(f"{path}: checkpoint 檔不完整")
+    return pickle.loads(payload)
@@ -1,13 +1,27 @@
 #用於清理buffer cache的data
+"""
+SPC trace (asu,lba,size,op,ts) 轉成模擬器用的 page_id,is_write,timestamp trace
+
+以固定大小的 chunk 串流讀取，每個 request 的 LBA 範圍用 NumPy 一次展開成 page_id，
+並逐 chunk 寫出，記憶體用量與輸入檔大小無關。
+request 的時間 ts (秒) 保留成每個 page 的 timestamp (同一個 request 展開的 page 時間相同)，
+供 flash_device 的時間模型使用；--no-timestamps 輸出舊版的 page_id,is_write。
+
+使用方式:
+    python clean_spc.py <input.spc> <output.csv>     # 輸出 CSV
+    python clean_spc.py <input.spc> <output.cflt>    # 輸出 trace_format 二進位檔
+"""
 import os
+import argparse
+
+import numpy as np
+
+from trace_format import BinaryTraceWriter
 
-# ====== 你只需要改這裡 ======
-INPUT_PATH = "buffer_cache_trace/FileSystemBufferCache/WebSearch3.spc"          # 原始 trace 路徑
-OUTPUT_PATH = "buffer_cache_trace_cleaned/WebSearch3.csv"   # 輸出路徑
 
 LBA_SIZE = 512     # 固定 512B per LBA
 PAGE_SIZE = 4096   # 模擬器 page 大小（需要的話改）
-# ============================
+CHUNK_BYTES = 16 << 20  # 每次讀取的大小
 
 
 def parse_records(text: str):
@@ -30,36 +44,105 @@ def parse_records(text: str):
         )
 
 
-def convert():
-    # 確保輸出資料夾存在
-    out_dir = os.path.dirname(OUTPUT_PATH)
-    if out_dir:
-        os.makedirs(out_dir, exist_ok=True)
-
-    # 讀取輸入
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        text = f.read().strip()
-
-    out_lines = ["page_id,is_write"]
-
-    for asu, lba, size, op, ts in parse_records(text):
-        is_write = 1 if op == "w" else 0
+def iter_text_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """
+    每次讀 chunk_bytes，並在最後一個空白處切開，
+    尾端不完整的 record 留到下一個 chunk，保證不會切斷任何一筆。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        leftover = ""
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            text = leftover + block
+            cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"), text.rfind("\r"))
+            if cut == -1:
+                leftover = text
+                continue
+            leftover = text[cut + 1:]
+            yield text[:cut + 1]
+        if leftover:
+            yield leftover
+
+
+def parse_chunk(text):
+    """把一段文字解析成 (lba, size, is_write, ts)，前三個為 int64 array，ts 為 float64 array (秒)"""
+    records = list(parse_records(text))
+    if not records:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0, dtype=np.float64)
+    lba = np.fromiter((r[1] for r in records), dtype=np.int64, count=len(records))
+    size = np.fromiter((r[2] for r in records), dtype=np.int64, count=len(records))
+    is_write = np.fromiter((r[3] == "w" for r in records), dtype=np.int64, count=len(records))
+    ts = np.fromiter((r[4] for r in records), dtype=np.float64, count=len(records))
+    return lba, size, is_write, ts
+
+
+def expand_pages(lba, size, is_write, ts):
+    """
+    每個 request 的 [start_page, end_page] 展開成連續的 page_id (不用 Python for 迴圈)
+    回傳 (page_ids, is_writes, timestamps)
+    """
+    start_addr = lba * LBA_SIZE
+    end_addr = start_addr + size  # bytes
 
-        start_addr = lba * LBA_SIZE
-        end_addr = start_addr + size  # bytes
+    start_page = start_addr // PAGE_SIZE
+    end_page = (end_addr - 1) // PAGE_SIZE  # inclusive
+    counts = np.maximum(end_page - start_page + 1, 0)
 
-        start_page = start_addr // PAGE_SIZE
-        end_page = (end_addr - 1) // PAGE_SIZE  # inclusive
+    total = int(counts.sum())
+    # 每個輸出位置在所屬 request 內的偏移量 = 全域位置 - 該 request 的起始位置
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    page_ids = np.repeat(start_page, counts) + offsets
+    return page_ids, np.repeat(is_write, counts), np.repeat(ts, counts)
 
-        for pid in range(start_page, end_page + 1):
-            out_lines.append(f"{pid},{is_write}")
 
-    # 寫出輸出
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        f.write("\n".join(out_lines))
+def convert(input_path, output_path, chunk_bytes=CHUNK_BYTES, timestamps=True):
+    """:param timestamps: 是否輸出 timestamp 欄位 (False 時與舊版格式相同)"""
+    # 確保輸出資料夾存在
+    out_dir = os.path.dirname(output_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
 
-    print(f"Done. Wrote {len(out_lines)-1} lines to {OUTPUT_PATH}")
+    binary = output_path.endswith(".cflt")
+    written = 0
+
+    if binary:
+        with BinaryTraceWriter(output_path) as writer:
+            for text in iter_text_chunks(input_path, chunk_bytes):
+                page_ids, is_writes, ts = expand_pages(*parse_chunk(text))
+                writer.write(page_ids, is_writes, ts if timestamps else None)
+                written += len(page_ids)
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            # 與舊版輸出相同: header 之後每筆前面接一個換行，檔尾不留空行
+            f.write("page_id,is_write,timestamp" if timestamps else "page_id,is_write")
+            for text in iter_text_chunks(input_path, chunk_bytes):
+                page_ids, is_writes, ts = expand_pages(*parse_chunk(text))
+                if len(page_ids):
+                    f.write("\n")
+                    if timestamps:
+                        # repr 是可以還原成相同 float 的最短寫法
+                        rows = map("{},{},{!r}".format, page_ids.tolist(), is_writes.tolist(), ts.tolist())
+                    else:
+                        rows = map("{},{}".format, page_ids.tolist(), is_writes.tolist())
+                    f.write("\n".join(rows))
+                written += len(page_ids)
+
+    print(f"Done. Wrote {written} lines to {output_path}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SPC trace 轉成 page_id,is_write trace")
+    parser.add_argument("input", help="原始 .spc trace 路徑")
+    parser.add_argument("output", help="輸出路徑 (.csv 或 .cflt)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES >> 20, help="每次讀取的大小 (MB)")
+    parser.add_argument("--no-timestamps", action="store_true", help="不輸出 timestamp 欄位 (舊版格式)")
+    args = parser.parse_args()
+    convert(args.input, args.output, args.chunk_mb << 20, timestamps=not args.no_timestamps)
 
 
 if __name__ == "__main__":
-    convert()
+    main()
@@ -1,12 +1,17 @@
 import os
-import sys
-import csv
+import shutil
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 
 # 頁面大小常數 (4KB = 4096 bytes)
 PAGE_SIZE = 4096
 
+# 操作類型對應: i/l/0 -> 讀取, s/m/1 -> 寫入
+READ_OPS = ('I', 'L', '0')
+WRITE_OPS = ('S', 'M', '1')
+
 
 def parse_trace_line(line):
     """
@@ -27,14 +32,9 @@ def parse_trace_line(line):
     address = parts[1].replace(',', '')  # 移除逗號分隔符
     
     # 將操作類型對應到 is_write (0=讀取, 1=寫入)
-    # i/l/0 -> 0 (讀取)
-    # s/m/1 -> 1 (寫入)
-    read_ops = ['I', 'L', '0']
-    write_ops = ['S', 'M', '1']
-    
-    if operation in read_ops:
+    if operation in READ_OPS:
         is_write = 0
-    elif operation in write_ops:
+    elif operation in WRITE_OPS:
         is_write = 1
     else:
         return None, None
@@ -63,52 +63,146 @@ def calculate_page_id(address_hex):
     return page_id
 
 
+# 每次讀取 / 每個平行工作的大小
+BLOCK_BYTES = 8 << 20
+CHUNK_BYTES = 256 << 20
+
+
+def convert_lines(lines):
+    """
+    以 parse_trace_line + calculate_page_id 轉換一批 trace 行
+    
+    Args:
+        lines: 一批 trace 文字行
+    
+    Returns:
+        tuple: (CSV 文字 (與 csv.writer 相同的 \r\n 換行), 處理行數, 跳過行數)
+    """
+    rows = []
+    skipped = 0
+    for line in lines:
+        address_hex, is_write = parse_trace_line(line)
+        if address_hex is None:
+            skipped += 1
+            continue
+        try:
+            page_id = calculate_page_id(address_hex)
+        except ValueError:
+            skipped += 1
+            continue
+        rows.append(f"{page_id},{is_write}\r\n")
+    
+    return ''.join(rows), len(rows), skipped
+
+
+def iter_line_blocks(f, start=0, end=None, block_bytes=BLOCK_BYTES):
+    """
+    從二進位檔案物件的 [start, end) 位元組範圍，每次讀一大塊並切在最後一個換行，
+    產生解碼後的行列表 (換行規則與文字模式的 universal newlines 相同)
+    """
+    f.seek(start)
+    remaining = None if end is None else end - start
+    leftover = b''
+    while remaining is None or remaining > 0:
+        size = block_bytes if remaining is None else min(block_bytes, remaining)
+        block = f.read(size)
+        if not block:
+            break
+        if remaining is not None:
+            remaining -= len(block)
+        data = leftover + block
+        cut = data.rfind(b'\n') + 1
+        leftover = data[cut:]
+        if cut:
+            yield _split_lines(data[:cut])
+    if leftover:
+        yield _split_lines(leftover)
+
+
+def _split_lines(data):
+    text = data.decode('utf-8', errors='ignore')
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+    return lines
+
+
+def split_byte_ranges(input_path, chunk_bytes=CHUNK_BYTES):
+    """
+    把檔案切成約 chunk_bytes 大小的位元組範圍，每個範圍都結束在換行之後，
+    讓每個範圍可以獨立轉換
+    
+    Returns:
+        list: [(start, end), ...]
+    """
+    size = os.path.getsize(input_path)
+    ranges = []
+    with open(input_path, 'rb') as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()  # 延伸到這一行結束
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def convert_byte_range(input_path, start, end, part_path):
+    """
+    轉換 [start, end) 範圍並寫到 part_path (給 process pool 使用)
+    
+    Returns:
+        tuple: (part_path, 處理行數, 跳過行數)
+    """
+    processed_count = 0
+    skipped_count = 0
+    with open(input_path, 'rb') as infile, open(part_path, 'w', newline='') as outfile:
+        for lines in iter_line_blocks(infile, start, end):
+            text, processed, skipped = convert_lines(lines)
+            outfile.write(text)
+            processed_count += processed
+            skipped_count += skipped
+    return part_path, processed_count, skipped_count
+
+
 def process_trace_file(input_path, output_path, preview_rows=3):
     """
     處理單個 trace 檔案並轉換為清理後的 CSV 格式
+    (只開啟一次檔案，預覽後回到開頭，整批解析並整塊寫出)
     """
     print(f"讀取檔案: {input_path}")
     print("=" * 80)
     
     try:
-        # 預覽前 N 行 - 使用 UTF-8 編碼並忽略錯誤
-        with open(input_path, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(input_path, 'rb') as infile:
+            # 預覽前 N 行 - 使用 UTF-8 編碼並忽略錯誤
             preview_count = 0
-            for i, line in enumerate(f):
+            for i, raw in enumerate(infile):
                 if preview_count >= preview_rows:
                     break
+                line = raw.decode('utf-8', errors='ignore')
                 if line.strip():
                     print(f"第 {i+1} 行: {line.rstrip()}")
                     preview_count += 1
-        
-        print("=" * 80)
-        
-        # 處理並寫入 CSV
-        processed_count = 0
-        skipped_count = 0
-        
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # 同樣使用 UTF-8 編碼處理主檔案
-        with open(input_path, 'r', encoding='utf-8', errors='ignore') as infile, \
-             open(output_path, 'w', newline='') as outfile:
-            csv_writer = csv.writer(outfile)
-            csv_writer.writerow(['page_id', 'is_write'])
             
-            for line in infile:
-                address, is_write = parse_trace_line(line)
-                
-                if address is None:
-                    skipped_count += 1
-                    continue
-                
-                try:
-                    page_id = calculate_page_id(address)
-                    csv_writer.writerow([page_id, is_write])
-                    processed_count += 1
-                except ValueError as e:
-                    skipped_count += 1
-                    continue
+            print("=" * 80)
+            
+            # 處理並寫入 CSV
+            processed_count = 0
+            skipped_count = 0
+            
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            with open(output_path, 'w', newline='') as outfile:
+                outfile.write('page_id,is_write\r\n')
+                for lines in iter_line_blocks(infile):
+                    text, processed, skipped = convert_lines(lines)
+                    outfile.write(text)
+                    processed_count += processed
+                    skipped_count += skipped
         
         print(f"✓ 已處理 {processed_count} 行")
         if skipped_count > 0:
@@ -128,6 +222,65 @@ def process_trace_file(input_path, output_path, preview_rows=3):
         return False
 
 
+def process_trace_files_parallel(jobs, workers=None, chunk_bytes=CHUNK_BYTES):
+    """
+    平行處理多個 trace 檔案: 每個檔案切成以換行對齊的位元組範圍，
+    所有範圍一起丟進 process pool，完成後依序合併成各自的 CSV
+    
+    Args:
+        jobs: [(input_path, output_path), ...]
+        workers: process 數 (預設為 CPU 數)
+        chunk_bytes: 每個工作處理的位元組數
+    
+    Returns:
+        int: 成功處理的檔案數
+    """
+    success_count = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for input_path, output_path in jobs:
+            try:
+                ranges = split_byte_ranges(input_path, chunk_bytes)
+            except OSError as e:
+                print(f"✗ 處理檔案時發生錯誤: {input_path}: {e}")
+                continue
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            parts = [f"{output_path}.part{i:05d}" for i in range(len(ranges))]
+            futures = [
+                pool.submit(convert_byte_range, str(input_path), start, end, part_path)
+                for (start, end), part_path in zip(ranges, parts)
+            ]
+            pending.append((input_path, output_path, parts, futures))
+        
+        for input_path, output_path, parts, futures in pending:
+            processed_count = 0
+            skipped_count = 0
+            try:
+                for future in futures:
+                    _, processed, skipped = future.result()
+                    processed_count += processed
+                    skipped_count += skipped
+                
+                # 依順序合併各段輸出
+                with open(output_path, 'wb') as outfile:
+                    outfile.write(b'page_id,is_write\r\n')
+                    for part_path in parts:
+                        with open(part_path, 'rb') as part:
+                            shutil.copyfileobj(part, outfile)
+            except Exception as e:
+                print(f"✗ 處理檔案時發生錯誤: {input_path}: {e}")
+                continue
+            finally:
+                for part_path in parts:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+            
+            print(f"✓ {input_path}: 已處理 {processed_count} 行"
+                  + (f"，跳過 {skipped_count} 行無效資料" if skipped_count else ""))
+            success_count += 1
+    
+    return success_count
+
 
 def find_trace_files(root_dir):
     """
@@ -161,12 +314,18 @@ def main():
     使用方式: 
         python data_clean.py                    # 處理 'traces' 目錄下的所有檔案
         python data_clean.py <自訂目錄>          # 處理自訂目錄下的所有檔案
+        python data_clean.py <自訂目錄> --jobs 8 # 用 8 個 process 平行轉換 (大檔會再切段)
     """
+    parser = argparse.ArgumentParser(description="把 valgrind trace 轉成 page_id,is_write CSV")
+    parser.add_argument('input_dir', nargs='?', default='traces', help="trace 目錄 (預設 traces)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="平行 process 數，1 為逐檔處理，0 代表使用全部 CPU")
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES >> 20,
+                        help="平行模式下每個工作處理的大小 (MB)")
+    args = parser.parse_args()
+    
     # 決定輸入目錄
-    if len(sys.argv) >= 2:
-        input_dir = sys.argv[1]
-    else:
-        input_dir = 'traces'
+    input_dir = args.input_dir
     
     print(f"在 '{input_dir}' 目錄中搜尋 trace 檔案...")
     print()
@@ -185,20 +344,22 @@ def main():
     print("=" * 80)
     print()
     
-    # 處理每個檔案
-    success_count = 0
-    
+    # 建立輸出路徑：將 'traces' 替換為 'traces_cleaned'，副檔名改為 .csv
+    jobs = []
     for trace_file in trace_files:
-        # 建立輸出路徑：將 'traces' 替換為 'traces_cleaned'
         relative_path = trace_file.relative_to(input_dir)
-        output_file = Path('traces_cleaned') / relative_path
-        
-        # 將副檔名改為 .csv
-        output_file = output_file.with_suffix('.csv')
-        
-        # 處理檔案
-        if process_trace_file(trace_file, output_file):
-            success_count += 1
+        output_file = (Path('traces_cleaned') / relative_path).with_suffix('.csv')
+        jobs.append((trace_file, output_file))
+    
+    # 處理每個檔案
+    if args.jobs == 1:
+        success_count = 0
+        for trace_file, output_file in jobs:
+            if process_trace_file(trace_file, output_file):
+                success_count += 1
+    else:
+        success_count = process_trace_files_parallel(
+            jobs, workers=args.jobs or None, chunk_bytes=args.chunk_mb << 20)
     
     # 總結
     print("=" * 80)
@@ -0,0 +1,247 @@
+"""
+模擬 Flash 裝置的時間模型: 把演算法的 Miss 與 Dirty Page 寫回依 trace 的時間送進裝置，
+回報 response time 分佈與 throughput (取代 total_cost = Miss + 8 x Dirty Eviction 的無單位成本)
+
+裝置模型 (FlashDevice):
+    - read / program / erase 各有固定延遲 (微秒)
+    - queue_depth 個 request 可以同時執行 (多個 channel / die)，超過時依到達順序排隊 (FCFS)
+    - 每寫滿 pages_per_block 個 page 要先 erase 一個新的 block，erase 時間算在寫滿後的下一次 program 上
+      (不模擬 garbage collection 的有效 page 搬移)
+    - 以 block 為單位寫回 (ClusteredCFLRUAlgorithm) 時，一次寫回 k 個 page 為一個操作，
+      第一個 page 需 program_us，同一個 block 的其他 page 以 cache program 連續寫入，各需 cluster_page_us
+
+每筆 access 在 trace 的 timestamp 到達 (trace 沒有時間時以 Poisson 過程合成)；
+Hit 的 response time 為 hit_us，Miss 讀取 page，若踢掉 Dirty Page 則須先寫回 (program 完成後 frame
+才能放新的 page)，response time = 讀取完成時間 - 到達時間。寫回本身的延遲 (送出到 program 完成) 另外統計。
+
+使用方式:
+    python flash_device.py trace.cflt --algorithms lru cflru clock-cflru --capacity 10000
+    python flash_device.py trace.csv --ratio 0.01 --queue-depth 8 --speedup 4   # 到達速度加快 4 倍
+"""
+import heapq
+import argparse
+from array import array
+
+import numpy as np
+from tqdm import tqdm
+
+from algorithm.spec import HIT, MISS_DIRTY_EVICT
+from trace_format import load_trace, remap_dense
+from grid_runner import ALGORITHMS
+
+
+PERCENTILES = (50, 90, 99, 99.9)
+CHUNK_SIZE = 1 << 16
+
+
+class FlashDevice:
+    """
+    FCFS 多佇列的 Flash 裝置: slots 為 queue_depth 個執行單元各自的空閒時間 (min-heap)，
+    每個操作交給最早空閒的單元，開始時間 = max(到達時間, 空閒時間)
+    """
+    def __init__(self, read_us=25.0, program_us=200.0, erase_us=1500.0, pages_per_block=64, queue_depth=32,
+                 cluster_page_us=50.0):
+        if queue_depth < 1:
+            raise ValueError(f"queue_depth must be at least 1, got {queue_depth}")
+        if pages_per_block < 1:
+            raise ValueError(f"pages_per_block must be at least 1, got {pages_per_block}")
+        self.read_us = read_us
+        self.program_us = program_us
+        self.erase_us = erase_us
+        self.pages_per_block = pages_per_block
+        self.queue_depth = queue_depth
+        self.cluster_page_us = cluster_page_us
+        self.reset()
+
+    def reset(self):
+        self.slots = [0.0] * self.queue_depth
+        self.reads = 0
+        self.programs = 0
+        self.write_ops = 0
+        self.erases = 0
+        self.busy_us = 0.0  # 所有執行單元的忙碌時間總和
+        self.last_completion = 0.0
+
+    def _submit(self, arrival, service):
+        """把一個操作排進裝置，回傳完成時間"""
+        start = self.slots[0]
+        if start < arrival:
+            start = arrival
+        end = start + service
+        heapq.heapreplace(self.slots, end)
+        self.busy_us += service
+        if end > self.last_completion:
+            self.last_completion = end
+        return end
+
+    def read(self, arrival):
+        self.reads += 1
+        return self._submit(arrival, self.read_us)
+
+    def program(self, arrival, pages=1):
+        """寫入 pages 個 page (同一次寫回)，回傳完成時間"""
+        service = self.program_us + (pages - 1) * self.cluster_page_us
+        # 第 p 個寫入的 page (p > 0 且為 pages_per_block 的倍數) 需要先 erase 一個新的 block
+        first = max(self.programs, 1)
+        last = self.programs + pages - 1
+        erases = last // self.pages_per_block - (first - 1) // self.pages_per_block
+        self.erases += erases
+        service += erases * self.erase_us
+        self.programs += pages
+        self.write_ops += 1
+        return self._submit(arrival, service)
+
+
+def synthesize_timestamps(n, arrival_rate, seed=0):
+    """Poisson 到達 (指數分佈的間隔)，arrival_rate 為每秒 access 數，回傳 float64 秒"""
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.exponential(1.0 / arrival_rate, n))
+
+
+def _percentile(sorted_latencies, q, extra_value, extra_count):
+    """
+    nearest-rank 百分位數；sorted_latencies 之外另有 extra_count 筆值為 extra_value 的樣本
+    (Hit 的 response time 全部相同，不必展開成 array)
+    """
+    n = len(sorted_latencies) + extra_count
+    if n == 0:
+        return 0.0
+    rank = max(1, int(np.ceil(q / 100 * n)))  # 第 rank 小 (1-based)
+    pos = int(np.searchsorted(sorted_latencies, extra_value, side='right'))
+    if rank <= pos:
+        return float(sorted_latencies[rank - 1])
+    if rank <= pos + extra_count:
+        return float(extra_value)
+    return float(sorted_latencies[rank - extra_count - 1])
+
+
+def replay(algo, trace, device, arrival_rate=10_000.0, speedup=1.0, hit_us=0.0, seed=0, progress=True):
+    """
+    以 algo 模擬 trace，並把 Miss / Dirty 寫回依時間送進 device，回傳結果 dict
+    :param trace: trace_format.Trace；沒有 timestamps 時以 arrival_rate (access/秒) 合成 Poisson 到達
+    :param speedup: 到達間隔縮短的倍數 (> 1 時負載加重，用來觀察裝置飽和時的行為)
+    :param hit_us: Hit 的 response time (微秒)
+    """
+    if getattr(algo, "dense_page_ids", False) and trace.page_map is None:
+        trace = remap_dense(trace)
+    if hasattr(algo, "trace"):
+        algo.trace = trace  # Belady MIN 需要未來資訊
+
+    n = len(trace)
+    timestamps = trace.timestamps
+    synthesized = timestamps is None
+    if synthesized:
+        timestamps = synthesize_timestamps(n, arrival_rate, seed)
+    # 秒 -> 微秒，以第一筆 access 為時間 0
+    origin = float(timestamps[0]) if n else 0.0
+
+    device.reset()
+    # 以 block 為單位寫回的演算法回報每次寫回的 page 數 (每個 Dirty Eviction 一筆)
+    pop_flush_sizes = getattr(algo, "pop_flush_sizes", None)
+    miss_latencies = array('d')
+    write_latencies = array('d')
+    bar = tqdm(total=n, desc=f"Replaying {algo.get_name()}", unit="ops") if progress else None
+
+    for start in range(0, n, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, n)
+        page_ids = trace.page_ids[start:stop].tolist()
+        is_writes = trace.is_writes[start:stop].astype(bool).tolist()
+        codes = np.frombuffer(algo.access_batch(page_ids, is_writes, return_results=True).results,
+                              dtype=np.uint8)
+        miss_idx = np.flatnonzero(codes != HIT)
+        arrivals = ((np.asarray(timestamps[start:stop][miss_idx], dtype=np.float64) - origin)
+                    * (1e6 / speedup)).tolist()
+        flush_sizes = iter(pop_flush_sizes()) if pop_flush_sizes is not None else None
+        read = device.read
+        program = device.program
+        for arrival, code in zip(arrivals, codes[miss_idx].tolist()):
+            ready = arrival
+            if code == MISS_DIRTY_EVICT:
+                ready = program(arrival, next(flush_sizes) if flush_sizes is not None else 1)
+                write_latencies.append(ready - arrival)
+            miss_latencies.append(read(ready) - arrival)
+        if bar is not None:
+            bar.update(stop - start)
+    if bar is not None:
+        bar.close()
+
+    misses = len(miss_latencies)
+    hits = n - misses
+    lat = np.sort(np.frombuffer(miss_latencies, dtype=np.float64)) if misses else np.empty(0)
+    last_arrival = (float(timestamps[n - 1]) - origin) * 1e6 / speedup if n else 0.0
+    makespan_us = max(device.last_completion, last_arrival)
+
+    result = {
+        "algorithm": algo.get_name(),
+        "capacity": algo.capacity,
+        "total_access": n,
+        "total_miss": misses,
+        "miss_rate": misses / n if n else 0.0,
+        "flash_reads": device.reads,
+        "flash_writes": device.programs,
+        "write_ops": device.write_ops,
+        "erases": device.erases,
+        "timestamps": "synthesized" if synthesized else "trace",
+        "mean_us": (float(lat.sum()) + hits * hit_us) / n if n else 0.0,
+        "miss_mean_us": float(lat.mean()) if misses else 0.0,
+        "max_us": float(lat[-1]) if misses else hit_us,
+        "write_mean_us": float(np.mean(write_latencies)) if write_latencies else 0.0,
+        "throughput_iops": n / (makespan_us / 1e6) if makespan_us > 0 else 0.0,
+        "device_utilization": device.busy_us / (makespan_us * device.queue_depth) if makespan_us > 0 else 0.0,
+    }
+    for q in PERCENTILES:
+        result[f"p{q:g}_us"] = _percentile(lat, q, hit_us, hits)
+        result[f"miss_p{q:g}_us"] = _percentile(lat, q, 0.0, 0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以 Flash 裝置時間模型比較各演算法的 response time 與 throughput")
+    parser.add_argument("trace", help="trace 路徑 (CSV / .cflt / .cfla)")
+    parser.add_argument("--algorithms", nargs="+", default=["lru", "cflru", "clock-cflru"],
+                        choices=list(ALGORITHMS))
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--capacity", type=int, help="cache 容量 (page 數)")
+    size.add_argument("--ratio", type=float, help="cache 容量佔 unique page 數的比例")
+    parser.add_argument("--read-us", type=float, default=25.0, help="page read 延遲 (微秒)")
+    parser.add_argument("--program-us", type=float, default=200.0, help="page program 延遲 (微秒)")
+    parser.add_argument("--erase-us", type=float, default=1500.0, help="block erase 延遲 (微秒)")
+    parser.add_argument("--pages-per-block", type=int, default=64,
+                        help="每個 erase block 的 page 數 (也用於以 block 為單位寫回的演算法)")
+    parser.add_argument("--cluster-page-us", type=float, default=50.0,
+                        help="同一次寫回中第二個之後的 page 各需的 program 時間 (微秒)")
+    parser.add_argument("--queue-depth", type=int, default=32, help="可同時執行的操作數")
+    parser.add_argument("--hit-us", type=float, default=0.0, help="Hit 的 response time (微秒)")
+    parser.add_argument("--arrival-rate", type=float, default=10_000.0,
+                        help="trace 沒有 timestamp 時合成的到達速度 (access/秒)")
+    parser.add_argument("--speedup", type=float, default=1.0, help="到達間隔縮短的倍數")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    capacity = args.capacity
+    if capacity is None:
+        capacity = max(5, int(len(np.unique(trace.page_ids)) * args.ratio))
+    device = FlashDevice(args.read_us, args.program_us, args.erase_us, args.pages_per_block, args.queue_depth,
+                         args.cluster_page_us)
+
+    results = []
+    for name in args.algorithms:
+        algo_class, params = ALGORITHMS[name]
+        if "pages_per_block" in params:
+            params = dict(params, pages_per_block=args.pages_per_block)
+        results.append(replay(algo_class(capacity, **params), trace, device, args.arrival_rate,
+                              args.speedup, args.hit_us))
+
+    print(f"\nCapacity {capacity}, timestamps: {results[0]['timestamps'] if results else '-'}")
+    print(f"{'Algorithm':<28}{'Miss':>8}{'Writes':>10}{'WriteOps':>10}{'Erases':>8}{'WriteLat':>10}{'Mean':>10}"
+          f"{'p50':>9}{'p99':>10}{'p99.9':>10}{'IOPS':>12}{'Util':>7}")
+    for r in results:
+        print(f"{r['algorithm']:<28}{r['miss_rate']:>8.2%}{r['flash_writes']:>10,}{r['write_ops']:>10,}"
+              f"{r['erases']:>8,}{r['write_mean_us']:>10.1f}"
+              f"{r['mean_us']:>10.1f}{r['p50_us']:>9.1f}{r['p99_us']:>10.1f}{r['p99.9_us']:>10.1f}"
+              f"{r['throughput_iops']:>12,.0f}{r['device_utilization']:>7.1%}")
+    print("(latency in microseconds)")
+
+
+if __name__ == "__main__":
+    main()
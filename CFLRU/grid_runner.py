@@ -0,0 +1,319 @@
+"""
+平行實驗網格: traces x algorithms x capacities
+
+每個 trace 先轉成二進位格式 (trace_format) 並只解碼一次，worker process 以 memory-map
+開啟同一份檔案 (共用 OS page cache)。每個組合在獨立的 process 執行 (同時最多 --workers 個)，
+超時或異常結束的 process 會被 kill / 記錄下來，不會拖住其他組合。
+結果彙整成一張表 (依副檔名輸出 CSV 或 JSON)，每完成一個組合就更新一次。
+
+使用方式:
+    python grid_runner.py --traces a.csv b.cflt c.cfla --algorithms lru cflru cflru-static belady \\
+        --ratios 0.001 0.01 0.1 --workers 8 --timeout 3600 --out results.csv
+"""
+import os
+import csv
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from algorithm.lru_algo import LRUAlgorithm, ArrayLRUAlgorithm
+from algorithm.cflru import CFLRUAlgorithm, ArrayCFLRUAlgorithm, ClusteredCFLRUAlgorithm
+from algorithm.clock_cflru import ClockCFLRUAlgorithm
+from algorithm.beladys_min_algo import BeladyMINAlgorithm
+from algorithm.cost_min import CostAwareGreedyAlgorithm, flash_cost_lower_bound
+from algorithm.instrumentation import Instrumentation
+from simulate_framework import run_simulation, BlockCostModel
+from trace_format import (is_binary_trace, is_archive, csv_to_binary, archive_to_binary, load_binary_trace,
+                          remap_dense)
+from result_cache import ResultCache
+
+
+# 演算法名稱 -> (類別, 建構參數)
+ALGORITHMS = {
+    "lru": (LRUAlgorithm, {}),
+    "cflru": (CFLRUAlgorithm, {"mode": "dynamic"}),
+    "cflru-static": (CFLRUAlgorithm, {"mode": "static"}),
+    "cflru-ghost": (CFLRUAlgorithm, {"mode": "dynamic", "tuner": "ghost"}),
+    "clock-cflru": (ClockCFLRUAlgorithm, {"mode": "dynamic"}),
+    "belady": (BeladyMINAlgorithm, {}),
+    "cost-greedy": (CostAwareGreedyAlgorithm, {}),
+    "lru-array": (ArrayLRUAlgorithm, {}),
+    "cflru-array": (ArrayCFLRUAlgorithm, {"mode": "dynamic"}),
+    "cflru-clustered": (ClusteredCFLRUAlgorithm, {"mode": "dynamic", "pages_per_block": 64}),
+}
+
+# 成本下界: 不是演算法，只回報 total_cost (見 algorithm.cost_min.flash_cost_lower_bound)
+BOUNDS = {
+    "cost-lower-bound": flash_cost_lower_bound,
+}
+
+# 模擬迴圈在 chunk 之間檢查 deadline；超過 timeout 這麼多秒仍未結束的 job 直接 kill
+KILL_GRACE_SEC = 5.0
+
+RESULT_FIELDS = [
+    "trace", "algorithm", "params", "ratio", "capacity", "status",
+    "total_access", "total_miss", "miss_rate", "total_cost", "flash_writes", "write_ops",
+    "block_write_amplification", "elapsed_sec",
+]
+METRIC_FIELDS = ("total_access", "total_miss", "miss_rate", "total_cost", "flash_writes", "write_ops",
+                 "block_write_amplification")
+
+
+def prepare_trace(path, cache_dir):
+    """CSV trace / archive 轉成二進位檔 (已轉過且比原檔新就直接使用)，回傳二進位檔路徑"""
+    if is_binary_trace(path):
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # 不同目錄的同名 trace 不能共用同一個轉換檔，檔名加上絕對路徑的 hash
+    base = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]
+    out_path = os.path.join(cache_dir, f"{base}-{digest}.cflt")
+    if not os.path.exists(out_path) or os.path.getmtime(out_path) < os.path.getmtime(path):
+        print(f"Converting {path} -> {out_path}")
+        if is_archive(path):
+            archive_to_binary(path, out_path)
+        else:
+            csv_to_binary(path, out_path)
+    return out_path
+
+
+def _job_row(job, **fields):
+    """結果列中描述 job 本身的欄位"""
+    return {
+        "trace": job["trace"],
+        "algorithm": job["algorithm"],
+        "params": json.dumps(job["params"], sort_keys=True),
+        "ratio": job["ratio"],
+        "capacity": job["capacity"],
+        **fields,
+    }
+
+
+def _run_job(job):
+    """Worker: 開啟 memory-mapped trace，執行一個組合並回傳結果列"""
+    row = _job_row(job)
+    start = time.monotonic()
+    if job["algorithm"] in BOUNDS:
+        try:
+            bound = BOUNDS[job["algorithm"]](load_binary_trace(job["binary_path"]), job["capacity"])
+            row.update(status="ok", total_access=bound["total_access"], total_cost=bound["total_cost"])
+        except Exception as e:
+            row["status"] = f"error: {e}"
+        row["elapsed_sec"] = round(time.monotonic() - start, 3)
+        return row
+
+    algo_class, defaults = ALGORITHMS[job["algorithm"]]
+    params = dict(defaults, **job["params"])
+
+    deadline = start + job["timeout"] if job["timeout"] else None
+    try:
+        trace = load_binary_trace(job["binary_path"])
+        if getattr(algo_class, "dense_page_ids", False):
+            trace = remap_dense(trace)
+            params.setdefault("num_pages", len(trace.page_map))
+        algo = algo_class(capacity=job["capacity"], **params)
+        if job.get("stats_path"):
+            algo.stats = Instrumentation()
+        result = run_simulation(algo, trace, progress=False, deadline=deadline,
+                                stats_path=job.get("stats_path"), cost_model=BlockCostModel.for_algorithm(algo))
+        row.update(status="ok", **{k: result[k] for k in METRIC_FIELDS})
+    except TimeoutError:
+        row["status"] = "timeout"
+    except Exception as e:
+        row["status"] = f"error: {e}"
+    row["elapsed_sec"] = round(time.monotonic() - start, 3)
+    return row
+
+
+def build_jobs(traces, algorithms, ratios, timeout, cache_dir, min_capacity=5, params=None):
+    """展開所有組合；capacity = working set size * ratio (至少 min_capacity)"""
+    jobs = []
+    for path in traces:
+        binary_path = prepare_trace(path, cache_dir)
+        working_set_size = len(np.unique(load_binary_trace(binary_path).page_ids))
+        for name in algorithms:
+            if name not in ALGORITHMS and name not in BOUNDS:
+                raise ValueError(f"未知的演算法: {name} (可用: {', '.join([*ALGORITHMS, *BOUNDS])})")
+            for r in ratios:
+                jobs.append({
+                    "trace": path,
+                    "binary_path": binary_path,
+                    "algorithm": name,
+                    "params": dict((params or {}).get(name, {})),
+                    "ratio": r,
+                    "capacity": max(min_capacity, int(working_set_size * r)),
+                    "timeout": timeout,
+                })
+    return jobs
+
+
+def write_results(rows, out_path, fields=RESULT_FIELDS):
+    """依副檔名輸出 JSON 或 CSV (CSV 欄位依 fields)；先寫暫存檔再 rename，中斷時不會留下半個檔案"""
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    if out_path.endswith(".json"):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    os.replace(tmp_path, out_path)
+
+
+def _job_main(job, conn):
+    """子 process 的進入點: 把結果列送回主 process"""
+    try:
+        conn.send(_run_job(job))
+    finally:
+        conn.close()
+
+
+def run_jobs(jobs, workers=None, timeout_grace=KILL_GRACE_SEC):
+    """
+    每個 job 在獨立的 process 執行 (同時最多 workers 個)，完成一個就 yield (index, 結果列)。
+    模擬迴圈的 deadline 只在 chunk 之間檢查，成本下界等不會檢查 deadline 的 job 也可能卡住，
+    所以超過 job["timeout"] + timeout_grace 秒仍未結束的 process 直接 kill，記為 "timeout"；
+    process 異常結束 (例如被 OOM killer 終止) 時記為 "error: ..."，不影響其他 job
+    """
+    ctx = multiprocessing.get_context()
+    workers = workers or os.cpu_count()
+    waiting = list(range(len(jobs)))
+    running = {}  # index -> (process, 接收結果的 connection, 開始時間)
+    try:
+        while waiting or running:
+            while waiting and len(running) < workers:
+                i = waiting.pop(0)
+                recv_conn, send_conn = ctx.Pipe(duplex=False)
+                process = ctx.Process(target=_job_main, args=(jobs[i], send_conn), daemon=True)
+                process.start()
+                send_conn.close()
+                running[i] = (process, recv_conn, time.monotonic())
+
+            now = time.monotonic()
+            limits = [start + jobs[i]["timeout"] + timeout_grace
+                      for i, (_, _, start) in running.items() if jobs[i]["timeout"]]
+            wait([conn for _, conn, _ in running.values()],
+                 timeout=max(0.0, min(limits) - now) if limits else None)
+
+            now = time.monotonic()
+            for i, (process, conn, start) in list(running.items()):
+                job = jobs[i]
+                if conn.poll():
+                    try:
+                        row = conn.recv()
+                    except EOFError:
+                        process.join()
+                        row = _job_row(job, status=f"error: worker exited with code {process.exitcode}",
+                                       elapsed_sec=round(now - start, 3))
+                elif job["timeout"] and now - start > job["timeout"] + timeout_grace:
+                    process.kill()
+                    row = _job_row(job, status="timeout", elapsed_sec=round(now - start, 3))
+                else:
+                    continue
+                process.join()
+                conn.close()
+                del running[i]
+                yield i, row
+    finally:
+        for process, conn, _ in running.values():
+            process.kill()
+            conn.close()
+
+
+def _cache_key(result_cache, job):
+    """job 在結果快取中的 key (以原始 trace 檔計算，與 simulate_framework.test_framework 共用)"""
+    algo_class, defaults = ALGORITHMS[job["algorithm"]]
+    # num_pages 只決定 array 大小，不影響結果，這裡不需要建立 dense mapping
+    algo = algo_class(capacity=job["capacity"], **dict(defaults, **job["params"]))
+    return result_cache.simulation_key(job["trace"], algo, run_simulation), algo.get_name()
+
+
+def run_grid(traces, algorithms, ratios, workers=None, timeout=None,
+             out_path="results.csv", cache_dir=".trace_cache", params=None, instrument=False,
+             result_cache=None):
+    """
+    執行整個實驗網格並寫出結果表
+    :param params: {algorithm 名稱: 額外建構參數}，例如 {"cflru": {"window_size_ratio": 0.5}}
+    :param instrument: True 時每個 job 開啟 instrumentation，JSON 寫到結果表旁邊的 stats/
+    :param result_cache: result_cache.ResultCache；已有結果的組合直接使用快取，只模擬缺少的組合
+                         (instrument 需要實際執行，不使用快取)
+    :return: 結果列 list (與 job 展開的順序相同)
+    """
+    jobs = build_jobs(traces, algorithms, ratios, timeout, cache_dir, params=params)
+    if instrument:
+        # 每個 job 的 instrumentation JSON 放在結果表旁邊的 stats/ 目錄
+        stats_dir = os.path.join(os.path.dirname(out_path), "stats")
+        os.makedirs(stats_dir, exist_ok=True)
+        for i, job in enumerate(jobs):
+            base = os.path.splitext(os.path.basename(job["trace"]))[0]
+            job["stats_path"] = os.path.join(
+                stats_dir, f"{i:04d}-{base}-{job['algorithm']}-cap{job['capacity']}.json")
+
+    rows = [None] * len(jobs)
+    keys = {}  # job index -> (cache key, 演算法名稱)
+    if result_cache is not None and not instrument:
+        for i, job in enumerate(jobs):
+            if job["algorithm"] in BOUNDS:
+                continue
+            keys[i] = _cache_key(result_cache, job)
+            cached = result_cache.get(keys[i][0])
+            if cached is not None:
+                rows[i] = _job_row(job, status="ok", elapsed_sec=0.0, **{k: cached[k] for k in METRIC_FIELDS})
+    pending = [i for i, row in enumerate(rows) if row is None]
+    print(f"Running {len(pending)} jobs on {workers or os.cpu_count()} workers "
+          f"({len(jobs) - len(pending)} cached)")
+
+    for done, (j, row) in enumerate(run_jobs([jobs[i] for i in pending], workers), 1):
+        i = pending[j]
+        rows[i] = row
+        if row["status"] == "ok" and i in keys:
+            key, name = keys[i]
+            result_cache.put(key, dict({k: row[k] for k in METRIC_FIELDS},
+                                       algorithm=name, capacity=row["capacity"]))
+        print(f"[{done}/{len(pending)}] {row['trace']} {row['algorithm']} "
+              f"cap={row['capacity']}: {row['status']} ({row['elapsed_sec']}s)")
+        # 每完成一個 job 就更新結果表，中途中斷時已完成的結果不會遺失
+        write_results([r for r in rows if r is not None], out_path)
+
+    write_results(rows, out_path)
+    print(f"Results written to {out_path}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="平行執行 traces x algorithms x capacities 實驗")
+    parser.add_argument("--traces", nargs="+", required=True, help="trace 檔案 (CSV / .cflt / .cfla)")
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS),
+                        help=f"演算法 ({', '.join(ALGORITHMS)})；加上 {', '.join(BOUNDS)} 回報成本下界。"
+                             "cflru-ghost 另外維護三個取樣的影子 cache，通常比 cflru 慢 1.5 - 2 倍")
+    parser.add_argument("--ratios", nargs="+", type=float, default=[0.001, 0.01, 0.1],
+                        help="capacity 佔 working set size 的比例")
+    parser.add_argument("--workers", type=int, default=None, help="process 數 (預設為 CPU 數)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help=f"每個 job 的時間上限 (秒)，超過上限 {KILL_GRACE_SEC:g} 秒後仍未結束的 process 直接 kill")
+    parser.add_argument("--out", default="results.csv", help="輸出檔 (.csv 或 .json)")
+    parser.add_argument("--cache-dir", default=".trace_cache", help="CSV 轉出的二進位 trace 存放位置")
+    parser.add_argument("--instrument", action="store_true",
+                        help="開啟演算法內部統計，每個 job 匯出一份 JSON 到結果表旁的 stats/")
+    parser.add_argument("--result-cache", default=".result_cache",
+                        help="結果快取目錄，已跑過的組合直接使用快取 (見 result_cache.py)")
+    parser.add_argument("--no-result-cache", action="store_true", help="不讀寫結果快取，全部重新模擬")
+    args = parser.parse_args()
+
+    result_cache = None if args.no_result_cache else ResultCache(args.result_cache)
+    run_grid(args.traces, args.algorithms, args.ratios, args.workers, args.timeout,
+             args.out, args.cache_dir, instrument=args.instrument, result_cache=result_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+CFLRU 參數掃描 (lockstep 多組設定同時模擬)
+
+每個 trace chunk 只解碼一次，依序餵給 K 個 CFLRUAlgorithm (不同 window_size_ratio /
+static 或 dynamic / dynamic_period / write_cost)，整份 trace 只讀一遍；
+成本 = 解碼一次 + K 次 cache 更新，而不是 K 次完整的 test_framework。
+write_cost 只是演算法調整視窗時用的權重；所有設定的 total_cost 都以同一個 BlockCostModel 計分
+(與 run_simulation 相同)，排名才有意義。
+
+使用方式:
+    python multi_config.py trace.cflt --capacity 5000 \\
+        --ratios 0.1 0.25 0.5 0.75 --modes static dynamic --periods 500 1000 --out sweep.csv
+"""
+import time
+import itertools
+import argparse
+
+from tqdm import tqdm
+
+from algorithm.cflru import CFLRUAlgorithm
+from trace_format import load_trace
+from grid_runner import write_results
+from simulate_framework import BlockCostModel
+
+
+CONFIG_FIELDS = ["window_size_ratio", "mode", "dynamic_period", "write_cost"]
+RESULT_FIELDS = CONFIG_FIELDS + [
+    "capacity", "total_access", "total_miss", "miss_rate", "total_cost", "flash_writes",
+]
+
+
+def sweep_configs(ratios=(0.25,), modes=("dynamic",), periods=(1000,), write_costs=(8,)):
+    """
+    展開所有參數組合，回傳 config dict 的 list
+    static mode 不使用 dynamic_period，只展開一次
+    """
+    configs = []
+    for ratio, mode, write_cost in itertools.product(ratios, modes, write_costs):
+        for period in (periods if mode == "dynamic" else periods[:1]):
+            configs.append({
+                "window_size_ratio": ratio,
+                "mode": mode,
+                "dynamic_period": period,
+                "write_cost": write_cost,
+            })
+    return configs
+
+
+def run_lockstep(trace, capacity, configs, progress=True, algo_class=CFLRUAlgorithm, cost_model=None):
+    """
+    同一份 trace 以 lockstep 方式跑所有設定
+    :param trace: trace_format.Trace
+    :param configs: algo_class 建構參數 dict 的 list (見 sweep_configs)
+    :param cost_model: 所有設定共用的 BlockCostModel，None 時與 run_simulation 相同使用預設參數
+    :return: 與 configs 同順序的結果 dict list；total_cost 一律以 cost_model 計算 (不是各設定的 write_cost)
+    """
+    algos = [algo_class(capacity, **config) for config in configs]
+    cost_model = cost_model or BlockCostModel.for_algorithm(algos[0])
+    misses = [0] * len(algos)
+    dirty = [0] * len(algos)
+
+    bar = tqdm(total=len(trace), desc=f"Simulating {len(algos)} configs", unit="ops") if progress else None
+    for page_ids, is_writes in trace.iter_chunks():
+        for k, algo in enumerate(algos):
+            batch = algo.access_batch(page_ids, is_writes)
+            misses[k] += batch.misses
+            dirty[k] += batch.dirty_evictions
+        if bar is not None:
+            bar.update(len(page_ids))
+    if bar is not None:
+        bar.close()
+
+    total = len(trace)
+    rows = []
+    for k, config in enumerate(configs):
+        rows.append(dict(
+            config,
+            capacity=capacity,
+            total_access=total,
+            total_miss=misses[k],
+            miss_rate=misses[k] / total if total else 0.0,
+            total_cost=cost_model.read_cost * misses[k] + cost_model.write_cost_of(dirty[k], dirty[k]),
+            flash_writes=dirty[k],
+        ))
+    return rows
+
+
+def print_rows(rows):
+    """依 total_cost 排序輸出 (Tune W. 為演算法調整用的 write_cost，不影響 total_cost)"""
+    print(f"{'Ratio':>6} {'Mode':>8} {'Period':>7} {'Tune W.':>7} {'Miss Rate':>10} "
+          f"{'Total Cost':>12} {'Flash Writes':>13}")
+    for row in sorted(rows, key=lambda r: r["total_cost"]):
+        period = row["dynamic_period"] if row["mode"] == "dynamic" else "-"
+        print(f"{row['window_size_ratio']:>6} {row['mode']:>8} {period:>7} {row['write_cost']:>7} "
+              f"{row['miss_rate']:>10.2%} {row['total_cost']:>12,} {row['flash_writes']:>13,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CFLRU 參數掃描 (trace 只讀一次)")
+    parser.add_argument("trace", help="trace 路徑 (CSV 或 .cflt)")
+    parser.add_argument("--capacity", type=int, required=True)
+    parser.add_argument("--ratios", nargs="+", type=float, default=[0.1, 0.25, 0.5, 0.75])
+    parser.add_argument("--modes", nargs="+", choices=["static", "dynamic"], default=["static", "dynamic"])
+    parser.add_argument("--periods", nargs="+", type=int, default=[1000], help="dynamic_period")
+    parser.add_argument("--write-costs", nargs="+", type=int, default=[8],
+                        help="演算法調整視窗用的 Flash Write 權重 (total_cost 固定以預設成本模型計分)")
+    parser.add_argument("--out", default=None, help="輸出檔 (.csv 或 .json)")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    configs = sweep_configs(args.ratios, args.modes, args.periods, args.write_costs)
+    start = time.monotonic()
+    rows = run_lockstep(trace, args.capacity, configs)
+    print(f"{len(configs)} configs, {len(trace)} accesses, {time.monotonic() - start:.1f}s")
+    print_rows(rows)
+    if args.out:
+        write_results(rows, args.out, RESULT_FIELDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Content-addressed 的實驗結果快取
+
+每個模擬結果以下列欄位的 SHA-256 為 key，存成 <root>/<key 前兩碼>/<key>.json:
+    - trace 內容的雜湊 (blake2b，檔案路徑 / 大小 / mtime 沒變時直接沿用上次算的值)
+    - 演算法類別與建構後的設定 (algorithm_config: capacity / mode / window_size / dynamic_period ...)
+    - 程式碼版本 (演算法所在模組與相依的 algorithm.* 模組原始碼，加上模擬迴圈所在模組
+      與它引用的專案模組，例如 simulate_framework / trace_format，的完整原始碼)
+任何一項改變都會得到新的 key，不需要手動清除快取；同一組實驗重跑時直接讀取結果。
+
+    cache = ResultCache()
+    key = cache.simulation_key(trace_path, algo, run_simulation)   # 必須在模擬之前呼叫
+    result = cache.get(key)
+    if result is None:
+        result = run_simulation(algo, trace)
+        cache.put(key, result)
+"""
+import os
+import sys
+import json
+import inspect
+import hashlib
+
+
+DEFAULT_DIR = ".result_cache"
+# 結果格式有不相容的變更時遞增
+SCHEMA_VERSION = 1
+_CONFIG_TYPES = (bool, int, float, str)
+# 這個目錄下的模組算是專案程式碼 (其他為標準函式庫 / 第三方套件)
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def algorithm_config(algo):
+    """
+    演算法物件的設定: 所有公開的純量屬性 (建構參數與由它們決定的初始值)，
+    屬性為 algorithm.* 的物件時 (例如 CFLRU 的 GhostWindows) 遞迴取出它的設定
+    模擬過程會改變這些值，所以必須在模擬之前取得
+    """
+    config = {}
+    for name, value in sorted(vars(algo).items()):
+        if name.startswith('_'):
+            continue
+        if isinstance(value, _CONFIG_TYPES):
+            config[name] = value
+        elif type(value).__module__.startswith('algorithm.') and hasattr(value, '__dict__'):
+            config[name] = algorithm_config(value)
+    return config
+
+
+def config_digest(algo):
+    """algorithm_config 的短雜湊 (同樣必須在模擬之前取得)，用來辨識 checkpoint 屬於哪一組設定"""
+    data = json.dumps(algorithm_config(algo), sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()[:12]
+
+
+def _module_sources(cls):
+    """cls 的 MRO 中各類別所在模組，以及這些模組引用的 algorithm.* 模組"""
+    names = {c.__module__ for c in cls.__mro__ if c is not object}
+    for name in list(names):
+        for value in vars(sys.modules[name]).values():
+            module = getattr(value, '__module__', None) if not inspect.ismodule(value) else value.__name__
+            if module and module.startswith('algorithm.'):
+                names.add(module)
+    return sorted(names)
+
+
+def _project_modules(objects):
+    """
+    objects 所在的模組，以及這些模組 (遞迴) 引用的專案模組，回傳 {專案內的相對路徑: 模組}
+    algorithm.* 模組不在這裡追蹤 (由 _module_sources 依演算法類別決定)。
+    以檔案路徑為 key，直接執行的 script (__main__) 與 import 進來的同一個模組得到相同的結果
+    """
+    found = {}
+    pending = [sys.modules[obj.__module__] for obj in objects]
+    while pending:
+        module = pending.pop()
+        path = os.path.abspath(getattr(module, '__file__', None) or '')
+        if not path.startswith(_PROJECT_DIR + os.sep) or module.__name__.startswith('algorithm.'):
+            continue
+        rel_path = os.path.relpath(path, _PROJECT_DIR)
+        if rel_path in found:
+            continue
+        found[rel_path] = module
+        for value in vars(module).values():
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+            if isinstance(name, str) and name in sys.modules:
+                pending.append(sys.modules[name])
+    return found
+
+
+def _update_sources(h, objects):
+    for rel_path, module in sorted(_project_modules(objects).items()):
+        h.update(rel_path.encode())
+        h.update(inspect.getsource(module).encode())
+
+
+def _sources_digest(objects):
+    h = hashlib.sha256()
+    _update_sources(h, objects)
+    return h.hexdigest()
+
+
+def code_version(cls, *objects):
+    """
+    演算法程式碼的版本雜湊
+    :param objects: 其他會影響結果的函式 / 類別 (例如 run_simulation)，雜湊它們所在的整個模組
+                    與引用的專案模組 (BlockCostModel、collapse_runs 等改變時同樣會得到新的版本)
+    """
+    h = hashlib.sha256()
+    for name in _module_sources(cls):
+        h.update(name.encode())
+        h.update(inspect.getsource(sys.modules[name]).encode())
+    _update_sources(h, objects)
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root=DEFAULT_DIR):
+        self.root = root
+        self._digest_index_path = os.path.join(root, "trace_digests.json")
+        self._digests = None
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def trace_digest(self, path):
+        """trace 檔內容的雜湊；路徑、大小與 mtime 都沒變時沿用記錄的值，不重新讀檔"""
+        if self._digests is None:
+            try:
+                with open(self._digest_index_path, encoding="utf-8") as f:
+                    self._digests = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._digests = {}
+
+        st = os.stat(path)
+        abspath = os.path.abspath(path)
+        entry = self._digests.get(abspath)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["digest"]
+
+        h = hashlib.blake2b(digest_size=32)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self._digests[abspath] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "digest": digest}
+        self._write_json(self._digest_index_path, self._digests)
+        return digest
+
+    def make_key(self, fields):
+        """欄位 dict -> key"""
+        data = json.dumps(dict(fields, schema=SCHEMA_VERSION), sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def simulation_key(self, trace_path, algo, *code_objects):
+        """模擬結果的 key (見模組說明)；code_objects 為模擬迴圈等其他影響結果的程式碼"""
+        return self.make_key({
+            "kind": "simulation",
+            "trace": self.trace_digest(trace_path),
+            "algorithm": f"{type(algo).__module__}.{type(algo).__qualname__}",
+            "config": algorithm_config(algo),
+            "code": code_version(type(algo), *code_objects),
+        })
+
+    def trace_stats_key(self, trace_path, func, **params):
+        """trace 統計 (例如 utils.analyze_trace) 的 key；params 為 func 的其他參數"""
+        return self.make_key({
+            "kind": "trace_stats",
+            "trace": self.trace_digest(trace_path),
+            "function": f"{func.__module__}.{func.__qualname__}",
+            "params": params,
+            "code": _sources_digest([func]),
+        })
+
+    def get(self, key):
+        """回傳快取的結果，沒有時回傳 None"""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["result"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def put(self, key, result):
+        self._write_json(self._path(key), {"result": result})
@@ -0,0 +1,443 @@
+"""
+SHARDS 風格的 Spatial Hash Sampling (近似 Miss Ratio / Flash Write 曲線)
+
+每個 page_id 先 hash 成 [0, 2^24) 的值，只保留 hash < T 的 page (sampling rate R = T / 2^24)。
+同一個 page 不是全部保留就是全部丟掉，所以被保留的 page 之間的 reuse 行為完整保留，
+容量 C 的 cache 對應到 sampled stream 上容量 C * R 的 cache。
+    - 固定 rate: 記憶體與時間約為完整模擬的 R 倍
+    - 固定記憶體 (max_pages): 追蹤的 page 數超過上限時降低 T，踢掉 hash 最大的 page，
+      已累計的分布依 rate 的比例重新縮放 (SHARDS fixed-size)
+
+Miss / Dirty Eviction 的估計是每個 sampled access 以 1 / rate 加權後直接加總 (Horvitz-Thompson)，
+不是 sampled Miss / sampled access 的比例: 偏斜 (zipf) 的 trace 中少數熱門 page 是否被取樣
+會讓 sampled access 數偏離 N * rate 很多，而這些多 (少) 出來的 access 幾乎都是小距離的 Hit，
+用比例估計會把偏差灌進所有容量的 Miss Rate。直接加總等同 SHARDS-adj 把差額
+(N - sampled 權重) 補進最小距離的 Hit。sampled 容量 C * rate 只有個位數時仍會有離散化誤差。
+誤差估計把 sampled page 依 hash 的低位元分成 GROUPS 組，用 delete-one-group jackknife 計算。
+sampled_run (CFLRU 等任意演算法) 只有固定 rate 模式，jackknife 要把每組拿掉後重新模擬一次。
+
+使用方式:
+    python sampling.py <trace> --rate 0.01 --capacities 1000 10000 100000
+    python sampling.py <trace> --max-pages 8192 --capacities 1000 10000
+"""
+import math
+import argparse
+
+import numpy as np
+
+from trace_format import Trace, load_trace
+from stack_distance import StackDistanceAnalyzer, INF
+
+
+HASH_BITS = 24
+MODULUS = 1 << HASH_BITS
+GROUPS = 8                # jackknife 分組數
+SHRINK_KEEP = 0.9         # 固定記憶體模式每次降低 T 時保留的比例
+CHUNK_SIZE = 1 << 16
+
+
+def hash_pages(page_ids):
+    """
+    splitmix64 finalizer，回傳 (hash, group) 兩個 array
+    hash 取高 HASH_BITS 位元決定是否取樣，group 取低位元 (兩者互相獨立)
+    """
+    x = np.asarray(page_ids).astype(np.uint64)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return (x >> np.uint64(64 - HASH_BITS)).astype(np.int64), (x % np.uint64(GROUPS)).astype(np.int64)
+
+
+def _rate_to_threshold(rate):
+    if not 0 < rate <= 1:
+        raise ValueError(f"sampling rate must be in (0, 1], got {rate}")
+    return max(1, round(rate * MODULUS))
+
+
+class SpatialSampler:
+    """固定 rate 的 sampler，把 trace 縮成只含 sampled page 的 trace"""
+    def __init__(self, rate):
+        self.threshold = _rate_to_threshold(rate)
+
+    @property
+    def rate(self):
+        return self.threshold / MODULUS
+
+    def filter(self, page_ids, is_writes):
+        """回傳 sampled 的 (page_ids, is_writes) array"""
+        page_ids = np.asarray(page_ids)
+        keep = hash_pages(page_ids)[0] < self.threshold
+        return page_ids[keep], np.asarray(is_writes)[keep]
+
+    def sample_trace(self, trace):
+        """回傳 sampled Trace (逐 chunk 處理，memory-mapped 的 trace 不會整份讀進記憶體)"""
+        page_chunks = []
+        write_chunks = []
+        for start in range(0, len(trace), CHUNK_SIZE):
+            page_ids, is_writes = self.filter(trace.page_ids[start:start + CHUNK_SIZE],
+                                              trace.is_writes[start:start + CHUNK_SIZE])
+            page_chunks.append(page_ids)
+            write_chunks.append(is_writes)
+        if not page_chunks:
+            return Trace(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8), path=trace.path)
+        return Trace(np.concatenate(page_chunks), np.concatenate(write_chunks), path=trace.path)
+
+
+class SampledCurve:
+    """
+    Sampled stack distance 的結果，查詢時容量使用完整 trace 的單位
+    (內部換算成 C * rate，非整數時在相鄰兩個 sampled 容量之間線性內插)
+    *_error 只反映取樣到哪些 page 的變異；固定記憶體模式降低 rate 時重新縮放距離造成的偏差不包含在內
+    """
+    def __init__(self, total, rate, weights, hit_cum, dirty_cum):
+        self.total = total        # 完整 trace 的 access 數
+        self.rate = rate          # 最終的 sampling rate
+        self._weights = weights   # weights[g] = 第 g 組 sampled access 的權重總和
+        self._hit_cum = hit_cum   # hit_cum[g][c] = 第 g 組在 sampled 容量 c 的 Hit 權重
+        self._dirty_cum = dirty_cum
+
+    @property
+    def sampled_capacity_limit(self):
+        return len(self._hit_cum[0]) - 1
+
+    def _at(self, cum, capacity):
+        """cum 在 sampled 容量 capacity * rate 的值 (線性內插)"""
+        c = max(0.0, capacity * self.rate)
+        last = len(cum) - 1
+        lo = min(int(c), last)
+        hi = min(lo + 1, last)
+        frac = c - int(c) if lo < last else 0.0
+        return cum[lo] + (cum[hi] - cum[lo]) * frac
+
+    def _miss_weights(self, capacity):
+        return [w - self._at(cum, capacity) for w, cum in zip(self._weights, self._hit_cum)]
+
+    def _dirty_weights(self, capacity):
+        return [self._at(cum, capacity) for cum in self._dirty_cum]
+
+    def _fraction(self, values, skip=None):
+        """
+        各組的 (權重) 計數加總後除以完整 trace 的 access 數；skip 時剩下的組依比例放大
+        """
+        if not self.total:
+            return 0.0
+        kept = [v for g, v in enumerate(values) if g != skip]
+        return sum(kept) * len(values) / len(kept) / self.total
+
+    def _jackknife(self, values):
+        """delete-one-group jackknife 的標準誤"""
+        k = len(values)
+        estimates = [self._fraction(values, skip=g) for g in range(k)]
+        mean = sum(estimates) / k
+        return math.sqrt((k - 1) / k * sum((e - mean) ** 2 for e in estimates))
+
+    def miss_rate(self, capacity):
+        return min(1.0, max(0.0, self._fraction(self._miss_weights(capacity))))
+
+    def hit_rate(self, capacity):
+        return 1.0 - self.miss_rate(capacity)
+
+    def misses(self, capacity):
+        return self.miss_rate(capacity) * self.total
+
+    def dirty_evictions(self, capacity):
+        """估計的 flash write 次數"""
+        return max(0.0, self._fraction(self._dirty_weights(capacity))) * self.total
+
+    def total_cost(self, capacity, read_cost=1, write_cost=8):
+        return read_cost * self.misses(capacity) + write_cost * self.dirty_evictions(capacity)
+
+    def miss_rate_error(self, capacity, z=2.0):
+        """miss rate 的估計誤差 (z 倍標準誤，z=2 約為 95% 信賴區間的半寬)"""
+        return z * self._jackknife(self._miss_weights(capacity))
+
+    def dirty_evictions_error(self, capacity, z=2.0):
+        return z * self._jackknife(self._dirty_weights(capacity)) * self.total
+
+
+class SampledStackDistance(StackDistanceAnalyzer):
+    """
+    在 sampled stream 上做 stack distance 分析 (見 stack_distance.StackDistanceAnalyzer)
+
+        analyzer = SampledStackDistance(rate=0.01)            # 固定 rate
+        analyzer = SampledStackDistance(max_pages=8192)        # 固定記憶體，rate 從 1.0 往下降
+        curve = analyzer.process(trace).result()
+        curve.miss_rate(10000), curve.miss_rate_error(10000)
+    """
+    def __init__(self, rate=None, max_pages=None):
+        super().__init__()
+        if rate is None:
+            rate = 1.0 if max_pages else 0.01
+        self.threshold = _rate_to_threshold(rate)
+        self.max_pages = max_pages
+
+        self._hash = {}   # 追蹤中的 page -> hash (固定記憶體模式降低 T 時使用)
+        self._group = {}  # 追蹤中的 page -> jackknife 分組
+        # 每組各自一份 (權重) 分布，_hist / _dirty_diff 不使用
+        self._ghist = [[0.0] * 1024 for _ in range(GROUPS)]
+        self._gdirty = [[0.0] * 1024 for _ in range(GROUPS)]
+        self._gweight = [0.0] * GROUPS
+
+    @property
+    def rate(self):
+        return self.threshold / MODULUS
+
+    def _grow(self, d):
+        while d + 1 >= len(self._ghist[0]):
+            for lists in (self._ghist, self._gdirty):
+                for g in range(GROUPS):
+                    lists[g].extend([0.0] * len(lists[g]))
+
+    def _forget(self, pid):
+        """停止追蹤 pid (從 stack 中移除)"""
+        p = self._last.pop(pid)
+        i = p
+        while i <= self._size:
+            self._tree[i] -= 1
+            i += i & -i
+        del self._dirty_from[pid]
+        del self._hash[pid]
+        del self._group[pid]
+
+    def _shrink(self):
+        """追蹤的 page 超過 max_pages: 降低 T 只保留 hash 最小的 SHRINK_KEEP 比例"""
+        hashes = sorted(self._hash.values())
+        new_threshold = max(1, hashes[int(self.max_pages * SHRINK_KEEP)])
+        for pid in [pid for pid, h in self._hash.items() if h >= new_threshold]:
+            self._forget(pid)
+
+        # 既有的 sampled 容量單位依 rate 比例縮放
+        factor = new_threshold / self.threshold
+        self.threshold = new_threshold
+        for lists in (self._ghist, self._gdirty):
+            for g in range(GROUPS):
+                old = lists[g]
+                new = [0.0] * len(old)
+                for d, v in enumerate(old):
+                    if v:
+                        new[max(1, round(d * factor)) if d else 0] += v
+                lists[g] = new
+        dirty_from = self._dirty_from
+        for pid, dirty in dirty_from.items():
+            if dirty != INF and dirty > 0:
+                dirty_from[pid] = max(1, round(dirty * factor))
+
+    def feed(self, page_ids, is_writes):
+        """餵入一批 access (未取樣)，只有 hash < T 的 page 會被分析"""
+        page_ids = np.asarray(page_ids)
+        is_writes = np.asarray(is_writes)
+        hashes, groups = hash_pages(page_ids)
+        keep = hashes < self.threshold
+        self.total += len(page_ids)
+
+        last = self._last
+        dirty_from = self._dirty_from
+        ghist = self._ghist
+        gdirty = self._gdirty
+        gweight = self._gweight
+
+        for pid, is_w, h, g in zip(page_ids[keep].tolist(), is_writes[keep].tolist(),
+                                   hashes[keep].tolist(), groups[keep].tolist()):
+            if h >= self.threshold:
+                # 固定記憶體模式在這個 chunk 中途降低了 T
+                continue
+            if self._next_slot > self._size:
+                self._compact()
+            tree = self._tree
+            size = self._size
+            weight = MODULUS / self.threshold  # 1 / rate
+            gweight[g] += weight
+
+            p = last.get(pid)
+            if p is None:
+                self.cold_misses += 1
+                dirty = INF
+                self._hash[pid] = h
+                self._group[pid] = g
+            else:
+                i = p
+                before = 0
+                while i > 0:
+                    before += tree[i]
+                    i &= i - 1
+                d = len(last) - before + 1
+
+                i = p
+                while i <= size:
+                    tree[i] -= 1
+                    i += i & -i
+
+                self._grow(d)
+                ghist[g][d] += weight
+
+                dirty = dirty_from[pid]
+                if dirty < d:
+                    gdirty[g][max(dirty, 1)] += weight
+                    gdirty[g][d] -= weight
+                if d > dirty:
+                    dirty = d
+
+            if is_w:
+                dirty = 0
+            dirty_from[pid] = dirty
+
+            slot = self._next_slot
+            self._next_slot = slot + 1
+            last[pid] = slot
+            i = slot
+            while i <= size:
+                tree[i] += 1
+                i += i & -i
+
+            if self.max_pages and len(last) > self.max_pages:
+                self._shrink()
+                # _shrink 後 list 可能被替換
+                ghist = self._ghist
+                gdirty = self._gdirty
+
+    def process(self, trace):
+        """餵入整份 trace_format.Trace (直接切 NumPy 欄位，不轉成 Python list)"""
+        for start in range(0, len(trace), CHUNK_SIZE):
+            self.feed(trace.page_ids[start:start + CHUNK_SIZE], trace.is_writes[start:start + CHUNK_SIZE])
+        return self
+
+    def distance_histogram(self):
+        """回傳 (hist, cold_misses)，hist[d] = sampled stack distance 為 d 的 access 權重"""
+        hist = [sum(col) for col in zip(*self._ghist)]
+        return hist[:len(self._last) + 1], self.cold_misses
+
+    def result(self):
+        """整理成 SampledCurve (不會改變分析器狀態，可以繼續 feed)"""
+        working_set = len(self._last)
+        self._grow(working_set)
+        gdirty = [list(col) for col in self._gdirty]
+
+        # Trace 結束時仍在 stack 中的 dirty page (同 StackDistanceAnalyzer.result)
+        weight = MODULUS / self.threshold
+        by_slot = sorted(self._last.items(), key=lambda kv: kv[1])
+        for rank, (pid, _) in enumerate(by_slot, 1):
+            depth = working_set - rank + 1
+            dirty = self._dirty_from[pid]
+            if dirty < depth:
+                g = self._group[pid]
+                gdirty[g][max(dirty, 1)] += weight
+                gdirty[g][depth] -= weight
+
+        hit_cum = []
+        dirty_cum = []
+        for g in range(GROUPS):
+            hits = [0.0] * (working_set + 1)
+            dirty = [0.0] * (working_set + 1)
+            h = 0.0
+            w = 0.0
+            for c in range(1, working_set + 1):
+                h += self._ghist[g][c]
+                w += gdirty[g][c]
+                hits[c] = h
+                dirty[c] = w
+            hit_cum.append(hits)
+            dirty_cum.append(dirty)
+        return SampledCurve(self.total, self.rate, list(self._gweight), hit_cum, dirty_cum)
+
+
+def sampled_curve(path, rate=None, max_pages=None):
+    """讀取 trace 並回傳 SampledCurve"""
+    return SampledStackDistance(rate, max_pages).process(load_trace(path)).result()
+
+
+def _scaled_run(algo_factory, sampled, total, capacity, rate, cost_model):
+    """在 sampled trace 上以容量 capacity * rate 執行一次，計數以 1 / rate 放大回 total 筆 access 的規模"""
+    from simulate_framework import run_simulation, BlockCostModel
+
+    algo = algo_factory(max(1, round(capacity * rate)))
+    # CFLRU dynamic 以 access 數為週期，sampled stream 短了 1/rate 倍，週期同比例縮短
+    if hasattr(algo, "dynamic_period"):
+        algo.dynamic_period = max(1, round(algo.dynamic_period * rate))
+    cost_model = cost_model or BlockCostModel.for_algorithm(algo)
+    result = run_simulation(algo, sampled, progress=False, cost_model=cost_model)
+
+    # 計數以 1 / rate 放大 (與 SampledCurve 相同，不用 sampled access 數的比例)
+    sampled_access = result["total_access"]
+    scale = 1 / rate
+    flash_writes = round(result["flash_writes"] * scale)
+    write_ops = round(result["write_ops"] * scale)
+    total_miss = min(total, round(result["total_miss"] * scale))
+    result.update({
+        "capacity": capacity,
+        "total_access": total,
+        "total_miss": total_miss,
+        "miss_rate": total_miss / total if total else 0.0,
+        "total_cost": cost_model.read_cost * total_miss + cost_model.write_cost_of(write_ops, flash_writes),
+        "flash_writes": flash_writes,
+        "write_ops": write_ops,
+        "block_write_amplification": cost_model.write_amplification(write_ops, flash_writes),
+        "sampling_rate": rate,
+        "sampled_access": sampled_access,
+        "sampled_capacity": algo.capacity,
+    })
+    return result
+
+
+def sampled_run(algo_factory, trace, capacity, rate=0.01, cost_model=None, error=True, z=2.0):
+    """
+    在 sampled trace 上以容量 capacity * rate 執行任意演算法 (LRU / CFLRU ...)，
+    結果換算回完整 trace 的規模，格式同 run_simulation
+    誤差估計: sampled page 依 hash 低位元分成 GROUPS 組 (與取樣用的高位元互相獨立)，
+    每次拿掉一組就是 rate * (GROUPS-1)/GROUPS 的另一個 spatial sample，
+    重新模擬 GROUPS 次後以 delete-one-group jackknife 計算標準誤，
+    回傳的 *_error 為 z 倍標準誤 (z=2 約為 95% 信賴區間的半寬)，執行時間約為單次的 GROUPS 倍
+    限制:
+        - 只有固定 rate 模式，沒有 SampledStackDistance 的固定記憶體 (max_pages) 模式:
+          一般演算法無法在執行中途縮小 sampled 容量，記憶體約為 sampled trace (N * rate 筆) 加上 sampled cache
+        - sampled 容量 capacity * rate 只有個位數時離散化誤差很大，也不在 *_error 內
+    :param algo_factory: capacity -> 演算法物件
+    :param cost_model: simulate_framework.BlockCostModel，None 時依演算法的 pages_per_block 建立；
+                       total_cost 與 block_write_amplification 由換算後的計數重新計算
+    :param error: False 時不做 jackknife，*_error 為 None
+    """
+    sampler = SpatialSampler(rate)
+    sampled = sampler.sample_trace(trace)
+    result = _scaled_run(algo_factory, sampled, len(trace), capacity, sampler.rate, cost_model)
+
+    metrics = ("miss_rate", "flash_writes", "total_cost")
+    errors = dict.fromkeys(metrics)
+    if error:
+        groups = hash_pages(sampled.page_ids)[1]
+        estimates = []
+        for g in range(GROUPS):
+            keep = groups != g
+            subset = Trace(sampled.page_ids[keep], sampled.is_writes[keep], path=trace.path)
+            estimates.append(_scaled_run(algo_factory, subset, len(trace), capacity,
+                                         sampler.rate * (GROUPS - 1) / GROUPS, cost_model))
+        for key in metrics:
+            values = [e[key] for e in estimates]
+            mean = sum(values) / GROUPS
+            errors[key] = z * math.sqrt((GROUPS - 1) / GROUPS * sum((v - mean) ** 2 for v in values))
+    result.update({f"{key}_error": value for key, value in errors.items()})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="SHARDS 風格的 sampled LRU miss ratio / flash write 曲線",
+        epilog="其他演算法 (CFLRU ...) 請用 sampled_run: 只支援固定 rate，"
+               "誤差以 GROUPS 次 delete-one-group 重新模擬估計")
+    parser.add_argument("trace", help="trace 路徑 (CSV 或 .cflt)")
+    parser.add_argument("--rate", type=float, default=None, help="sampling rate (預設 0.01)")
+    parser.add_argument("--max-pages", type=int, default=None, help="固定記憶體: 最多追蹤的 page 數 (只用於 LRU 曲線，sampled_run 沒有這個模式)")
+    parser.add_argument("--capacities", type=int, nargs="+", required=True)
+    args = parser.parse_args()
+
+    curve = sampled_curve(args.trace, args.rate, args.max_pages)
+    print(f"Total Access: {curve.total}, Sampling Rate: {curve.rate:.5f}")
+    print(f"{'Capacity':>10} {'Miss Rate':>18} {'Flash Writes':>24} {'Total Cost':>14}")
+    for c in args.capacities:
+        print(f"{c:>10} {curve.miss_rate(c):>9.2%} ±{curve.miss_rate_error(c):>7.2%} "
+              f"{curve.dirty_evictions(c):>13,.0f} ±{curve.dirty_evictions_error(c):>9,.0f} "
+              f"{curve.total_cost(c):>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Sharded 模擬: 依 page_id 的 hash 把 cache 切成 S 個獨立的 sub-cache
+
+每個 shard 容量為 capacity / S，只處理 hash 落在自己的 page (同一個 page 永遠在同一個 shard)，
+各 shard 在不同 process 執行自己的演算法物件，最後把 Miss / Flash Write 加總。
+這就是實務上 partitioned buffer cache 的行為；單一 trace 的模擬可以隨 core 數線性擴展。
+開啟 compare 時另外跑一次不分割的 cache，回報 sharded 結果與它的差距。
+
+使用方式:
+    python sharded.py trace.cflt --algorithm cflru --capacity 100000 --shards 8 --compare
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from trace_format import Trace, load_binary_trace, remap_dense
+from grid_runner import ALGORITHMS, prepare_trace
+from sampling import hash_pages, CHUNK_SIZE
+from simulate_framework import run_simulation, BlockCostModel
+
+
+METRICS = ("total_access", "total_miss", "total_cost", "flash_writes", "write_ops")
+
+
+def shard_capacities(capacity, shards):
+    """capacity 平均分給每個 shard (餘數給前面幾個)"""
+    if capacity < shards:
+        raise ValueError(f"capacity ({capacity}) must be at least the number of shards ({shards})")
+    base, extra = divmod(capacity, shards)
+    return [base + (1 if s < extra else 0) for s in range(shards)]
+
+
+def shard_trace(trace, shard, shards):
+    """取出屬於第 shard 個 shard 的 sub-trace (逐 chunk 過濾)"""
+    page_chunks = []
+    write_chunks = []
+    for start in range(0, len(trace), CHUNK_SIZE):
+        page_ids = trace.page_ids[start:start + CHUNK_SIZE]
+        keep = hash_pages(page_ids)[0] % shards == shard
+        page_chunks.append(np.asarray(page_ids)[keep])
+        write_chunks.append(np.asarray(trace.is_writes[start:start + CHUNK_SIZE])[keep])
+    if not page_chunks:
+        return Trace(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8), trace.path)
+    return Trace(np.concatenate(page_chunks), np.concatenate(write_chunks), trace.path)
+
+
+def _run_shard(job):
+    """Worker: 開啟 memory-mapped trace，過濾出自己的 shard (shard = None 為不分割的 cache) 並模擬"""
+    start = time.monotonic()
+    trace = load_binary_trace(job["binary_path"])
+    if job["shard"] is not None:
+        trace = shard_trace(trace, job["shard"], job["shards"])
+
+    algo_class, defaults = ALGORITHMS[job["algorithm"]]
+    params = dict(defaults, **job["params"])
+    if getattr(algo_class, "dense_page_ids", False):
+        trace = remap_dense(trace)
+        params.setdefault("num_pages", len(trace.page_map))
+    algo = algo_class(capacity=job["capacity"], **params)
+
+    result = run_simulation(algo, trace, progress=False, cost_model=job["cost_model"])
+    result["shard"] = job["shard"]
+    result["elapsed_sec"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def run_sharded(trace_path, algorithm, capacity, shards, workers=None, compare=False,
+                params=None, cache_dir=".trace_cache"):
+    """
+    :param algorithm: grid_runner.ALGORITHMS 的名稱 (例如 "lru" / "cflru")
+    :param params: 額外的演算法建構參數 (每個 shard 相同)
+    :param compare: True 時同時跑不分割的 cache，結果加上 "unified" 與 "divergence"
+    :return: 加總後的結果 dict (格式同 run_simulation)，"shards" 為各 shard 的結果
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"未知的演算法: {algorithm} (可用: {', '.join(ALGORITHMS)})")
+    binary_path = prepare_trace(trace_path, cache_dir)
+    # 所有 shard 與加總後的結果使用同一個成本模型 (pages_per_block 與演算法一致)
+    algo_params = dict(ALGORITHMS[algorithm][1], **(params or {}))
+    if "pages_per_block" in algo_params:
+        cost_model = BlockCostModel(pages_per_block=algo_params["pages_per_block"])
+    else:
+        cost_model = BlockCostModel()
+    base_job = {"binary_path": binary_path, "algorithm": algorithm, "params": dict(params or {}),
+                "shards": shards, "cost_model": cost_model}
+    jobs = [dict(base_job, shard=s, capacity=c) for s, c in enumerate(shard_capacities(capacity, shards))]
+    if compare:
+        jobs.append(dict(base_job, shard=None, capacity=capacity))
+
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers or min(len(jobs), os.cpu_count())) as pool:
+        results = list(pool.map(_run_shard, jobs))
+    elapsed = time.monotonic() - start
+
+    shard_results = results[:shards]
+    merged = {k: sum(r[k] for r in shard_results) for k in METRICS}
+    merged.update(
+        algorithm=shard_results[0]["algorithm"],
+        capacity=capacity,
+        miss_rate=merged["total_miss"] / merged["total_access"] if merged["total_access"] else 0.0,
+        # 比例類的指標不能相加，由加總後的計數重新計算
+        block_write_amplification=cost_model.write_amplification(merged["write_ops"], merged["flash_writes"]),
+        num_shards=shards,
+        elapsed_sec=round(elapsed, 3),
+        shards=shard_results,
+    )
+
+    if compare:
+        unified = results[-1]
+        merged["unified"] = unified
+        merged["divergence"] = {
+            "miss_rate": merged["miss_rate"] - unified["miss_rate"],
+            "flash_writes": _relative(merged["flash_writes"], unified["flash_writes"]),
+            "write_ops": _relative(merged["write_ops"], unified["write_ops"]),
+            "total_cost": _relative(merged["total_cost"], unified["total_cost"]),
+        }
+    return merged
+
+
+def _relative(value, reference):
+    return (value - reference) / reference if reference else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依 page hash 分割成多個 sub-cache 平行模擬單一 trace")
+    parser.add_argument("trace", help="trace 路徑 (CSV / .cflt / .cfla)")
+    parser.add_argument("--algorithm", default="cflru", choices=list(ALGORITHMS))
+    parser.add_argument("--capacity", type=int, required=True, help="所有 shard 的總容量")
+    parser.add_argument("--shards", type=int, default=os.cpu_count())
+    parser.add_argument("--workers", type=int, default=None, help="process 數 (預設為 job 數與 CPU 數較小者)")
+    parser.add_argument("--compare", action="store_true", help="同時跑不分割的 cache 並回報差距")
+    parser.add_argument("--cache-dir", default=".trace_cache", help="CSV 轉出的二進位 trace 存放位置")
+    args = parser.parse_args()
+
+    result = run_sharded(args.trace, args.algorithm, args.capacity, args.shards, args.workers,
+                         args.compare, cache_dir=args.cache_dir)
+
+    print(f"\n{result['algorithm']} x {result['num_shards']} shards, capacity {result['capacity']} "
+          f"({result['elapsed_sec']}s)")
+    for r in result["shards"]:
+        print(f"  shard {r['shard']:>3}: cap={r['capacity']:<8} access={r['total_access']:<10} "
+              f"miss_rate={r['miss_rate']:.2%} flash_writes={r['flash_writes']}")
+    print(f"Sharded : Miss Rate {result['miss_rate']:.2%}, Total Cost {result['total_cost']:,}, "
+          f"Flash Writes {result['flash_writes']:,}")
+    if args.compare:
+        u = result["unified"]
+        d = result["divergence"]
+        print(f"Unified : Miss Rate {u['miss_rate']:.2%}, Total Cost {u['total_cost']:,}, "
+              f"Flash Writes {u['flash_writes']:,}")
+        print(f"Divergence: Miss Rate {d['miss_rate']:+.2%}, Total Cost {d['total_cost']:+.2%}, "
+              f"Flash Writes {d['flash_writes']:+.2%}")
+
+
+if __name__ == "__main__":
+    main()
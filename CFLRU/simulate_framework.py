@@ -1,102 +1,339 @@
 from algorithm.lru_algo import LRUAlgorithm
 from algorithm.cflru import CFLRUAlgorithm
+from algorithm.clock_cflru import ClockCFLRUAlgorithm
 from algorithm.beladys_min_algo import BeladyMINAlgorithm
-import csv
+from algorithm.cost_min import CostAwareGreedyAlgorithm
+from algorithm.instrumentation import Instrumentation
+import os
+import re
+import time
 from tqdm import tqdm  
 from utils import analyze_trace
+from trace_format import load_trace, TraceStream, collapse_runs
+from stack_distance import StackDistanceAnalyzer
+from checkpoint import save_checkpoint, load_checkpoint
+from result_cache import ResultCache, config_digest
 
-def test_framework(algo, csv_path, verbose=False):
+# chunk 合併後的 run 數不超過 access 數的這個比例時才改用 access_runs (合併太少時逐筆的 access_batch 較快)
+RUN_COLLAPSE_RATIO = 0.75
+
+class BlockCostModel:
+    """
+    total_cost 的計分方式 (block-aware)
+    一次寫回 (write op) 把同一個 erase block 的 k 個 Dirty Page 一起寫出，成本為
+        write_cost + extra_page_cost * (k - 1)
+    逐頁寫回的演算法每個 Dirty Eviction 都是 k = 1 的 write op，預設參數下 total_cost 與原本的
+    Miss + 8 * Dirty Eviction 相同；演算法有 pop_flush_sizes() 時 (例如 ClusteredCFLRUAlgorithm) 依它回報的 k 計分。
+
+    block_write_amplification 假設 block-mapped FTL: 每個 write op 都要改寫 (merge) 一整個 block，
+        = write op 數 * pages_per_block / 寫出的 page 數
+    """
+    def __init__(self, pages_per_block=64, read_cost=1, write_cost=8, extra_page_cost=1):
+        self.pages_per_block = pages_per_block
+        self.read_cost = read_cost
+        self.write_cost = write_cost
+        self.extra_page_cost = extra_page_cost
+
+    @classmethod
+    def for_algorithm(cls, algo, **params):
+        """以演算法的 pages_per_block (ClusteredCFLRUAlgorithm) 建立成本模型，逐頁寫回的演算法使用預設值"""
+        return cls(pages_per_block=getattr(algo, "pages_per_block", 64), **params)
+
+    def write_cost_of(self, write_ops, pages):
+        """write_ops 次寫回、共 pages 個 page 的總成本"""
+        return self.write_cost * write_ops + self.extra_page_cost * (pages - write_ops)
+
+    def write_amplification(self, write_ops, pages):
+        return write_ops * self.pages_per_block / pages if pages else 0.0
+
+def run_simulation(algo, trace, verbose=False, progress=True, deadline=None, stats_path=None,
+                   checkpoint_path=None, checkpoint_every=5_000_000, collapse=True, cost_model=None):
+    """
+    對已載入的 trace 執行模擬，回傳統計結果 dict
+    :param algo: 演算法物件
+    :param trace: trace_format.Trace 或 trace_format.TraceStream (串流，不需整份載入)
+    :param verbose: True 顯示詳細 Log
+    :param progress: 非 verbose 時是否顯示進度條
+    :param deadline: time.monotonic() 的截止時間，超過時丟出 TimeoutError (每個 chunk 檢查一次)
+    :param stats_path: algo.stats 有開啟時，把 instrumentation 與結果匯出成這個 JSON 檔
+    :param checkpoint_path: 每處理 checkpoint_every 筆 access 就把狀態寫到這個檔案 (見 checkpoint.py)；
+                            檔案已存在時從 checkpoint 繼續，跑完後刪除。演算法需支援 get_state / set_state
+    :param checkpoint_every: checkpoint 間隔 (access 數，在 chunk 邊界檢查)
+    :param collapse: 把連續存取同一個 page 的 access 合併成 run (trace_format.collapse_runs)，
+                     以 algo.access_runs 一步處理；結果與逐筆模擬完全相同
+    :param cost_model: BlockCostModel，None 時使用預設參數 (Miss 1、每次寫回 8、同一次寫回的其他 page 各 1)，
+                       pages_per_block 取自演算法 (見 BlockCostModel.for_algorithm)
+    """
+    cost_model = cost_model or BlockCostModel.for_algorithm(algo)
+    # 演算法設定 (window_size_ratio / dynamic_period / tuner ...) 必須在模擬改變它們之前取得
+    config = config_digest(algo) if checkpoint_path else None
+    # 以 block 為單位寫回的演算法回報每次寫回的 page 數
+    pop_flush_sizes = getattr(algo, "pop_flush_sizes", None)
+    if hasattr(algo, "trace"):
+        if isinstance(trace, TraceStream):
+            raise ValueError(f"{algo.get_name()} 需要整份 trace，不能使用串流模式")
+        algo.trace = trace # 對應belady min(因為需要未來資訊)
+    # 統計變數
+    total_miss = 0
+    total_cost = 0
+    total_access = 0
+    flash_writes = 0
+    write_ops = 0
+
+    # 從 checkpoint 繼續
+    trace_length = trace.total if isinstance(trace, TraceStream) else len(trace)
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        snapshot = load_checkpoint(checkpoint_path)
+        expected = (algo.get_name(), algo.capacity, config, trace_length)
+        found = (snapshot["algorithm"], snapshot["capacity"], snapshot.get("config"), snapshot["trace_length"])
+        if found != expected:
+            raise ValueError(f"{checkpoint_path}: checkpoint 屬於其他實驗 {found}，目前為 {expected}")
+        algo.set_state(snapshot["state"])
+        total_access = snapshot["offset"]
+        total_miss = snapshot["total_miss"]
+        total_cost = snapshot["total_cost"]
+        flash_writes = snapshot["flash_writes"]
+        write_ops = snapshot.get("write_ops", flash_writes)
+    start_offset = last_checkpoint = total_access
+    
+    # 2. 設定進度條
+    # 如果是 verbose 模式，不使用進度條 (因為要 print，不需要進度條干擾)
+    bar = None
+    if not verbose and progress:
+        # 串流的 CSV 無法事先知道筆數 (total = None)
+        bar = tqdm(total=trace_length, initial=start_offset, desc=f"Simulating {algo.get_name()}", unit="ops")
+
+    # 有 access_batch 的演算法整個 chunk 一次處理
+    # (verbose 需要逐筆 Log、instrumentation 需要逐筆計時，仍走 access_page)
+    stats = getattr(algo, "stats", None)
+    use_batch = not verbose and stats is None and hasattr(algo, "access_batch")
+
+    # 3. 主迴圈 (以 chunk 為單位取出 trace)
+    for page_ids, is_writes in trace.iter_chunks(start=start_offset):
+        total_access += len(page_ids)
+        chunk_misses = chunk_dirty = 0
+        if use_batch:
+            batch = None
+            runs = collapse_runs(page_ids, is_writes, RUN_COLLAPSE_RATIO * len(page_ids)) if collapse else None
+            if runs is not None:
+                batch = algo.access_runs(*(column.tolist() for column in runs))
+            if batch is None:
+                batch = algo.access_batch(page_ids, is_writes)
+            chunk_misses = batch.misses
+            chunk_dirty = batch.dirty_evictions
+        else:
+            for pid, is_w in zip(page_ids, is_writes):
+                # === 呼叫演算法 ===
+                if stats is None:
+                    is_hit, victim = algo.access_page(pid, is_w)
+                else:
+                    start_ns = time.perf_counter_ns()
+                    is_hit, victim = algo.access_page(pid, is_w)
+                    stats.observe("access_ns", time.perf_counter_ns() - start_ns)
+                # ==================
+            
+                # 計分邏輯
+                if not is_hit:
+                    chunk_misses += 1
+                    if victim and victim.is_dirty:
+                        chunk_dirty += 1
+
+                # === Log 輸出控制 ===
+                if verbose:
+                    op = "Write" if is_w else "Read"
+                    status = "HIT" if is_hit else "MISS"
+                    victim_info = f"Evicted: {victim}" if victim else "No Eviction"
+                
+                    print(f"[{op} {pid}]: {status}. {victim_info}")
+                    if algo.capacity <= 20: 
+                        print(f"   Current Cache: {list(algo.cache.values())}")
+                    print("-" * 30)
+
+        # Miss Read Cost + Dirty Eviction Write Cost (每個 Dirty Eviction 一次寫回)
+        chunk_pages = sum(pop_flush_sizes()) if pop_flush_sizes is not None else chunk_dirty
+        total_miss += chunk_misses
+        total_cost += cost_model.read_cost * chunk_misses + cost_model.write_cost_of(chunk_dirty, chunk_pages)
+        flash_writes += chunk_pages
+        write_ops += chunk_dirty
+
+        if bar is not None:
+            bar.update(len(page_ids))
+            bar.set_postfix(miss_rate=f"{total_miss / total_access:.2%}", refresh=False)
+        if checkpoint_path and total_access - last_checkpoint >= checkpoint_every:
+            save_checkpoint(checkpoint_path, {
+                "algorithm": algo.get_name(),
+                "capacity": algo.capacity,
+                "config": config,
+                "trace_length": trace_length,
+                "offset": total_access,
+                "total_miss": total_miss,
+                "total_cost": total_cost,
+                "flash_writes": flash_writes,
+                "write_ops": write_ops,
+                "state": algo.get_state(),
+            })
+            last_checkpoint = total_access
+        if deadline is not None and time.monotonic() > deadline:
+            if bar is not None:
+                bar.close()
+            raise TimeoutError(f"{algo.get_name()} 超過時間限制")
+
+    if bar is not None:
+        bar.close()
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    result = {
+        "algorithm": algo.get_name(),
+        "capacity": algo.capacity,
+        "total_access": total_access,
+        "total_miss": total_miss,
+        "miss_rate": total_miss / total_access if total_access else 0.0,
+        "total_cost": total_cost,
+        "flash_writes": flash_writes,
+        "write_ops": write_ops,
+        "block_write_amplification": cost_model.write_amplification(write_ops, flash_writes),
+    }
+    if stats is not None and stats_path:
+        stats.save_json(stats_path, extra=result)
+    return result
+
+def default_stats_path(csv_path, algo):
+    """instrumentation JSON 的預設位置: 放在 trace 旁邊，以演算法名稱與容量區分"""
+    name = re.sub(r"[^A-Za-z0-9]+", "-", algo.get_name()).strip("-").lower()
+    base = os.path.splitext(csv_path)[0]
+    return f"{base}.{name}.cap{algo.capacity}.stats.json"
+
+def default_checkpoint_path(csv_path, algo):
+    """
+    checkpoint 的預設位置: 與 instrumentation JSON 相同的命名規則，再加上演算法設定的雜湊
+    (同名同容量但參數不同的實驗不會找到彼此的 checkpoint)，必須在模擬之前呼叫
+    """
+    return f"{default_stats_path(csv_path, algo)[:-len('.stats.json')]}.{config_digest(algo)}.ckpt"
+
+def test_framework(algo, csv_path, verbose=False, instrument=False, stream=False, checkpoint=False,
+                   checkpoint_every=5_000_000, cache=None):
     """
     Framework 主程式
     :param algo: 演算法物件 (EX：LRUAlgorithm/CFLRUAlgorithm)
-    :param csv_path: Trace 的路徑
+    :param csv_path: Trace 的路徑 (page_id,is_write CSV 或 trace_format 的二進位檔)
     :param verbose: True 顯示詳細 Log, False 顯示進度條
+    :param instrument: True 時開啟演算法內部統計，並匯出 JSON 到 trace 旁邊 (見 default_stats_path)
+    :param stream: True 時以背景 thread 邊解碼邊模擬 (TraceStream)，記憶體與 trace 長度無關；
+                   需要整份 trace 的演算法 (Belady MIN) 與 dense page_id 的演算法仍整份載入
+    :param checkpoint: True 時定期把模擬狀態存到 trace 旁邊 (見 default_checkpoint_path)，
+                       中斷後以相同參數重新呼叫會從最後一個 checkpoint 繼續
+    :param checkpoint_every: checkpoint 間隔 (access 數)
+    :param cache: result_cache.ResultCache，相同 trace 內容 / 演算法參數 / 程式碼版本已跑過時直接回傳快取的結果
+                  (verbose 與 instrument 需要實際執行，不使用快取)
+    :return: 統計結果 dict (見 run_simulation)
     """
     
     print(f"=== Testing {algo.get_name()} (Capacity={algo.capacity}) ===")
+
+    # key 包含演算法的初始設定，必須在模擬之前計算
+    cache_key = None
+    if cache is not None and not verbose and not instrument and os.path.exists(csv_path):
+        cache_key = cache.simulation_key(csv_path, algo, run_simulation)
+        result = cache.get(cache_key)
+        if result is not None:
+            print(f"(cached) Miss Rate: {result['miss_rate']:.2%}, Total Cost: {result['total_cost']}, "
+                  f"Flash Writes: {result['flash_writes']}")
+            return result
     
-    # 1. 讀取 Trace 資料
-    trace = []
+    # 1. 讀取 Trace 資料 (二進位檔直接 memory-map，不需逐行解析)
+    # Array-backed 的演算法需要 dense page_id
+    dense = getattr(algo, "dense_page_ids", False)
     try:
-        with open(csv_path, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                page_id = int(row['page_id'])
-                is_write = bool(int(row['is_write']))  # 0 -> False, 1 -> True
-                trace.append((page_id, is_write))
+        if stream and not dense and not hasattr(algo, "trace"):
+            trace = TraceStream(csv_path)
+        else:
+            trace = load_trace(csv_path, dense=dense)
     except FileNotFoundError:
         print(f"Error: 找不到檔案 {csv_path}")
         return
-    if hasattr(algo, "trace"):
-        algo.trace = trace # 對應belady min(因為需要未來資訊)
-    # 統計變數
-    total_miss = 0
-    total_cost = 0
-    total_access = len(trace)
-    flash_writes = 0
-    
-    # 2. 設定 Iterator
-    # 如果是 verbose 模式，直接用 list (因為要 print，不需要進度條干擾)
-    # 如果不是 verbose，使用 tqdm 包裝 list 顯示進度條
-    iterator = trace if verbose else tqdm(trace, desc=f"Simulating {algo.get_name()}", unit="ops")
-
-    # 3. 主迴圈
-    for pid, is_w in iterator:
-        op = "Write" if is_w else "Read"
-        
-        # === 呼叫演算法 ===
-        is_hit, victim = algo.access_page(pid, is_w)
-        # ==================
-        
-        # 計分邏輯
-        if not is_hit:
-            total_miss += 1
-            total_cost += 1  # Miss Read Cost
-            
-            if victim and victim.is_dirty:
-                total_cost += 8  # Dirty Eviction Write Cost
-                flash_writes += 1
-
-        # === Log 輸出控制 ===
-        if verbose:
-            status = "HIT" if is_hit else "MISS"
-            victim_info = f"Evicted: {victim}" if victim else "No Eviction"
-            
-            print(f"[{op} {pid}]: {status}. {victim_info}")
-            if algo.capacity <= 20: 
-                print(f"   Current Cache: {list(algo.cache.values())}")
-            print("-" * 30)
+
+    stats_path = None
+    if instrument:
+        algo.stats = Instrumentation()
+        stats_path = default_stats_path(csv_path, algo)
+
+    checkpoint_path = default_checkpoint_path(csv_path, algo) if checkpoint else None
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        print(f"Resuming from {checkpoint_path}")
+
+    result = run_simulation(algo, trace, verbose=verbose, stats_path=stats_path,
+                            checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every)
+    if cache_key is not None:
+        cache.put(cache_key, result)
 
     # 4. 輸出最終統計結果
     print(f"\nSimulation Finished!")
-    print(f"Algorithm: {algo.get_name()}")
-    print(f"Total Access: {total_access}")
-    print(f"Miss Rate: {total_miss/total_access:.2%}")
-    print(f"Total Cost: {total_cost}")
-    print(f"Flash Writes: {flash_writes}")
+    print(f"Algorithm: {result['algorithm']}")
+    print(f"Total Access: {result['total_access']}")
+    print(f"Miss Rate: {result['miss_rate']:.2%}")
+    print(f"Total Cost: {result['total_cost']}")
+    print(f"Flash Writes: {result['flash_writes']} ({result['write_ops']} write ops, "
+          f"block write amplification {result['block_write_amplification']:.1f})")
+    if stats_path:
+        print(f"Instrumentation: {stats_path}")
+    return result
+
+def test_lru_curve(csv_path, capacities):
+    """
+    用 stack distance 一次掃描 trace，得到所有容量的 LRU 結果
+    (與對每個容量各跑一次 test_framework(LRUAlgorithm) 的數字完全相同)
+    :param csv_path: Trace 的路徑
+    :param capacities: 要輸出的容量列表
+    """
+    print(f"=== Testing Standard LRU (Stack Distance, Capacities={list(capacities)}) ===")
+
+    try:
+        trace = load_trace(csv_path)
+    except FileNotFoundError:
+        print(f"Error: 找不到檔案 {csv_path}")
+        return
+
+    analyzer = StackDistanceAnalyzer()
+    with tqdm(total=len(trace), desc="Stack Distance", unit="ops") as bar:
+        for page_ids, is_writes in trace.iter_chunks():
+            analyzer.feed(page_ids, is_writes)
+            bar.update(len(page_ids))
+    curve = analyzer.result()
+
+    for cap in capacities:
+        print(f"\n--- Capacity={cap} ---")
+        print(f"Total Access: {curve.total}")
+        print(f"Miss Rate: {curve.miss_rate(cap):.2%}")
+        print(f"Total Cost: {curve.total_cost(cap)}")
+        print(f"Flash Writes: {curve.dirty_evictions(cap)}")
+    return curve
 
 if __name__ == "__main__":
     # 1. 指定 Trace 檔案與分析
     trace = r'C:\tony\school\file_sys\114datastorage_cflru\114datastorage_cflru\swap_system_traces_cleaned\valgrind\valgrind_trace\feh_trace.csv'
-    algoclass = CFLRUAlgorithm
+    algoclass = CFLRUAlgorithm # 或 ClockCFLRUAlgorithm (CLOCK 近似版) / LRUAlgorithm / BeladyMINAlgorithm / CostAwareGreedyAlgorithm
+    # 結果快取: trace 內容、演算法參數與程式碼都沒變的實驗不重新模擬
+    cache = ResultCache()
 
-    result = analyze_trace(trace) # 先print出trace基本資訊
+    result = analyze_trace(trace, cache=cache) # 先print出trace基本資訊
 
     # 2. 定義三個測試級距 (0.1%, 1%, 10%)
     # 這些比例是為了適應 Trace 的區域性，因為論文中設定大約0.4但是現代的trace局部性很高，0.4可能會造成miss rate=0
     ratios = [0.001, 0.01, 0.1]
 
+    # 動態計算 Capacity
+    # 安全保護：避免 capacity 太小 (例如變成 0 或 1)
+    capacities = [max(5, int(result['working_set_size'] * r)) for r in ratios]
+
     print("\n--- Running Simulation ---")
 
-    for r in ratios:
-        # 動態計算 Capacity
-        cap = int(result['working_set_size'] * r)
-        
-        # 安全保護：避免 capacity 太小 (例如變成 0 或 1)
-        if cap < 5: 
-            cap = 5 
-        
-        print(f"\n{'='*20} Testing Ratio {r:.1%} (Capacity={cap}) {'='*20}")
-
-        algo = algoclass(capacity=cap) 
-        test_framework(algo, trace, verbose=False)
\ No newline at end of file
+    if algoclass is LRUAlgorithm:
+        # LRU 不需要每個容量各跑一次，stack distance 一次掃描就能得到全部結果
+        test_lru_curve(trace, capacities)
+    else:
+        for r, cap in zip(ratios, capacities):
+            print(f"\n{'='*20} Testing Ratio {r:.1%} (Capacity={cap}) {'='*20}")
+
+            algo = algoclass(capacity=cap) 
+            test_framework(algo, trace, verbose=False, cache=cache)
@@ -0,0 +1,206 @@
+"""
+LRU Stack Distance 分析 (Mattson)
+
+LRU 具有 inclusion property: 容量 C 的 cache 內容一定包含在容量 C+1 的 cache 裡，
+因此只要算出每次 access 的 stack distance d，就知道它在所有 C >= d 的 cache 中 Hit。
+距離用 Fenwick tree 計算 (每個 page 只在「最後一次 access 的時間點」留一個標記)，
+整份 trace 只要掃一次，O(N log M) 就能得到每個容量的 Hit / Miss 次數。
+
+Dirty eviction 也能一起算:
+    page 在兩次 access 之間若距離為 d，代表它在所有 C < d 的 cache 中被踢過一次；
+    它在容量 C 的 cache 中是 dirty，若且唯若「上次寫入之後，沒有在 C 中被重新載入」。
+    對每個 page 維護 dirty_from = 目前為 dirty 的最小容量，即可用差分陣列累計
+    每個容量的 dirty eviction 次數，得到 framework 的成本 (Miss * 1 + Dirty Eviction * 8)。
+"""
+from trace_format import load_trace
+
+
+INF = float('inf')
+_MIN_TREE_SIZE = 1 << 16
+
+
+class LRUCurve:
+    """Stack distance 分析的結果，可查詢任意容量的 LRU 統計"""
+    def __init__(self, total, hit_cum, dirty_cum):
+        self.total = total
+        self._hit_cum = hit_cum      # hit_cum[C] = 容量 C 的 Hit 次數
+        self._dirty_cum = dirty_cum  # dirty_cum[C] = 容量 C 的 dirty eviction 次數
+
+    @property
+    def max_capacity(self):
+        """超過此容量 (= working set size) 後結果不再改變"""
+        return len(self._hit_cum) - 1
+
+    def _index(self, capacity):
+        return max(0, min(int(capacity), self.max_capacity))
+
+    def hits(self, capacity):
+        return self._hit_cum[self._index(capacity)]
+
+    def misses(self, capacity):
+        return self.total - self.hits(capacity)
+
+    def miss_rate(self, capacity):
+        return self.misses(capacity) / self.total if self.total else 0.0
+
+    def dirty_evictions(self, capacity):
+        return self._dirty_cum[self._index(capacity)]
+
+    def total_cost(self, capacity, read_cost=1, write_cost=8):
+        """與 test_framework 相同的成本模型"""
+        return read_cost * self.misses(capacity) + write_cost * self.dirty_evictions(capacity)
+
+
+class StackDistanceAnalyzer:
+    """
+    逐筆餵入 access，最後呼叫 result() 取得 LRUCurve。
+
+        analyzer = StackDistanceAnalyzer()
+        analyzer.process(trace)
+        curve = analyzer.result()
+        curve.total_cost(1000)
+    """
+    def __init__(self):
+        self.total = 0
+        self.cold_misses = 0
+
+        # Fenwick tree (1-based)，時間軸上每個 page 最後一次 access 的位置為 1
+        self._size = _MIN_TREE_SIZE
+        self._tree = [0] * (self._size + 1)
+        self._next_slot = 1
+
+        self._last = {}        # page_id -> 最後一次 access 的 slot
+        self._dirty_from = {}  # page_id -> 該 page 目前為 dirty 的最小容量 (INF = 全部乾淨)
+
+        # hist[d] = stack distance 為 d 的 access 數
+        # dirty_diff: 容量區間的差分陣列，dirty_diff[C] 累加後為容量 C 的 dirty eviction 數
+        self._hist = [0] * 1024
+        self._dirty_diff = [0] * 1024
+
+    def _compact(self):
+        """時間 slot 用完時，把現存標記重新編號成 1..L，tree 大小維持 O(M)"""
+        items = sorted(self._last.items(), key=lambda kv: kv[1])
+        live = len(items)
+        size = max(2 * live, _MIN_TREE_SIZE)
+        tree = [0] * (size + 1)
+        for rank, (pid, _) in enumerate(items, 1):
+            self._last[pid] = rank
+            tree[rank] = 1
+        # O(size) 建樹
+        for i in range(1, size + 1):
+            j = i + (i & -i)
+            if j <= size:
+                tree[j] += tree[i]
+        self._tree = tree
+        self._size = size
+        self._next_slot = live + 1
+
+    def _grow(self, d):
+        """確保 hist / dirty_diff 可以用 index d"""
+        while d + 1 >= len(self._hist):
+            self._hist.extend([0] * len(self._hist))
+            self._dirty_diff.extend([0] * len(self._dirty_diff))
+
+    def feed(self, page_ids, is_writes):
+        """餵入一批 access (兩個等長序列)"""
+        last = self._last
+        dirty_from = self._dirty_from
+
+        for pid, is_w in zip(page_ids, is_writes):
+            if self._next_slot > self._size:
+                self._compact()
+            tree = self._tree
+            size = self._size
+
+            p = last.get(pid)
+            if p is None:
+                # Cold miss: 所有容量都 Miss
+                self.cold_misses += 1
+                dirty = INF
+            else:
+                # d = p 之後被 access 過的不同 page 數 + 1
+                i = p
+                before = 0
+                while i > 0:
+                    before += tree[i]
+                    i &= i - 1
+                d = len(last) - before + 1
+
+                i = p
+                while i <= size:
+                    tree[i] -= 1
+                    i += i & -i
+
+                self._grow(d)
+                self._hist[d] += 1
+
+                # 在所有 C < d 的 cache 中，此 page 於這段間隔被踢出；C >= dirty 時是 dirty
+                dirty = dirty_from[pid]
+                if dirty < d:
+                    self._dirty_diff[max(dirty, 1)] += 1
+                    self._dirty_diff[d] -= 1
+                # C < d 的 cache 重新載入後為 clean
+                if d > dirty:
+                    dirty = d
+
+            if is_w:
+                dirty = 0
+            dirty_from[pid] = dirty
+
+            slot = self._next_slot
+            self._next_slot = slot + 1
+            last[pid] = slot
+            i = slot
+            while i <= size:
+                tree[i] += 1
+                i += i & -i
+
+        self.total += len(page_ids)
+
+    def access(self, page_id, is_write):
+        self.feed((page_id,), (is_write,))
+
+    def process(self, trace):
+        """餵入整份 trace (trace_format.Trace 或 (page_id, is_write) 序列)"""
+        if hasattr(trace, 'iter_chunks'):
+            for page_ids, is_writes in trace.iter_chunks():
+                self.feed(page_ids, is_writes)
+        else:
+            trace = list(trace)
+            self.feed([pid for pid, _ in trace], [w for _, w in trace])
+        return self
+
+    def distance_histogram(self):
+        """回傳 (hist, cold_misses)，hist[d] = stack distance 為 d 的 access 數 (d >= 1)"""
+        return self._hist[:len(self._last) + 1], self.cold_misses
+
+    def result(self):
+        """整理成 LRUCurve (不會改變分析器狀態，可以繼續 feed)"""
+        working_set = len(self._last)
+        self._grow(working_set)
+        dirty_diff = list(self._dirty_diff)
+
+        # Trace 結束時深度為 D 的 page，在所有 C < D 的 cache 中已被踢出
+        by_slot = sorted(self._last.items(), key=lambda kv: kv[1])
+        for rank, (pid, _) in enumerate(by_slot, 1):
+            depth = working_set - rank + 1
+            dirty = self._dirty_from[pid]
+            if dirty < depth:
+                dirty_diff[max(dirty, 1)] += 1
+                dirty_diff[depth] -= 1
+
+        hit_cum = [0] * (working_set + 1)
+        dirty_cum = [0] * (working_set + 1)
+        hits = 0
+        dirty = 0
+        for c in range(1, working_set + 1):
+            hits += self._hist[c]
+            dirty += dirty_diff[c]
+            hit_cum[c] = hits
+            dirty_cum[c] = dirty
+        return LRUCurve(self.total, hit_cum, dirty_cum)
+
+
+def lru_curve(csv_path):
+    """讀取 trace 並回傳 LRUCurve"""
+    return StackDistanceAnalyzer().process(load_trace(csv_path)).result()
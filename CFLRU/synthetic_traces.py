@@ -0,0 +1,72 @@
+"""
+可重現的合成 trace 產生器 (給 benchmark 與快速實驗使用)
+
+所有產生器都以 seed 決定結果，回傳 trace_format.Trace (page_ids: int64, is_writes: uint8)，
+可以直接交給 run_simulation，或用 save_trace 存成二進位檔。
+"""
+import numpy as np
+
+from trace_format import Trace, BinaryTraceWriter
+
+
+def _writes(rng, n, write_ratio):
+    return (rng.random(n) < write_ratio).astype(np.uint8)
+
+
+def zipf_trace(n, num_pages, skew=1.0, write_ratio=0.3, seed=0):
+    """
+    Zipf 分布: 第 i 熱門的 page 機率 ∝ 1 / i^skew (skew 越大越集中，0 為均勻分布)
+    熱門程度與 page_id 無關 (會先打亂編號)
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, num_pages + 1, dtype=np.float64) ** skew
+    ranks = rng.choice(num_pages, size=n, p=weights / weights.sum())
+    page_ids = rng.permutation(num_pages)[ranks].astype(np.int64)
+    return Trace(page_ids, _writes(rng, n, write_ratio))
+
+
+def loop_trace(n, loop_pages, write_ratio=0.3, seed=0):
+    """反覆循序掃描 0..loop_pages-1 (容量小於 loop_pages 時 LRU 會全部 Miss)"""
+    rng = np.random.default_rng(seed)
+    page_ids = np.arange(n, dtype=np.int64) % loop_pages
+    return Trace(page_ids, _writes(rng, n, write_ratio))
+
+
+def scan_flood_trace(n, hot_pages, flood_length, flood_every, skew=1.0, write_ratio=0.3, seed=0):
+    """
+    Zipf 熱資料中，每 flood_every 筆插入一段 flood_length 筆、只讀且不重複的循序掃描
+    (模擬大檔案讀取把熱資料沖出 cache 的情況)
+    """
+    base = zipf_trace(n, hot_pages, skew, write_ratio, seed)
+    page_ids = base.page_ids.copy()
+    is_writes = base.is_writes.copy()
+
+    next_cold = hot_pages
+    for start in range(flood_every, n, flood_every + flood_length):
+        stop = min(start + flood_length, n)
+        page_ids[start:stop] = np.arange(next_cold, next_cold + stop - start)
+        is_writes[start:stop] = 0
+        next_cold += stop - start
+    return Trace(page_ids, is_writes)
+
+
+def phase_trace(phases, seed=0):
+    """
+    依序串接多個階段，每個階段使用互不重疊的 page_id 範圍 (模擬 working set 切換)
+    :param phases: [(產生器, kwargs), ...]，例如 [(zipf_trace, {"n": 1000, "num_pages": 100})]
+    """
+    page_chunks = []
+    write_chunks = []
+    offset = 0
+    for i, (generator, kwargs) in enumerate(phases):
+        part = generator(seed=seed + i, **kwargs)
+        page_chunks.append(part.page_ids + offset)
+        write_chunks.append(part.is_writes)
+        offset += int(part.page_ids.max()) + 1 if len(part) else 0
+    return Trace(np.concatenate(page_chunks), np.concatenate(write_chunks))
+
+
+def save_trace(trace, path):
+    """把 Trace 存成 trace_format 二進位檔"""
+    with BinaryTraceWriter(path) as writer:
+        writer.write(trace.page_ids, trace.is_writes)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 測試直接 import CFLRU/ 下的模組 (與在 CFLRU/ 執行工具時相同)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmark import run_benchmarks, compare
+
+
+def test_compare_refuses_baseline_with_different_access_count():
+    kwargs = dict(workloads=["zipf-1.2"], algorithms=["lru"], ratios=[0.1], measure_memory=False)
+    baseline = run_benchmarks(2_000, **kwargs)
+    assert compare(run_benchmarks(2_000, **kwargs), baseline, tolerance=1.0) == []
+    with pytest.raises(ValueError):
+        compare(run_benchmarks(3_000, **kwargs), baseline)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from trace_format import Trace
+from simulate_framework import run_simulation
+from algorithm.cflru import CFLRUAlgorithm, GhostWindows, GHOST_MAX_RATE, GHOST_MIN_PAGES
+
+
+@pytest.mark.parametrize("capacity", [4, 20, 64, 200, 1000, 4096, 100_000])
+def test_ghost_shadows_are_sampled_at_every_capacity(capacity):
+    ghost = GhostWindows(capacity, capacity // 4, max(1, capacity // 100), ghost_pages=256)
+    assert ghost.shadows[0].capacity <= max(256, GHOST_MIN_PAGES)
+    if capacity * GHOST_MAX_RATE >= GHOST_MIN_PAGES:
+        # 容量小於 ghost_pages 時也不會退化成完整的影子 cache
+        assert ghost.rate <= GHOST_MAX_RATE
+    else:
+        assert ghost.shadows[0].capacity == min(capacity, GHOST_MIN_PAGES)
+
+
+def test_sampled_ghost_tuner_keeps_its_cost():
+    rng = np.random.default_rng(0)
+    n, num_pages = 200_000, 20_000
+    page_ids = rng.permutation(num_pages)[np.minimum(rng.zipf(1.1, n) - 1, num_pages - 1)]
+    trace = Trace(page_ids.astype(np.int64), (rng.random(n) < 0.3).astype(np.uint8))
+    for capacity in (100, 1000):
+        ghost = run_simulation(CFLRUAlgorithm(capacity, tuner='ghost'), trace, progress=False)
+        hill = run_simulation(CFLRUAlgorithm(capacity), trace, progress=False)
+        assert ghost["total_cost"] <= hill["total_cost"] * 1.02
@@ -0,0 +1,87 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from trace_format import Trace, TraceStream, BinaryTraceWriter
+from simulate_framework import run_simulation, default_checkpoint_path
+from grid_runner import ALGORITHMS
+from algorithm.cflru import CFLRUAlgorithm
+
+
+def zipf_trace(seed, n=200_000, num_pages=20_000):
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.1, n) - 1, num_pages - 1)
+    return Trace(rng.permutation(num_pages)[ranks].astype(np.int64), (rng.random(n) < 0.3).astype(np.uint8))
+
+
+def interrupt(algo, trace, path):
+    """跑完第一個 chunk (寫出 checkpoint) 後以 deadline 中斷"""
+    with pytest.raises(TimeoutError):
+        run_simulation(algo, trace, progress=False, checkpoint_path=path, checkpoint_every=1,
+                       deadline=time.monotonic() - 1)
+
+
+def test_checkpoint_rejects_other_parameters(tmp_path):
+    trace = zipf_trace(0)
+    path = str(tmp_path / "run.ckpt")
+    interrupt(CFLRUAlgorithm(500, window_size_ratio=0.25), trace, path)
+    # 名稱 (CFLRU-Dynamic) 與容量相同、參數不同的實驗不能接著跑
+    for other in (CFLRUAlgorithm(500, window_size_ratio=0.5), CFLRUAlgorithm(500, dynamic_period=2000),
+                  CFLRUAlgorithm(500, write_cost=4), CFLRUAlgorithm(500, tuner='ghost')):
+        with pytest.raises(ValueError, match="其他實驗"):
+            run_simulation(other, trace, progress=False, checkpoint_path=path)
+
+
+def test_default_checkpoint_path_includes_parameters():
+    paths = {default_checkpoint_path("t.cflt", CFLRUAlgorithm(500, window_size_ratio=r)) for r in (0.25, 0.5)}
+    assert len(paths) == 2
+    assert default_checkpoint_path("t.cflt", CFLRUAlgorithm(500)) == default_checkpoint_path("t.cflt", CFLRUAlgorithm(500))
+
+
+def run_with_interrupts(make_algo, make_trace, path):
+    """每處理一個 chunk 就中斷，再用新的演算法物件從 checkpoint 繼續，直到跑完；回傳 (結果, 演算法, 中斷次數)"""
+    interrupts = 0
+    while True:
+        algo = make_algo()
+        try:
+            result = run_simulation(algo, make_trace(), progress=False, checkpoint_path=path, checkpoint_every=1,
+                                    deadline=time.monotonic() - 1)
+        except TimeoutError:
+            interrupts += 1
+            continue
+        return result, algo, interrupts
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+def test_resume_matches_uninterrupted_run(tmp_path, name):
+    trace = zipf_trace(1)
+    algo_class, params = ALGORITHMS[name]
+    if params.get("mode") == "dynamic":
+        # 週期短一點，讓中斷前後都有 adjust_window
+        params = dict(params, dynamic_period=5000)
+    make_algo = lambda: algo_class(capacity=1000, **params)
+
+    expected_algo = make_algo()
+    expected = run_simulation(expected_algo, trace, progress=False)
+    path = str(tmp_path / "run.ckpt")
+    result, algo, interrupts = run_with_interrupts(make_algo, lambda: trace, path)
+    assert interrupts == 4   # 200,000 筆 = 4 個 chunk，最後一個 chunk 之後也會中斷一次
+    assert result == expected
+    assert algo.get_state() == expected_algo.get_state()
+    assert not os.path.exists(path)
+
+
+def test_resume_from_stream(tmp_path):
+    trace = zipf_trace(2)
+    trace_path = str(tmp_path / "trace.cflt")
+    with BinaryTraceWriter(trace_path) as writer:
+        writer.write(trace.page_ids, trace.is_writes)
+    make_algo = lambda: CFLRUAlgorithm(1000, dynamic_period=5000)
+
+    expected = run_simulation(make_algo(), trace, progress=False)
+    result, _, interrupts = run_with_interrupts(make_algo, lambda: TraceStream(trace_path),
+                                                str(tmp_path / "run.ckpt"))
+    assert interrupts == 4
+    assert result == expected
@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+import pytest
+
+from trace_format import Trace
+from simulate_framework import run_simulation
+from algorithm.beladys_min_algo import BeladyMINAlgorithm
+from algorithm.cflru import CFLRUAlgorithm
+from algorithm.cost_min import CostAwareGreedyAlgorithm, flash_cost_lower_bound
+
+
+def random_trace(seed, n, num_pages, write_ratio=0.4):
+    rng = random.Random(seed)
+    page_ids = np.array([rng.randrange(num_pages) for _ in range(n)], dtype=np.int64)
+    is_writes = np.array([rng.random() < write_ratio for _ in range(n)], dtype=np.uint8)
+    return Trace(page_ids, is_writes)
+
+
+def cost(algo, trace):
+    return run_simulation(algo, trace, progress=False)["total_cost"]
+
+
+def optimal_cost(trace, capacity, read_cost=1, write_cost=8):
+    """窮舉所有 demand paging 的置換選擇 (只適用於很小的 trace)"""
+    states = {frozenset(): 0}
+    for page_id, is_write in trace:
+        new_states = {}
+        for state, c in states.items():
+            cache = dict(state)
+            if page_id in cache:
+                cache[page_id] = cache[page_id] or is_write
+                choices = [(cache, c)]
+            elif len(cache) < capacity:
+                cache[page_id] = is_write
+                choices = [(cache, c + read_cost)]
+            else:
+                choices = []
+                for victim in cache:
+                    after = dict(cache)
+                    dirty = after.pop(victim)
+                    after[page_id] = is_write
+                    choices.append((after, c + read_cost + write_cost * dirty))
+            for after, c2 in choices:
+                key = frozenset(after.items())
+                if c2 < new_states.get(key, float('inf')):
+                    new_states[key] = c2
+        states = new_states
+    return min(states.values())
+
+
+@pytest.mark.parametrize("capacity", [3, 7, 20])
+@pytest.mark.parametrize("seed", range(20))
+def test_lower_bound_below_belady_and_static_cflru(seed, capacity):
+    trace = random_trace(seed, n=300, num_pages=capacity * 3)
+    bound = flash_cost_lower_bound(trace, capacity)
+    assert bound["method"] == "min-cost-flow"
+    assert bound["total_cost"] <= cost(BeladyMINAlgorithm(capacity), trace)
+    assert bound["total_cost"] <= cost(CostAwareGreedyAlgorithm(capacity), trace)
+    for ratio in (0.0, 0.25, 0.5, 0.75, 1.0):
+        static = CFLRUAlgorithm(capacity, window_size_ratio=ratio, mode='static')
+        assert bound["total_cost"] <= cost(static, trace)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_lower_bound_below_brute_force_optimum(seed):
+    rng = random.Random(seed)
+    num_pages = rng.randint(2, 6)
+    capacity = rng.randint(1, min(3, num_pages))
+    trace = random_trace(seed, n=rng.randint(5, 20), num_pages=num_pages)
+    best = optimal_cost(trace, capacity)
+    exact = flash_cost_lower_bound(trace, capacity)["total_cost"]
+    decomposed = flash_cost_lower_bound(trace, capacity, exact_limit=0)["total_cost"]
+    assert decomposed <= exact <= best
+    assert best <= cost(CostAwareGreedyAlgorithm(capacity), trace)
+
+
+def test_lower_bound_at_least_belady_misses():
+    # 只有讀取時下界就是 Belady MIN 的 Miss 數
+    trace = random_trace(0, n=500, num_pages=30, write_ratio=0.0)
+    belady = run_simulation(BeladyMINAlgorithm(8), trace, progress=False)
+    for limit in (0, None):
+        kwargs = {} if limit is None else {"exact_limit": limit}
+        assert flash_cost_lower_bound(trace, 8, **kwargs)["total_cost"] == belady["total_miss"]
@@ -0,0 +1,14 @@
+from data_clean import PAGE_SIZE, convert_lines, parse_trace_line, calculate_page_id
+
+
+def test_convert_lines_matches_single_line_parsing():
+    lines = ["I 0x1000", " S 7fff2000", "M 0x3001", "L 0x5000", "X 0x1000", "L", "", "S zz"]
+    text, processed, skipped = convert_lines(lines)
+
+    expected = []
+    for line in lines[:4]:
+        address_hex, is_write = parse_trace_line(line)
+        expected.append(f"{calculate_page_id(address_hex)},{is_write}\r\n")
+    assert text == ''.join(expected)
+    assert text.startswith(f"{0x1000 // PAGE_SIZE},0\r\n")
+    assert (processed, skipped) == (4, 4)
@@ -0,0 +1,316 @@
+"""
+隨機 trace 上的逐筆差分測試: 最佳化過的路徑與直接照定義寫的參考實作比較
+每一筆的 Hit / Miss、Dirty Eviction 代碼 (HIT / MISS / MISS_DIRTY_EVICT) 與最後的 cache 內容
+"""
+import collections
+import math
+import random
+
+import numpy as np
+import pytest
+
+from trace_format import Trace, collapse_runs
+from simulate_framework import run_simulation
+from algorithm.spec import Page, HIT, MISS, MISS_DIRTY_EVICT
+from algorithm.lru_algo import LRUAlgorithm, ArrayLRUAlgorithm
+from algorithm.cflru import CFLRUAlgorithm, ClusteredCFLRUAlgorithm, ArrayCFLRUAlgorithm
+from algorithm.clock_cflru import ClockCFLRUAlgorithm
+from algorithm.beladys_min_algo import BeladyMINAlgorithm
+from algorithm.cost_min import CostAwareGreedyAlgorithm
+
+
+def random_accesses(seed, n=3000, num_pages=60):
+    """小 page 空間、偏向少數熱門 page 的隨機存取，讓 Hit 與各種踢人情況都常出現"""
+    rng = random.Random(seed)
+    hot = max(1, num_pages // 6)
+    page_ids = [rng.randrange(hot) if rng.random() < 0.5 else rng.randrange(num_pages) for _ in range(n)]
+    is_writes = [rng.random() < rng.choice((0.1, 0.5, 0.9)) for _ in range(n)]
+    return page_ids, is_writes
+
+
+def access_code(is_hit, victim):
+    if is_hit:
+        return HIT
+    return MISS_DIRTY_EVICT if victim is not None and victim.is_dirty else MISS
+
+
+def run_access_page(algo, page_ids, is_writes):
+    """逐筆呼叫 access_page，回傳每筆的 (代碼, 被踢掉的 page_id)"""
+    out = []
+    for page_id, is_write in zip(page_ids, is_writes):
+        is_hit, victim = algo.access_page(page_id, is_write)
+        out.append((access_code(is_hit, victim), victim.page_id if victim is not None else None))
+    return out
+
+
+def cache_contents(cache):
+    """LRU -> MRU 順序的 [(page_id, is_dirty), ...]"""
+    return [(pid, page.is_dirty) for pid, page in cache.items()]
+
+
+class ReferenceCFLRU:
+    """最初的 CFLRU: 單一 OrderedDict，每次踢人都把 LRU 端的 window 取出來掃描"""
+    def __init__(self, capacity, window_size_ratio=0.25, mode='dynamic', dynamic_period=1000, write_cost=8):
+        self.capacity = capacity
+        self.cache = collections.OrderedDict()
+        self.mode = mode
+        self.window_size = int(capacity * window_size_ratio)
+        self.dynamic_period = dynamic_period
+        self.write_cost = write_cost
+        self.op_count = 0
+        self.prev_period_cost = float('inf')
+        self.window_direction = 1
+        self.window_step = max(1, int(capacity * 0.05))
+        self.period_reads = 0
+        self.period_writes = 0
+
+    def access_page(self, page_id, is_write):
+        self.op_count += 1
+        victim = None
+        if page_id in self.cache:
+            is_hit = True
+            page = self.cache.pop(page_id)
+            if is_write:
+                page.is_dirty = True
+            self.cache[page_id] = page
+        else:
+            is_hit = False
+            self.period_reads += 1
+            if len(self.cache) >= self.capacity:
+                victim = self.evict()
+            self.cache[page_id] = Page(page_id, is_dirty=is_write)
+        if self.mode == 'dynamic' and self.op_count % self.dynamic_period == 0:
+            self.adjust_window()
+        return is_hit, victim
+
+    def evict(self):
+        window_size = max(0, min(self.capacity, self.window_size))
+        candidates = list(self.cache.keys())[:window_size]
+        victim_id = next((pid for pid in candidates if not self.cache[pid].is_dirty), None)
+        if victim_id is None:
+            victim_id = next(iter(self.cache))
+        victim = self.cache.pop(victim_id)
+        if victim.is_dirty:
+            self.period_writes += 1
+        return victim
+
+    def adjust_window(self):
+        current_cost = self.period_reads + self.write_cost * self.period_writes
+        if current_cost > self.prev_period_cost:
+            self.window_direction *= -1
+        self.window_size = max(0, min(self.capacity, self.window_size + self.window_direction * self.window_step))
+        self.prev_period_cost = current_cost
+        self.period_reads = 0
+        self.period_writes = 0
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("capacity, ratio, mode, period", [
+    (1, 0.5, 'static', 1000),
+    (8, 0.0, 'static', 1000),
+    (8, 1.0, 'static', 1000),
+    (16, 0.25, 'static', 1000),
+    (16, 0.25, 'dynamic', 7),
+    (40, 0.5, 'dynamic', 50),
+    (40, 0.1, 'dynamic', 1),
+])
+def test_cflru_matches_list_scan_reference(seed, capacity, ratio, mode, period):
+    page_ids, is_writes = random_accesses(seed)
+    algo = CFLRUAlgorithm(capacity, ratio, mode=mode, dynamic_period=period)
+    ref = ReferenceCFLRU(capacity, ratio, mode=mode, dynamic_period=period)
+    assert run_access_page(algo, page_ids, is_writes) == run_access_page(ref, page_ids, is_writes)
+    assert cache_contents(algo.cache) == cache_contents(ref.cache)
+    assert algo.window_size == ref.window_size
+
+
+class ReferenceBelady:
+    """最初的 Belady MIN: 每次踢人都逐一掃描 cache_map，找下一次使用最晚的 page (同分時先載入的先踢)"""
+    def __init__(self, capacity, trace):
+        self.capacity = capacity
+        self.cache_map = collections.OrderedDict()
+        self.positions = collections.defaultdict(collections.deque)
+        for idx, (pid, _) in enumerate(trace):
+            self.positions[pid].append(idx)
+
+    def access_page(self, page_id, is_write):
+        self.positions[page_id].popleft()
+        victim = None
+        if page_id in self.cache_map:
+            is_hit = True
+            if is_write:
+                self.cache_map[page_id].is_dirty = True
+        else:
+            is_hit = False
+            if len(self.cache_map) >= self.capacity:
+                victim_id, farthest = None, -1
+                for pid in self.cache_map:
+                    dq = self.positions[pid]
+                    nu = dq[0] if dq else math.inf
+                    if nu > farthest:
+                        victim_id, farthest = pid, nu
+                victim = self.cache_map.pop(victim_id)
+            self.cache_map[page_id] = Page(page_id, is_dirty=is_write)
+        return is_hit, victim
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("capacity", [1, 5, 16, 40])
+@pytest.mark.parametrize("as_trace", [False, True])
+def test_heap_belady_matches_naive_scan(seed, capacity, as_trace):
+    """as_trace=True 時走 build_next_use 的向量化路徑，否則走 (page_id, is_write) list 的逐筆路徑"""
+    page_ids, is_writes = random_accesses(seed)
+    pairs = list(zip(page_ids, is_writes))
+    algo = BeladyMINAlgorithm(capacity)
+    algo.trace = Trace(np.array(page_ids, dtype=np.int64), np.array(is_writes, dtype=np.uint8)) if as_trace else pairs
+    ref = ReferenceBelady(capacity, pairs)
+    assert run_access_page(algo, page_ids, is_writes) == run_access_page(ref, page_ids, is_writes)
+    assert cache_contents(algo.cache_map) == cache_contents(ref.cache_map)
+
+
+def with_trace(algo_class):
+    """離線演算法需要先設定 algo.trace"""
+    def factory(capacity, page_ids, is_writes):
+        algo = algo_class(capacity)
+        algo.trace = list(zip(page_ids, is_writes))
+        return algo
+    return factory
+
+
+BATCH_ALGORITHMS = {
+    "lru": lambda cap, *_: LRUAlgorithm(cap),
+    "cflru-static": lambda cap, *_: CFLRUAlgorithm(cap, 0.5, mode='static'),
+    "cflru-dynamic": lambda cap, *_: CFLRUAlgorithm(cap, mode='dynamic', dynamic_period=37),
+    "cflru-ghost": lambda cap, *_: CFLRUAlgorithm(cap, mode='dynamic', dynamic_period=37, tuner='ghost'),
+    "cflru-clustered": lambda cap, *_: ClusteredCFLRUAlgorithm(cap, mode='dynamic', dynamic_period=37,
+                                                               pages_per_block=4),
+    "clock-cflru": lambda cap, *_: ClockCFLRUAlgorithm(cap, mode='dynamic', dynamic_period=37),
+    "belady": with_trace(BeladyMINAlgorithm),
+    "cost-greedy": with_trace(CostAwareGreedyAlgorithm),
+}
+
+
+def run_batches(algo, page_ids, is_writes, rng):
+    """切成隨機大小的批次呼叫 access_batch，回傳 (逐筆代碼, hits, misses, dirty_evictions)"""
+    codes = []
+    hits = misses = dirty = 0
+    start = 0
+    while start < len(page_ids):
+        stop = start + rng.randrange(1, 200)
+        result = algo.access_batch(page_ids[start:stop], is_writes[start:stop], return_results=True)
+        codes.extend(result.results)
+        hits += result.hits
+        misses += result.misses
+        dirty += result.dirty_evictions
+        start = stop
+    return codes, hits, misses, dirty
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("capacity", [1, 8, 40])
+@pytest.mark.parametrize("name", sorted(BATCH_ALGORITHMS))
+def test_access_batch_matches_access_page_loop(name, capacity, seed):
+    page_ids, is_writes = random_accesses(seed)
+    factory = BATCH_ALGORITHMS[name]
+    looped = factory(capacity, page_ids, is_writes)
+    batched = factory(capacity, page_ids, is_writes)
+
+    expected = [code for code, _ in run_access_page(looped, page_ids, is_writes)]
+    codes, hits, misses, dirty = run_batches(batched, page_ids, is_writes, random.Random(seed))
+    assert codes == expected
+    assert (hits, misses, dirty) == (expected.count(HIT), len(expected) - expected.count(HIT),
+                                     expected.count(MISS_DIRTY_EVICT))
+    assert batched.get_state() == looped.get_state()
+
+
+ARRAY_PAIRS = {
+    "lru": (LRUAlgorithm, ArrayLRUAlgorithm, {}),
+    "cflru-static": (CFLRUAlgorithm, ArrayCFLRUAlgorithm, {"window_size_ratio": 0.5, "mode": 'static'}),
+    "cflru-dynamic": (CFLRUAlgorithm, ArrayCFLRUAlgorithm, {"mode": 'dynamic', "dynamic_period": 23}),
+    "cflru-ghost": (CFLRUAlgorithm, ArrayCFLRUAlgorithm,
+                    {"mode": 'dynamic', "dynamic_period": 23, "tuner": 'ghost'}),
+}
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("capacity", [1, 8, 40])
+@pytest.mark.parametrize("num_pages", [0, 60])
+@pytest.mark.parametrize("name", sorted(ARRAY_PAIRS))
+def test_array_caches_match_object_caches(name, num_pages, capacity, seed):
+    """num_pages=0 時 PageTable 隨 page_id 逐步長大，60 時一開始就配置好"""
+    page_ids, is_writes = random_accesses(seed)
+    object_class, array_class, params = ARRAY_PAIRS[name]
+
+    reference = object_class(capacity, **params)
+    algo = array_class(capacity, num_pages=num_pages, **params)
+    assert run_access_page(algo, page_ids, is_writes) == run_access_page(reference, page_ids, is_writes)
+    assert cache_contents(algo.cache) == cache_contents(reference.cache)
+    assert getattr(algo, "window_size", None) == getattr(reference, "window_size", None)
+
+    # 批次介面同樣要一致
+    reference = object_class(capacity, **params)
+    algo = array_class(capacity, num_pages=num_pages, **params)
+    assert (run_batches(algo, page_ids, is_writes, random.Random(seed))
+            == run_batches(reference, page_ids, is_writes, random.Random(seed)))
+    assert cache_contents(algo.cache) == cache_contents(reference.cache)
+
+
+def run_heavy_accesses(seed, n=3000, num_pages=60):
+    """random_accesses 的每一筆重複隨機次數 (同一個 run 內讀寫混合)，長 run 會跨過 dynamic_period 的邊界"""
+    rng = random.Random(seed)
+    page_ids, is_writes = [], []
+    for page_id, is_write in zip(*random_accesses(seed, n // 4, num_pages)):
+        for _ in range(rng.choice((1, 1, 2, 3, 8, 60))):
+            page_ids.append(page_id)
+            is_writes.append(is_write and rng.random() < 0.5)
+    return page_ids, is_writes
+
+
+RUN_ALGORITHMS = dict(BATCH_ALGORITHMS, **{
+    "lru-array": lambda cap, *_: ArrayLRUAlgorithm(cap),
+    "cflru-array": lambda cap, *_: ArrayCFLRUAlgorithm(cap, mode='dynamic', dynamic_period=37),
+    "cflru-array-ghost": lambda cap, *_: ArrayCFLRUAlgorithm(cap, mode='dynamic', dynamic_period=37, tuner='ghost'),
+})
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("capacity", [1, 8, 40])
+@pytest.mark.parametrize("name", sorted(RUN_ALGORITHMS))
+def test_access_run_matches_expanded_accesses(name, capacity, seed):
+    """每個 run 的第一次存取代碼相同、其餘都是 Hit；access_runs 的統計、最後的狀態與逐筆相同"""
+    page_ids, is_writes = run_heavy_accesses(seed)
+    run_ids, counts, any_writes = collapse_runs(page_ids, is_writes)
+    run_ids, counts, any_writes = run_ids.tolist(), counts.tolist(), any_writes.tolist()
+    factory = RUN_ALGORITHMS[name]
+
+    looped = factory(capacity, page_ids, is_writes)
+    expected = iter(run_access_page(looped, page_ids, is_writes))
+    runs = factory(capacity, page_ids, is_writes)
+    for page_id, count, is_write in zip(run_ids, counts, any_writes):
+        is_hit, victim = runs.access_run(page_id, count, is_write)
+        assert (access_code(is_hit, victim), victim.page_id if victim is not None else None) == next(expected)
+        assert all(code == HIT for code, _ in (next(expected) for _ in range(count - 1)))
+    assert runs.get_state() == looped.get_state()
+
+    codes = [code for code, _ in run_access_page(factory(capacity, page_ids, is_writes), page_ids, is_writes)]
+    batched = factory(capacity, page_ids, is_writes)
+    result = batched.access_runs(run_ids, counts, any_writes)
+    assert result.hits == codes.count(HIT)
+    assert result.misses == len(codes) - codes.count(HIT)
+    assert result.dirty_evictions == codes.count(MISS_DIRTY_EVICT)
+    assert batched.get_state() == looped.get_state()
+    if hasattr(looped, "pop_flush_sizes"):
+        assert batched.pop_flush_sizes() == looped.pop_flush_sizes()
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("name", sorted(RUN_ALGORITHMS))
+def test_run_simulation_collapse_matches_uncollapsed(name, seed):
+    page_ids, is_writes = run_heavy_accesses(seed)
+    trace = Trace(np.array(page_ids, dtype=np.int64), np.array(is_writes, dtype=np.uint8))
+    factory = RUN_ALGORITHMS[name]
+
+    results = []
+    for collapse in (True, False):
+        algo = factory(16, page_ids, is_writes)
+        results.append((run_simulation(algo, trace, progress=False, collapse=collapse), algo.get_state()))
+    assert results[0] == results[1]
@@ -0,0 +1,77 @@
+import os
+import csv
+import time
+import multiprocessing
+
+import pytest
+
+import grid_runner
+from trace_format import load_binary_trace
+from grid_runner import prepare_trace
+
+
+def write_csv(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("page_id,is_write\n")
+        for page_id, is_write in rows:
+            f.write(f"{page_id},{is_write}\n")
+
+
+def test_prepare_trace_same_basename_in_different_directories(tmp_path):
+    a = str(tmp_path / "a" / "trace.csv")
+    b = str(tmp_path / "b" / "trace.csv")
+    write_csv(a, [(1, 0), (2, 1)])
+    write_csv(b, [(3, 1), (4, 0), (5, 0)])
+    cache_dir = str(tmp_path / "cache")
+
+    out_a = prepare_trace(a, cache_dir)
+    out_b = prepare_trace(b, cache_dir)
+    assert out_a != out_b
+    assert load_binary_trace(out_a).page_ids.tolist() == [1, 2]
+    assert load_binary_trace(out_b).page_ids.tolist() == [3, 4, 5]
+    # 已轉過的檔案直接重用
+    assert prepare_trace(a, cache_dir) == out_a
+
+
+def fake_job(job):
+    """hang: 不檢查 deadline 的 job / crash: 被 OOM killer 之類終止的 worker"""
+    if job["algorithm"] == "hang":
+        time.sleep(60)
+    if job["algorithm"] == "crash":
+        os._exit(9)
+    return grid_runner._job_row(job, status="ok", elapsed_sec=0.0)
+
+
+fork_only = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                               reason="worker 需要繼承 monkeypatch 後的 _run_job")
+
+
+@fork_only
+def test_run_jobs_kills_hung_jobs_and_reports_crashes(monkeypatch):
+    monkeypatch.setattr(grid_runner, "_run_job", fake_job)
+    jobs = [{"trace": "t", "algorithm": name, "params": {}, "ratio": 0.1, "capacity": 10, "timeout": 0.5}
+            for name in ("lru", "hang", "crash", "cflru")]
+    start = time.monotonic()
+    rows = dict(grid_runner.run_jobs(jobs, workers=2, timeout_grace=0.2))
+    assert time.monotonic() - start < 10
+    assert [rows[i]["status"] for i in range(4)] == ["ok", "timeout", "error: worker exited with code 9", "ok"]
+
+
+@fork_only
+def test_run_grid_keeps_finished_rows_when_a_worker_dies(monkeypatch, tmp_path):
+    def crash_cflru(job):
+        if job["algorithm"] == "cflru":
+            os._exit(9)
+        return original(job)
+
+    original = grid_runner._run_job
+    monkeypatch.setattr(grid_runner, "_run_job", crash_cflru)
+    trace = str(tmp_path / "trace.csv")
+    write_csv(trace, [(i % 50, int(i % 3 == 0)) for i in range(2_000)])
+    out = str(tmp_path / "results.csv")
+    rows = grid_runner.run_grid([trace], ["lru", "cflru"], [0.1], workers=2, out_path=out,
+                                cache_dir=str(tmp_path / "cache"))
+    assert [row["status"] for row in rows] == ["ok", "error: worker exited with code 9"]
+    with open(out) as f:
+        assert len(list(csv.DictReader(f))) == 2
@@ -0,0 +1,21 @@
+import numpy as np
+
+from trace_format import Trace
+from simulate_framework import run_simulation
+from multi_config import run_lockstep, sweep_configs
+from algorithm.cflru import CFLRUAlgorithm
+
+
+def test_rows_share_one_cost_model():
+    rng = np.random.default_rng(0)
+    n, num_pages = 100_000, 5_000
+    ranks = np.minimum(rng.zipf(1.2, n) - 1, num_pages - 1)
+    trace = Trace(rng.permutation(num_pages)[ranks].astype(np.int64), (rng.random(n) < 0.4).astype(np.uint8))
+
+    configs = sweep_configs(ratios=(0.25, 0.5), modes=("static", "dynamic"), write_costs=(1, 8, 32))
+    rows = run_lockstep(trace, 500, configs, progress=False)
+    # write_cost 只影響演算法的視窗調整，total_cost 與 run_simulation 的預設計分相同
+    for config, row in zip(configs, rows):
+        expected = run_simulation(CFLRUAlgorithm(500, **config), trace, progress=False)
+        assert row["total_cost"] == expected["total_cost"]
+        assert (row["total_miss"], row["flash_writes"]) == (expected["total_miss"], expected["flash_writes"])
@@ -0,0 +1,37 @@
+import sys
+
+import pytest
+
+import trace_format
+import simulate_framework
+import utils
+from result_cache import ResultCache, code_version
+from algorithm.lru_algo import LRUAlgorithm
+
+
+@pytest.fixture
+def patched_source(monkeypatch):
+    """讓 inspect.getsource 看到某個模組被修改過"""
+    import inspect
+    original = inspect.getsource
+
+    def patch(module):
+        monkeypatch.setattr(inspect, "getsource",
+                            lambda obj: original(obj) + ("\n# changed" if obj is module else ""))
+    return patch
+
+
+def test_code_version_covers_simulation_modules(patched_source):
+    before = code_version(LRUAlgorithm, simulate_framework.run_simulation)
+    # BlockCostModel / collapse_runs 不在 run_simulation 的原始碼裡，但會影響結果
+    patched_source(trace_format)
+    assert code_version(LRUAlgorithm, simulate_framework.run_simulation) != before
+
+
+def test_trace_stats_key_covers_defining_module(tmp_path, patched_source):
+    path = tmp_path / "t.csv"
+    path.write_text("page_id,is_write\n1,0\n")
+    cache = ResultCache(str(tmp_path / "cache"))
+    before = cache.trace_stats_key(str(path), utils.analyze_trace, page_size_kb=4)
+    patched_source(sys.modules[utils.analyze_trace.__module__])
+    assert cache.trace_stats_key(str(path), utils.analyze_trace, page_size_kb=4) != before
@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+
+from trace_format import Trace
+from simulate_framework import run_simulation, BlockCostModel
+from stack_distance import StackDistanceAnalyzer
+from sampling import sampled_run, SampledStackDistance
+from algorithm.cflru import CFLRUAlgorithm, ClusteredCFLRUAlgorithm
+
+
+def block_trace(seed, n, num_pages, write_ratio=0.5):
+    """連續 page 區段的存取，讓同一個 erase block 常有多個 Dirty Page"""
+    rng = random.Random(seed)
+    page_ids = np.array([rng.randrange(num_pages) for _ in range(n)], dtype=np.int64)
+    is_writes = np.array([rng.random() < write_ratio for _ in range(n)], dtype=np.uint8)
+    return Trace(page_ids, is_writes)
+
+
+@pytest.mark.parametrize("cost_model", [None, BlockCostModel(pages_per_block=8, write_cost=20, extra_page_cost=2)])
+def test_sampled_run_uses_block_cost_model(cost_model):
+    trace = block_trace(0, 20_000, 2_000)
+    model = cost_model or BlockCostModel()
+    factory = lambda cap: ClusteredCFLRUAlgorithm(cap, mode='static', pages_per_block=model.pages_per_block)
+
+    # rate = 1 時沒有任何縮放，結果要與完整模擬相同
+    full = run_simulation(factory(200), trace, progress=False, cost_model=cost_model)
+    sampled = sampled_run(factory, trace, 200, rate=1.0, cost_model=cost_model)
+    for key in ("total_miss", "flash_writes", "write_ops", "total_cost", "block_write_amplification"):
+        assert sampled[key] == full[key]
+    assert full["write_ops"] < full["flash_writes"]
+
+    # 縮放後 total_cost 與 block_write_amplification 仍由換算後的計數依同一個成本模型計算
+    sampled = sampled_run(factory, trace, 200, rate=0.25, cost_model=cost_model)
+    assert sampled["total_cost"] == (model.read_cost * sampled["total_miss"]
+                                     + model.write_cost_of(sampled["write_ops"], sampled["flash_writes"]))
+    assert sampled["block_write_amplification"] == pytest.approx(
+        model.write_amplification(sampled["write_ops"], sampled["flash_writes"]))
+
+
+def zipf_trace(seed, n=200_000, num_pages=50_000, alpha=1.2):
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(alpha, n) - 1, num_pages - 1)
+    page_ids = rng.permutation(num_pages)[ranks].astype(np.int64)
+    return Trace(page_ids, (rng.random(n) < 0.3).astype(np.uint8))
+
+
+@pytest.mark.parametrize("kwargs, check_error", [({"rate": 0.05}, True), ({"max_pages": 2000}, False)])
+def test_sampled_curve_tracks_exact_curve_on_skewed_trace(kwargs, check_error):
+    """
+    偏斜的 trace 中熱門 page 是否被取樣會讓 sampled access 數大幅偏離 N * rate，
+    估計值仍要接近完整的 Mattson 曲線；固定 rate 時大多要落在回報的誤差範圍內
+    (固定記憶體模式的誤差範圍不包含重新縮放距離的誤差)
+    """
+    within = total = 0
+    for seed in range(6):
+        trace = zipf_trace(seed)
+        exact = StackDistanceAnalyzer().process(trace).result()
+        curve = SampledStackDistance(**kwargs).process(trace).result()
+        for capacity in (1000, 5000):
+            assert abs(curve.miss_rate(capacity) - exact.miss_rate(capacity)) < 0.05
+            assert curve.miss_rate_error(capacity) < 0.05
+            assert curve.dirty_evictions(capacity) == pytest.approx(exact.dirty_evictions(capacity), rel=0.4)
+            within += abs(curve.miss_rate(capacity) - exact.miss_rate(capacity)) <= curve.miss_rate_error(capacity)
+            within += (abs(curve.dirty_evictions(capacity) - exact.dirty_evictions(capacity))
+                       <= curve.dirty_evictions_error(capacity))
+            total += 2
+    if check_error:
+        assert within >= 0.75 * total
+
+
+def test_sampled_cflru_cost_within_reported_error():
+    """sampled CFLRU 的 total_cost 與完整模擬的差距大多落在 jackknife 回報的誤差範圍內"""
+    factory = lambda cap: CFLRUAlgorithm(cap, mode='static', window_size_ratio=0.5)
+    within = total = 0
+    for seed in range(4):
+        trace = zipf_trace(seed, n=100_000, num_pages=20_000)
+        full = run_simulation(factory(2000), trace, progress=False)
+        sampled = sampled_run(factory, trace, 2000, rate=0.1)
+        assert sampled["total_cost_error"] < 0.4 * full["total_cost"]
+        within += abs(sampled["total_cost"] - full["total_cost"]) <= sampled["total_cost_error"]
+        within += abs(sampled["miss_rate"] - full["miss_rate"]) <= sampled["miss_rate_error"]
+        total += 2
+    assert within >= 0.75 * total
+
+    assert sampled_run(factory, trace, 2000, rate=0.1, error=False)["total_cost_error"] is None
@@ -0,0 +1,40 @@
+import random
+
+import numpy as np
+import pytest
+
+from trace_format import BinaryTraceWriter
+from simulate_framework import BlockCostModel
+from sharded import run_sharded
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    rng = random.Random(0)
+    path = str(tmp_path / "trace.cflt")
+    with BinaryTraceWriter(path) as writer:
+        writer.write(np.array([rng.randrange(3_000) for _ in range(30_000)]),
+                     np.array([rng.random() < 0.5 for _ in range(30_000)]))
+    return path
+
+
+def test_merged_write_ops_and_amplification(trace_path, tmp_path):
+    result = run_sharded(trace_path, "cflru-clustered", 400, shards=4, workers=2, compare=True,
+                         cache_dir=str(tmp_path))
+    shards = result["shards"]
+    assert result["write_ops"] == sum(r["write_ops"] for r in shards)
+    assert result["flash_writes"] == sum(r["flash_writes"] for r in shards)
+    assert result["write_ops"] < result["flash_writes"]
+    # 比例不是各 shard 相加，而是由加總後的計數重新計算
+    assert result["block_write_amplification"] == pytest.approx(
+        BlockCostModel().write_amplification(result["write_ops"], result["flash_writes"]))
+    assert "write_ops" in result["divergence"]
+
+
+def test_merge_uses_algorithm_block_size(trace_path, tmp_path):
+    result = run_sharded(trace_path, "cflru-clustered", 400, shards=2, workers=2,
+                         params={"pages_per_block": 8}, cache_dir=str(tmp_path))
+    assert result["block_write_amplification"] == pytest.approx(
+        result["write_ops"] * 8 / result["flash_writes"])
+    for r in result["shards"]:
+        assert r["block_write_amplification"] == pytest.approx(r["write_ops"] * 8 / r["flash_writes"])
@@ -0,0 +1,26 @@
+import random
+
+import numpy as np
+import pytest
+
+from trace_format import Trace
+from simulate_framework import run_simulation, BlockCostModel
+from algorithm.cflru import ClusteredCFLRUAlgorithm
+
+
+def random_trace(seed, n, num_pages, write_ratio=0.4):
+    rng = random.Random(seed)
+    page_ids = np.array([rng.randrange(num_pages) for _ in range(n)], dtype=np.int64)
+    is_writes = np.array([rng.random() < write_ratio for _ in range(n)], dtype=np.uint8)
+    return Trace(page_ids, is_writes)
+
+
+@pytest.mark.parametrize("pages_per_block", [1, 8, 64, 256])
+def test_default_cost_model_follows_algorithm_block_size(pages_per_block):
+    trace = random_trace(0, 20_000, 2_000)
+    default = run_simulation(ClusteredCFLRUAlgorithm(200, pages_per_block=pages_per_block), trace, progress=False)
+    explicit = run_simulation(ClusteredCFLRUAlgorithm(200, pages_per_block=pages_per_block), trace, progress=False,
+                              cost_model=BlockCostModel(pages_per_block=pages_per_block))
+    assert default == explicit
+    assert default["block_write_amplification"] == pytest.approx(
+        default["write_ops"] * pages_per_block / default["flash_writes"])
@@ -0,0 +1,173 @@
+import numpy as np
+import pytest
+
+from trace_format import (BinaryTraceWriter, load_binary_trace, load_trace, csv_to_binary, iter_trace_chunks,
+                          is_binary_trace, HEADER, TraceArchiveWriter, TraceArchive, write_archive,
+                          archive_to_binary, is_archive)
+
+
+def random_columns(seed, n, max_page_id, timestamps=False):
+    rng = np.random.default_rng(seed)
+    page_ids = rng.integers(0, max_page_id, n, dtype=np.int64, endpoint=True)
+    page_ids[-1] = max_page_id
+    is_writes = (rng.random(n) < 0.3).astype(np.uint8)
+    times = np.cumsum(rng.random(n)) if timestamps else None
+    return page_ids, is_writes, times
+
+
+def write_in_batches(writer, page_ids, is_writes, timestamps, seed):
+    """切成隨機大小的批次寫入 (含空批次)"""
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.integers(0, len(page_ids), 6))
+    for lo, hi in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(page_ids)]))):
+        writer.write(page_ids[lo:hi], is_writes[lo:hi], timestamps[lo:hi] if timestamps is not None else None)
+
+
+@pytest.mark.parametrize("max_page_id, width", [(2**31 - 1, 4), (2**31, 8), (2**62, 8)])
+@pytest.mark.parametrize("timestamps", [False, True])
+def test_binary_trace_round_trip(tmp_path, max_page_id, width, timestamps):
+    page_ids, is_writes, times = random_columns(0, 100_000, max_page_id, timestamps)
+    path = str(tmp_path / "trace.cflt")
+    with BinaryTraceWriter(path) as writer:
+        write_in_batches(writer, page_ids, is_writes, times, seed=1)
+
+    with open(path, 'rb') as f:
+        assert HEADER.unpack(f.read(HEADER.size))[2] == width
+    assert is_binary_trace(path)
+    trace = load_binary_trace(path)
+    assert len(trace) == len(page_ids)
+    np.testing.assert_array_equal(trace.page_ids, page_ids)
+    np.testing.assert_array_equal(trace.is_writes, is_writes)
+    if timestamps:
+        np.testing.assert_array_equal(trace.timestamps, times)
+    else:
+        assert trace.timestamps is None
+
+    # 從任意位置開始的 chunk 串接起來等於原本的尾端
+    chunks = list(iter_trace_chunks(path, chunk_size=4096, start=12_345))
+    assert sum((ids for ids, _ in chunks), []) == page_ids[12_345:].tolist()
+    assert sum((writes for _, writes in chunks), []) == is_writes[12_345:].astype(bool).tolist()
+
+
+def test_csv_to_binary_round_trip(tmp_path):
+    page_ids, is_writes, times = random_columns(2, 2_000, 10**12, timestamps=True)
+    csv_path = tmp_path / "trace.csv"
+    rows = zip(page_ids.tolist(), is_writes.tolist(), times.tolist())
+    csv_path.write_text("page_id,is_write,timestamp\n" + "".join(f"{p},{w},{t!r}\n" for p, w, t in rows))
+    out = str(tmp_path / "trace.cflt")
+
+    assert csv_to_binary(str(csv_path), out) == len(page_ids)
+    for trace in (load_binary_trace(out), load_trace(str(csv_path))):
+        np.testing.assert_array_equal(trace.page_ids, page_ids)
+        np.testing.assert_array_equal(trace.is_writes, is_writes)
+        np.testing.assert_array_equal(trace.timestamps, times)
+
+
+def test_empty_and_rejected_writes(tmp_path):
+    path = str(tmp_path / "empty.cflt")
+    with BinaryTraceWriter(path):
+        pass
+    assert len(load_binary_trace(path)) == 0
+
+    writer = BinaryTraceWriter(str(tmp_path / "bad.cflt"))
+    writer.write([1, 2], [0, 1], [0.0, 1.0])
+    with pytest.raises(ValueError):
+        writer.write([3], [0])   # 前面有 timestamps，這一批卻沒有
+    with pytest.raises(ValueError):
+        writer.write([-1], [0], [2.0])
+    writer.abort()
+    assert not (tmp_path / "bad.cflt").exists()
+
+
+def delta_pattern(kind, n, seed):
+    """不同 delta 寬度的 page_id 序列: 同一個 page (delta 全為 0)、循序掃描、小範圍跳動、64-bit 範圍"""
+    rng = np.random.default_rng(seed)
+    if kind == "constant":
+        return np.full(n, 7, dtype=np.int64), 1
+    if kind == "sequential":
+        return np.arange(1000, 1000 + n, dtype=np.int64), 1
+    if kind == "local":
+        return 50_000 + rng.integers(-10_000, 10_000, n), 2
+    return rng.integers(0, 2**62, n, dtype=np.int64), 8
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma", "bz2"])
+@pytest.mark.parametrize("kind", ["constant", "sequential", "local", "wide"])
+@pytest.mark.parametrize("timestamps", [False, True])
+def test_archive_round_trip(tmp_path, codec, kind, timestamps):
+    n, chunk_size = 10_007, 1000
+    page_ids, width = delta_pattern(kind, n, seed=3)
+    rng = np.random.default_rng(4)
+    is_writes = (rng.random(n) < 0.3).astype(np.uint8)
+    times = np.cumsum(rng.random(n)) if timestamps else None
+    path = str(tmp_path / "trace.cfla")
+    with TraceArchiveWriter(path, chunk_size=chunk_size, codec=codec) as writer:
+        write_in_batches(writer, page_ids, is_writes, times, seed=5)
+    assert is_archive(path) and not is_binary_trace(path)
+
+    archive = TraceArchive(path)
+    assert (archive.codec, archive.chunk_size, len(archive)) == (codec, chunk_size, n)
+    assert archive.has_timestamps == timestamps
+    # footer index: 每個 chunk 的起點、筆數與 delta 寬度
+    assert archive.num_chunks == 11
+    assert archive.index['start'].tolist() == list(range(0, n, chunk_size))
+    assert archive.index['count'].tolist() == [chunk_size] * 10 + [7]
+    assert archive.index['first'].tolist() == page_ids[::chunk_size].tolist()
+    assert set(archive.index['width'].tolist()) == {width}
+
+    full = archive.load(workers=4)
+    np.testing.assert_array_equal(full.page_ids, page_ids)
+    np.testing.assert_array_equal(full.is_writes, is_writes)
+    if timestamps:
+        np.testing.assert_array_equal(full.timestamps, times)
+    else:
+        assert full.timestamps is None
+
+    # 任意一段 (跨 chunk 邊界、剛好在邊界上、最後一筆) 只解碼需要的 chunk
+    for start, stop in ((0, 1), (999, 1001), (1000, 2000), (2500, 7321), (n - 1, n), (n - 5, n + 100), (50, 50)):
+        part = archive.read(start, stop, workers=2)
+        np.testing.assert_array_equal(part.page_ids, page_ids[start:stop])
+        np.testing.assert_array_equal(part.is_writes, is_writes[start:stop])
+        if timestamps:
+            np.testing.assert_array_equal(part.timestamps, times[start:stop])
+    assert [archive.chunk_of(i) for i in (0, 999, 1000, n - 1)] == [0, 0, 1, 10]
+    with pytest.raises(IndexError):
+        archive.chunk_of(n)
+
+    for start in (0, 999, 1000, 4567, n):
+        chunks = list(archive.iter_chunks(start))
+        assert sum((ids for ids, _ in chunks), []) == page_ids[start:].tolist()
+        assert sum((writes for _, writes in chunks), []) == is_writes[start:].astype(bool).tolist()
+    archive.close()
+
+
+def test_archive_conversions(tmp_path):
+    page_ids, is_writes, times = random_columns(6, 30_000, 2**40, timestamps=True)
+    binary_path = str(tmp_path / "trace.cflt")
+    with BinaryTraceWriter(binary_path) as writer:
+        writer.write(page_ids, is_writes, times)
+
+    archive_path = str(tmp_path / "trace.cfla")
+    assert write_archive(binary_path, archive_path, chunk_size=4096, codec="lzma") == len(page_ids)
+    back_path = str(tmp_path / "back.cflt")
+    assert archive_to_binary(archive_path, back_path) == len(page_ids)
+
+    for trace in (load_trace(archive_path), load_binary_trace(back_path)):
+        np.testing.assert_array_equal(trace.page_ids, page_ids)
+        np.testing.assert_array_equal(trace.is_writes, is_writes)
+        np.testing.assert_array_equal(trace.timestamps, times)
+    # archive 以本身的 chunk 為單位串流 (第一個 chunk 從 start 切開)
+    chunks = list(iter_trace_chunks(archive_path, start=10_000))
+    assert [len(ids) for ids, _ in chunks] == [4096 - 10_000 % 4096] + [4096] * 4 + [30_000 % 4096]
+    assert sum((ids for ids, _ in chunks), []) == page_ids[10_000:].tolist()
+
+
+def test_archive_rejects_truncated_file(tmp_path):
+    path = tmp_path / "trace.cfla"
+    with TraceArchiveWriter(str(path), chunk_size=100) as writer:
+        writer.write(np.arange(1000), np.zeros(1000))
+    path.write_bytes(path.read_bytes()[:-10])
+    with pytest.raises(ValueError, match="footer"):
+        TraceArchive(str(path))
+    with pytest.raises(ValueError):
+        TraceArchiveWriter(str(tmp_path / "x.cfla"), codec="zstd")
@@ -0,0 +1,15 @@
+import numpy as np
+
+from trace_format import Trace
+from utils import trace_statistics
+
+
+def test_reuse_distance_is_opt_in():
+    rng = np.random.default_rng(0)
+    trace = Trace(rng.integers(0, 50, 2_000), rng.random(2_000) < 0.3)
+
+    stats = trace_statistics(trace)
+    assert stats["reuse_distance_histogram"] is None
+
+    hist = trace_statistics(trace, reuse_distance=True)["reuse_distance_histogram"]
+    assert sum(hist) == stats["total"] - stats["cold_accesses"]
@@ -0,0 +1,721 @@
+"""
+二進位 Trace 格式 (.cflt) 與載入工具
+
+檔案結構 (little-endian):
+    Header (32 bytes): magic 'CFLT', version, page_id 寬度 (4/8 bytes), flags, 筆數
+    page_ids : int32/int64 * 筆數
+    is_writes: uint8 * 筆數
+    timestamps: float64 * 筆數 (秒，只有 flags 含 FLAG_TIMESTAMPS 時才有)
+
+載入時直接 memory-map，page_ids / is_writes 以 NumPy array 形式零複製 (zero-copy) 提供，
+多個 worker process 開同一個檔案時共用 OS 的 page cache，不需要各自解析 CSV。
+
+壓縮的 trace archive (.cfla，見 TraceArchive):
+    Header (32 bytes): magic 'CFLA', version, codec, chunk 大小, 筆數
+    chunks           : 每 chunk 獨立壓縮 (page_id delta 編碼 + 寫入位元打包 [+ float64 timestamps]，
+                       zlib / lzma / bz2)
+    index            : 每個 chunk 的位置、長度、第一筆 access 的位置 (ARCHIVE_INDEX_DTYPE)
+    Footer (24 bytes): index 位置, chunk 數, magic
+可以從任意位置開始讀、只讀一段，或平行解碼多個 chunk。
+
+使用方式:
+    python trace_format.py <input.csv> <output.cflt>
+    python trace_format.py <input.csv | input.cflt> <output.cfla>
+"""
+import os
+import bz2
+import sys
+import lzma
+import mmap
+import zlib
+import queue
+import struct
+import tempfile
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+MAGIC = b'CFLT'
+VERSION = 1
+# magic, version, page_id 寬度, flags, 筆數 (補齊到 32 bytes，讓 page_ids 對齊 8 bytes)
+HEADER = struct.Struct('<4sHBBQ16x')
+
+CSV_CHUNK_ROWS = 1 << 20
+# Header flags: 檔案含有 timestamp 欄位
+FLAG_TIMESTAMPS = 1
+
+
+class Trace:
+    """
+    記憶體中 (或 memory-mapped) 的 trace。
+    迭代時產生與舊版 CSV 讀取相同的 (page_id, is_write) tuple，
+    需要整批處理時直接使用 page_ids / is_writes 兩個 NumPy 欄位。
+    timestamps 為每筆 access 的時間 (秒，float64)，trace 沒有記錄時為 None。
+    """
+    def __init__(self, page_ids, is_writes, path=None, page_map=None, timestamps=None):
+        self.page_ids = page_ids
+        self.is_writes = is_writes
+        self.path = path
+        # dense 重新編號後，page_map[dense_id] = 原始 page_id (未重新編號時為 None)
+        self.page_map = page_map
+        self.timestamps = timestamps
+
+    def __len__(self):
+        return len(self.page_ids)
+
+    def __getitem__(self, idx):
+        return int(self.page_ids[idx]), bool(self.is_writes[idx])
+
+    def __iter__(self):
+        for page_ids, is_writes in self.iter_chunks():
+            yield from zip(page_ids, is_writes)
+
+    def iter_chunks(self, chunk_size=1 << 16, start=0):
+        """
+        每次轉出一段 Python list (page_ids, is_writes)，避免逐筆存取 NumPy scalar
+        :param start: 從第幾筆 access 開始 (checkpoint 還原時使用)
+        """
+        for start in range(start, len(self), chunk_size):
+            stop = start + chunk_size
+            yield (self.page_ids[start:stop].tolist(),
+                   self.is_writes[start:stop].astype(bool).tolist())
+
+
+def is_binary_trace(path):
+    """用 magic 判斷是否為二進位 trace"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _read_csv_chunks(path, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    分批讀取 page_id,is_write[,timestamp] CSV
+    每批回傳 (page_ids, is_writes, timestamps)，沒有 timestamp 欄位時 timestamps 為 None
+    """
+    with open(path, 'r', newline='') as f:
+        header = [name.strip() for name in f.readline().split(',')]
+        try:
+            cols = (header.index('page_id'), header.index('is_write'))
+        except ValueError:
+            raise ValueError(f"{path}: CSV 需要 page_id 與 is_write 欄位") from None
+        if 'timestamp' in header:
+            cols += (header.index('timestamp'),)
+            dtype = np.dtype([('page_id', '<i8'), ('is_write', '<i8'), ('timestamp', '<f8')])
+        else:
+            dtype = np.dtype([('page_id', '<i8'), ('is_write', '<i8')])
+
+        while True:
+            lines = [line for line in islice(f, chunk_rows) if line.strip()]
+            if not lines:
+                break
+            data = np.atleast_1d(np.loadtxt(lines, delimiter=',', dtype=dtype, usecols=cols))
+            timestamps = data['timestamp'] if len(cols) == 3 else None
+            yield data['page_id'], data['is_write'], timestamps
+
+
+def read_csv_trace(path):
+    """讀取整個 CSV trace 成 Trace (page_ids: int64, is_writes: uint8, timestamps: float64 或 None)"""
+    page_chunks = []
+    write_chunks = []
+    time_chunks = []
+    for page_ids, is_writes, timestamps in _read_csv_chunks(path):
+        page_chunks.append(page_ids)
+        write_chunks.append(is_writes.astype(np.uint8))
+        time_chunks.append(timestamps)
+
+    if not page_chunks:
+        return Trace(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8), path)
+    timestamps = np.concatenate(time_chunks) if time_chunks[0] is not None else None
+    return Trace(np.concatenate(page_chunks), np.concatenate(write_chunks), path, timestamps=timestamps)
+
+
+def load_binary_trace(path):
+    """Memory-map 二進位 trace，回傳的 array 直接指向檔案內容 (唯讀)"""
+    with open(path, 'rb') as f:
+        magic, version, width, flags, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path}: 不是 CFLT 二進位 trace")
+    if version != VERSION:
+        raise ValueError(f"{path}: 不支援的版本 {version}")
+
+    page_dtype = np.dtype('<i4') if width == 4 else np.dtype('<i8')
+    if count == 0:
+        return Trace(np.empty(0, dtype=page_dtype), np.empty(0, dtype=np.uint8), path)
+
+    page_ids = np.memmap(path, dtype=page_dtype, mode='r', offset=HEADER.size, shape=(count,))
+    is_writes = np.memmap(path, dtype=np.uint8, mode='r',
+                          offset=HEADER.size + count * width, shape=(count,))
+    timestamps = None
+    if flags & FLAG_TIMESTAMPS:
+        timestamps = np.memmap(path, dtype='<f8', mode='r',
+                               offset=HEADER.size + count * (width + 1), shape=(count,))
+    return Trace(page_ids, is_writes, path, timestamps=timestamps)
+
+
+def remap_dense(trace):
+    """
+    把稀疏的 page_id (例如 address // 4096) 重新編號成 0..M-1 的 int32，
+    讓 array-backed 的 cache 可以直接用 page_id 當 index。編號不影響任何演算法的結果。
+    """
+    page_map, dense_ids = np.unique(trace.page_ids, return_inverse=True)
+    if len(page_map) >= 2**31:
+        raise ValueError("unique page 數超過 int32 範圍")
+    return Trace(dense_ids.astype(np.int32), trace.is_writes, trace.path, page_map, trace.timestamps)
+
+
+def collapse_runs(page_ids, is_writes, max_runs=None):
+    """
+    把連續存取同一個 page 的 access 合併成一筆 run
+    :param max_runs: run 數超過這個值時不合併，直接回傳 None (先只算 run 數，不做其餘的轉換)
+    :return: (page_ids, counts, any_writes) 三個等長 NumPy array，
+             any_writes[i] = run 中是否有任何一次寫入
+    """
+    page_ids = np.asarray(page_ids)
+    if len(page_ids) == 0:
+        return page_ids, np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+    boundary = np.concatenate(([True], page_ids[1:] != page_ids[:-1]))
+    if max_runs is not None and np.count_nonzero(boundary) > max_runs:
+        return None
+    starts = np.flatnonzero(boundary)
+    counts = np.diff(np.append(starts, len(page_ids)))
+    any_writes = np.logical_or.reduceat(np.asarray(is_writes, dtype=bool), starts)
+    return page_ids[starts], counts, any_writes
+
+
+def load_trace(path, dense=False):
+    """
+    依檔案內容自動判斷格式 (二進位、archive 或 CSV)，回傳 Trace (archive 以多個 thread 平行解碼)
+    :param dense: True 時把 page_id 重新編號成 0..M-1 (見 remap_dense)
+    """
+    if is_binary_trace(path):
+        trace = load_binary_trace(path)
+    elif is_archive(path):
+        archive = TraceArchive(path)
+        trace = archive.load()
+        archive.close()
+    else:
+        trace = read_csv_trace(path)
+    return remap_dense(trace) if dense else trace
+
+
+def iter_trace_chunks(path, chunk_size=1 << 16, start=0):
+    """
+    不載入整份 trace，逐 chunk 產生 Python list (page_ids, is_writes)
+    (二進位檔從 memory-map 切片，archive 逐 chunk 解碼，CSV 每次只解析 chunk_size 行)
+    :param start: 從第幾筆 access 開始 (archive 直接跳到所在的 chunk；CSV 仍需解析前面的行)
+    """
+    if is_binary_trace(path):
+        yield from load_binary_trace(path).iter_chunks(chunk_size, start)
+    elif is_archive(path):
+        # archive 以本身的 chunk 為單位解碼
+        archive = TraceArchive(path)
+        yield from archive.iter_chunks(start)
+        archive.close()
+    else:
+        skip = start
+        for page_ids, is_writes, _ in _read_csv_chunks(path, chunk_size):
+            if skip >= len(page_ids):
+                skip -= len(page_ids)
+                continue
+            yield page_ids[skip:].tolist(), is_writes[skip:].astype(bool).tolist()
+            skip = 0
+
+
+class _ReaderError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+_END = object()
+
+
+class TraceStream:
+    """
+    背景 thread 解碼 trace，經由有上限的 queue 把 chunk 交給模擬迴圈 (producer / consumer)。
+    解碼與模擬同時進行，記憶體最多只有 max_chunks + 2 個 chunk，與 trace 長度無關。
+    提供與 Trace 相同的 iter_chunks() / 逐筆迭代介面，可以直接交給 run_simulation；
+    只能走訪一次，且不支援 Belady MIN 等需要整份 trace 的演算法。
+
+        for page_ids, is_writes in TraceStream("trace.csv").iter_chunks():
+            ...
+    """
+    def __init__(self, path, chunk_size=1 << 16, max_chunks=4):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._stop = threading.Event()
+        self._started = False
+        # 二進位檔可以事先知道筆數 (給進度條用)，CSV 為 None
+        self.total = None
+        if is_binary_trace(path):
+            with open(path, 'rb') as f:
+                self.total = HEADER.unpack(f.read(HEADER.size))[4]
+        elif is_archive(path):
+            with open(path, 'rb') as f:
+                self.total = ARCHIVE_HEADER.unpack(f.read(ARCHIVE_HEADER.size))[5]
+
+    def _put(self, item):
+        """放進 queue；consumer 已經停止時回傳 False"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _reader(self, start):
+        try:
+            for chunk in iter_trace_chunks(self.path, self.chunk_size, start):
+                if not self._put(chunk):
+                    return
+            self._put(_END)
+        except BaseException as e:
+            self._put(_ReaderError(e))
+
+    def iter_chunks(self, start=0):
+        """:param start: 從第幾筆 access 開始 (checkpoint 還原時使用)"""
+        if self._started:
+            raise RuntimeError("TraceStream 只能走訪一次")
+        self._started = True
+        thread = threading.Thread(target=self._reader, args=(start,), name="trace-reader", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, _ReaderError):
+                    raise item.exc
+                yield item
+        finally:
+            # consumer 提前結束 (例如 TimeoutError) 時讓 reader thread 停下來
+            self._stop.set()
+            thread.join()
+
+    def __iter__(self):
+        for page_ids, is_writes in self.iter_chunks():
+            yield from zip(page_ids, is_writes)
+
+
+def _check_timestamps(has_timestamps, page_ids, timestamps):
+    """
+    writer 共用的檢查: 每一批都要有 (或都沒有) timestamps，且長度一致
+    回傳 (has_timestamps, float64 timestamps 或 None)
+    """
+    if timestamps is None:
+        if has_timestamps:
+            raise ValueError("前面寫入的資料有 timestamps，這一批卻沒有")
+        return False, None
+    if has_timestamps is False:
+        raise ValueError("前面寫入的資料沒有 timestamps，這一批卻有")
+    timestamps = np.asarray(timestamps, dtype='<f8')
+    if len(timestamps) != len(page_ids):
+        raise ValueError("page_ids 與 timestamps 長度不一致")
+    return True, timestamps
+
+
+class BinaryTraceWriter:
+    """
+    分批寫出二進位 trace，記憶體用量與總筆數無關。
+    各欄位先寫到暫存檔，close() 時依最大 page_id 選擇 4 或 8 bytes 寬度並組成最終檔案。
+
+        with BinaryTraceWriter(out_path) as writer:
+            writer.write(page_ids, is_writes)              # 或 write(page_ids, is_writes, timestamps)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.max_page_id = 0
+        # 第一次 write 決定是否有 timestamp 欄位 (None = 尚未決定)
+        self.has_timestamps = None
+        out_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(out_dir, exist_ok=True)
+        self._pages = tempfile.TemporaryFile(dir=out_dir)
+        self._writes = tempfile.TemporaryFile(dir=out_dir)
+        self._times = tempfile.TemporaryFile(dir=out_dir)
+
+    def write(self, page_ids, is_writes, timestamps=None):
+        page_ids = np.asarray(page_ids, dtype=np.int64)
+        is_writes = np.asarray(is_writes, dtype=np.uint8)
+        if len(page_ids) != len(is_writes):
+            raise ValueError("page_ids 與 is_writes 長度不一致")
+        if len(page_ids) == 0:
+            return
+        if page_ids.min() < 0:
+            raise ValueError("page_id 不可為負數")
+        self.has_timestamps, timestamps = _check_timestamps(self.has_timestamps, page_ids, timestamps)
+
+        self.max_page_id = max(self.max_page_id, int(page_ids.max()))
+        self.count += len(page_ids)
+        self._pages.write(page_ids.astype('<i8').tobytes())
+        self._writes.write(is_writes.tobytes())
+        if timestamps is not None:
+            self._times.write(timestamps.tobytes())
+
+    def close(self):
+        if self._pages is None:
+            return
+        width = 4 if self.max_page_id < 2**31 else 8
+        flags = FLAG_TIMESTAMPS if self.has_timestamps else 0
+        with open(self.path, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, VERSION, width, flags, self.count))
+
+            self._pages.seek(0)
+            while True:
+                buf = self._pages.read(8 * CSV_CHUNK_ROWS)
+                if not buf:
+                    break
+                out.write(np.frombuffer(buf, dtype='<i8').astype(f'<i{width}').tobytes())
+
+            for column in (self._writes, self._times):
+                column.seek(0)
+                while True:
+                    buf = column.read(8 * CSV_CHUNK_ROWS)
+                    if not buf:
+                        break
+                    out.write(buf)
+
+        self.abort()
+
+    def abort(self):
+        """丟棄暫存資料，不產生輸出檔"""
+        if self._pages is None:
+            return
+        self._pages.close()
+        self._writes.close()
+        self._times.close()
+        self._pages = self._writes = self._times = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def csv_to_binary(csv_path, out_path):
+    """把 page_id,is_write[,timestamp] CSV 轉成二進位 trace，回傳筆數"""
+    with BinaryTraceWriter(out_path) as writer:
+        for page_ids, is_writes, timestamps in _read_csv_chunks(csv_path):
+            writer.write(page_ids, is_writes, timestamps)
+    return writer.count
+
+
+# ==========================================
+# 壓縮的 chunk-indexed trace archive (.cfla)
+# ==========================================
+
+ARCHIVE_MAGIC = b'CFLA'
+ARCHIVE_VERSION = 1
+# magic, version, codec, flags (FLAG_TIMESTAMPS), chunk 大小, 筆數 (補齊到 32 bytes)
+ARCHIVE_HEADER = struct.Struct('<4sHBBIQ12x')
+# index 位置, chunk 數, magic (檔尾 24 bytes)
+ARCHIVE_FOOTER = struct.Struct('<QQ4s4x')
+# footer index 的每一筆: chunk 在檔案中的位置 / 壓縮後長度 / 第一筆的 access 位置 / 筆數 /
+# 第一個 page_id / delta 的寬度 (bytes)
+ARCHIVE_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4'), ('count', '<u4'),
+                                ('start', '<u8'), ('first', '<i8'), ('width', 'u1'), ('_pad', 'V7')])
+
+# codec id -> (名稱, compress(data, level), decompress(data))
+ARCHIVE_CODECS = {
+    1: ("zlib", lambda data, level: zlib.compress(data, level), zlib.decompress),
+    2: ("lzma", lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+    3: ("bz2", lambda data, level: bz2.compress(data, max(1, level)), bz2.decompress),
+}
+_CODEC_IDS = {name: codec_id for codec_id, (name, _, _) in ARCHIVE_CODECS.items()}
+
+
+def is_archive(path):
+    """用 magic 判斷是否為 trace archive"""
+    with open(path, 'rb') as f:
+        return f.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+
+def _encode_chunk(page_ids, is_writes, timestamps=None):
+    """一個 chunk -> (未壓縮的 bytes, 第一個 page_id, delta 寬度)；timestamps 以 float64 接在最後"""
+    deltas = np.diff(page_ids)
+    width = 1
+    if len(deltas):
+        lo, hi = int(deltas.min()), int(deltas.max())
+        while width < 8 and not -(1 << (8 * width - 1)) <= lo <= hi < (1 << (8 * width - 1)):
+            width *= 2
+    data = deltas.astype(f'<i{width}').tobytes() + np.packbits(is_writes != 0).tobytes()
+    if timestamps is not None:
+        data += timestamps.astype('<f8').tobytes()
+    return data, int(page_ids[0]), width
+
+
+class TraceArchiveWriter:
+    """
+    分批寫出 trace archive: 每 chunk_size 筆獨立壓縮 (page_id 以 delta 編碼、寫入位元以 bit 為單位打包)，
+    最後寫出 footer index。先寫到暫存檔，close() 時才 rename 成正式檔名。
+
+        with TraceArchiveWriter(out_path) as writer:
+            writer.write(page_ids, is_writes)
+    """
+    def __init__(self, path, chunk_size=1 << 16, codec="zlib", level=6):
+        if codec not in _CODEC_IDS:
+            raise ValueError(f"unknown codec: {codec} (可用: {', '.join(_CODEC_IDS)})")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self.level = level
+        self.count = 0
+        self.has_timestamps = None
+        self._compress = ARCHIVE_CODECS[_CODEC_IDS[codec]][1]
+        self._index = []
+        self._pending_pages = []
+        self._pending_writes = []
+        self._pending_times = []
+        self._pending = 0
+        out_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(out_dir, exist_ok=True)
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, _CODEC_IDS[codec], 0,
+                                             chunk_size, 0))
+
+    def write(self, page_ids, is_writes, timestamps=None):
+        page_ids = np.asarray(page_ids, dtype=np.int64)
+        is_writes = np.asarray(is_writes, dtype=np.uint8)
+        if len(page_ids) != len(is_writes):
+            raise ValueError("page_ids 與 is_writes 長度不一致")
+        if len(page_ids) == 0:
+            return
+        self.has_timestamps, timestamps = _check_timestamps(self.has_timestamps, page_ids, timestamps)
+        self._pending_pages.append(page_ids)
+        self._pending_writes.append(is_writes)
+        if timestamps is not None:
+            self._pending_times.append(timestamps)
+        self._pending += len(page_ids)
+        if self._pending >= self.chunk_size:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        """把暫存的資料切成 chunk_size 寫出；final=False 時保留不足一個 chunk 的尾端"""
+        if not self._pending:
+            return
+        page_ids = np.concatenate(self._pending_pages)
+        is_writes = np.concatenate(self._pending_writes)
+        timestamps = np.concatenate(self._pending_times) if self.has_timestamps else None
+        end = len(page_ids) if final else len(page_ids) - len(page_ids) % self.chunk_size
+        for lo in range(0, end, self.chunk_size):
+            hi = min(lo + self.chunk_size, end)
+            data, first, width = _encode_chunk(page_ids[lo:hi], is_writes[lo:hi],
+                                               timestamps[lo:hi] if timestamps is not None else None)
+            payload = self._compress(data, self.level)
+            self._index.append((self._file.tell(), len(payload), hi - lo, self.count, first, width, b''))
+            self._file.write(payload)
+            self.count += hi - lo
+        self._pending_pages = [page_ids[end:]]
+        self._pending_writes = [is_writes[end:]]
+        self._pending_times = [timestamps[end:]] if timestamps is not None else []
+        self._pending = len(page_ids) - end
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush(final=True)
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._index, dtype=ARCHIVE_INDEX_DTYPE).tobytes())
+        self._file.write(ARCHIVE_FOOTER.pack(index_offset, len(self._index), ARCHIVE_MAGIC))
+        self._file.seek(0)
+        flags = FLAG_TIMESTAMPS if self.has_timestamps else 0
+        self._file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, _CODEC_IDS[self.codec], flags,
+                                             self.chunk_size, self.count))
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """丟棄暫存檔，不產生輸出檔"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class TraceArchive:
+    """
+    讀取 trace archive。每個 chunk 可以獨立解碼，因此可以:
+        - 從任意位置開始讀 (iter_chunks(start) / read(start, stop) 只解碼需要的 chunk)
+        - 用多個 thread 平行解碼 (zlib / lzma / bz2 與 NumPy 運算都會釋放 GIL)
+
+        archive = TraceArchive("trace.cfla")
+        trace = archive.read(1_000_000, 2_000_000, workers=4)   # 只讀一段，回傳 Trace
+        for page_ids, is_writes in archive.iter_chunks(start=500_000):
+            ...
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(ARCHIVE_HEADER.size)
+            if len(header) != ARCHIVE_HEADER.size:
+                raise ValueError(f"{path}: archive 檔不完整")
+            magic, version, codec_id, flags, self.chunk_size, self.total = ARCHIVE_HEADER.unpack(header)
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError(f"{path}: 不是 CFLA trace archive")
+            if version != ARCHIVE_VERSION:
+                raise ValueError(f"{path}: 不支援的版本 {version}")
+            if codec_id not in ARCHIVE_CODECS:
+                raise ValueError(f"{path}: 不支援的 codec {codec_id}")
+            self.codec, _, self._decompress = ARCHIVE_CODECS[codec_id]
+            self.has_timestamps = bool(flags & FLAG_TIMESTAMPS)
+
+            f.seek(-ARCHIVE_FOOTER.size, os.SEEK_END)
+            index_offset, num_chunks, footer_magic = ARCHIVE_FOOTER.unpack(f.read(ARCHIVE_FOOTER.size))
+            if footer_magic != ARCHIVE_MAGIC:
+                raise ValueError(f"{path}: archive 檔不完整 (找不到 footer)")
+            f.seek(index_offset)
+            self.index = np.frombuffer(f.read(num_chunks * ARCHIVE_INDEX_DTYPE.itemsize),
+                                       dtype=ARCHIVE_INDEX_DTYPE)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.total
+
+    @property
+    def num_chunks(self):
+        return len(self.index)
+
+    def chunk_of(self, offset):
+        """第 offset 筆 access 所在的 chunk 編號"""
+        if not 0 <= offset < self.total:
+            raise IndexError(f"offset {offset} 超出範圍 (共 {self.total} 筆)")
+        return int(np.searchsorted(self.index['start'], offset, side='right')) - 1
+
+    def read_chunk(self, i):
+        """
+        解碼第 i 個 chunk，回傳 (page_ids: int64, is_writes: uint8, timestamps: float64) 三個 NumPy array
+        (archive 沒有 timestamp 時 timestamps 為 None)
+        """
+        entry = self.index[i]
+        offset, length, count = int(entry['offset']), int(entry['length']), int(entry['count'])
+        width = int(entry['width'])
+        raw = self._decompress(self._mm[offset:offset + length])
+        split = (count - 1) * width
+        page_ids = np.empty(count, dtype=np.int64)
+        page_ids[0] = entry['first']
+        np.cumsum(np.frombuffer(raw, dtype=f'<i{width}', count=count - 1), dtype=np.int64, out=page_ids[1:])
+        page_ids[1:] += entry['first']
+        packed = (count + 7) // 8
+        is_writes = np.unpackbits(np.frombuffer(raw, dtype=np.uint8, count=packed, offset=split), count=count)
+        timestamps = None
+        if self.has_timestamps:
+            timestamps = np.frombuffer(raw, dtype='<f8', count=count, offset=split + packed)
+        return page_ids, is_writes, timestamps
+
+    def decode_chunks(self, chunks, workers=None):
+        """依序產生 chunks 中每個 chunk 的解碼結果；workers > 1 時以 thread pool 平行解碼"""
+        chunks = list(chunks)
+        if not workers or workers <= 1 or len(chunks) <= 1:
+            for i in chunks:
+                yield self.read_chunk(i)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(self.read_chunk, chunks)
+
+    def read(self, start=0, stop=None, workers=None):
+        """解碼 [start, stop) 這一段 (只讀需要的 chunk)，回傳 Trace"""
+        stop = self.total if stop is None else min(stop, self.total)
+        if start >= stop:
+            return Trace(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8), self.path)
+        first, last = self.chunk_of(start), self.chunk_of(stop - 1)
+        page_chunks = []
+        write_chunks = []
+        time_chunks = []
+        for page_ids, is_writes, timestamps in self.decode_chunks(range(first, last + 1), workers):
+            page_chunks.append(page_ids)
+            write_chunks.append(is_writes)
+            time_chunks.append(timestamps)
+        base = int(self.index['start'][first])
+        window = slice(start - base, stop - base)
+        timestamps = np.concatenate(time_chunks)[window] if self.has_timestamps else None
+        return Trace(np.concatenate(page_chunks)[window], np.concatenate(write_chunks)[window], self.path,
+                     timestamps=timestamps)
+
+    def load(self, workers=os.cpu_count()):
+        """平行解碼整份 archive"""
+        return self.read(workers=workers)
+
+    def iter_chunks(self, start=0):
+        """
+        從第 start 筆開始，逐 chunk 產生 Python list (page_ids, is_writes) (與 Trace.iter_chunks 相同格式)
+        """
+        if start >= self.total:
+            return
+        first = self.chunk_of(start)
+        skip = start - int(self.index['start'][first])
+        for page_ids, is_writes, _ in self.decode_chunks(range(first, self.num_chunks)):
+            yield page_ids[skip:].tolist(), is_writes[skip:].astype(bool).tolist()
+            skip = 0
+
+    def close(self):
+        self._mm.close()
+
+
+def _iter_arrays(path):
+    """依格式逐批產生 (page_ids, is_writes, timestamps) NumPy array (轉檔用，沒有 timestamp 時為 None)"""
+    if is_archive(path):
+        archive = TraceArchive(path)
+        yield from archive.decode_chunks(range(archive.num_chunks))
+        archive.close()
+    elif is_binary_trace(path):
+        trace = load_binary_trace(path)
+        for start in range(0, len(trace), CSV_CHUNK_ROWS):
+            window = slice(start, start + CSV_CHUNK_ROWS)
+            timestamps = trace.timestamps[window] if trace.timestamps is not None else None
+            yield trace.page_ids[window], trace.is_writes[window], timestamps
+    else:
+        yield from _read_csv_chunks(path)
+
+
+def write_archive(src_path, out_path, chunk_size=1 << 16, codec="zlib", level=6):
+    """把 CSV / 二進位 trace (或另一個 archive) 轉成 trace archive，回傳筆數"""
+    with TraceArchiveWriter(out_path, chunk_size, codec, level) as writer:
+        for page_ids, is_writes, timestamps in _iter_arrays(src_path):
+            writer.write(page_ids, is_writes, timestamps)
+    return writer.count
+
+
+def archive_to_binary(archive_path, out_path):
+    """trace archive 轉回二進位 trace (可 memory-map，給 grid_runner 等多 process 共用)"""
+    with BinaryTraceWriter(out_path) as writer:
+        for page_ids, is_writes, timestamps in _iter_arrays(archive_path):
+            writer.write(page_ids, is_writes, timestamps)
+    return writer.count
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("使用方式: python trace_format.py <input> <output.cflt | output.cfla>")
+        return
+    src_path, out_path = sys.argv[1], sys.argv[2]
+    if out_path.endswith(".cfla"):
+        count = write_archive(src_path, out_path)
+    elif is_archive(src_path):
+        count = archive_to_binary(src_path, out_path)
+    else:
+        count = csv_to_binary(src_path, out_path)
+    print(f"Done. Wrote {count} accesses to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
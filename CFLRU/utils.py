@@ -1,58 +1,191 @@
 import csv
 
-def analyze_trace(csv_file_path, page_size_kb=4):
+import numpy as np
+
+from trace_format import Trace, is_binary_trace, is_archive, load_trace, collapse_runs
+from stack_distance import StackDistanceAnalyzer
+
+def analyze_trace(csv_file_path, page_size_kb=4, cache=None):
     """
     分析 trace.csv 並輸出 CFLRU 論文 Table 3 的統計資訊
     
     Args:
-        csv_file_path: trace CSV 檔案路徑
+        csv_file_path: trace CSV 檔案路徑 (也接受 trace_format 的二進位檔與 archive)
         page_size_kb: 頁面大小 (KB)，預設 4KB
+        cache: result_cache.ResultCache，同一份 trace 內容已分析過時直接使用快取的結果
     
     Returns:
         dict: 包含 mem_used, total, instruction, read, write 的統計資訊
     """
-    total = 0
-    instruction = 0  # 預留欄位，若 trace 未記錄指令存取則為 0
-    read = 0
-    write = 0
-    unique_pages = set()
-    
-    with open(csv_file_path, 'r') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            total += 1
-            page_id = int(row['page_id'])
-            unique_pages.add(page_id)
-            
-            is_write = int(row['is_write'])
-            if is_write == 1:
-                write += 1
-            else:
-                read += 1
+    key = None
+    if cache is not None:
+        key = cache.trace_stats_key(csv_file_path, analyze_trace, page_size_kb=page_size_kb)
+        stats = cache.get(key)
+        if stats is not None:
+            print_trace_summary(csv_file_path, stats)
+            return stats
+
+    if is_binary_trace(csv_file_path) or is_archive(csv_file_path):
+        # 二進位 trace / archive: 直接對 memory-mapped (或平行解碼後的) 欄位做向量化統計
+        trace = load_trace(csv_file_path)
+        total = len(trace)
+        instruction = 0
+        write = int(np.count_nonzero(trace.is_writes))
+        read = total - write
+        unique_pages = np.unique(trace.page_ids)
+    else:
+        total = 0
+        instruction = 0  # 預留欄位，若 trace 未記錄指令存取則為 0
+        read = 0
+        write = 0
+        unique_pages = set()
+        
+        with open(csv_file_path, 'r') as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                total += 1
+                page_id = int(row['page_id'])
+                unique_pages.add(page_id)
+                
+                is_write = int(row['is_write'])
+                if is_write == 1:
+                    write += 1
+                else:
+                    read += 1
 
     # 計算工作集大小 (Working Set Size)
     working_set_size = len(unique_pages)
     mem_used_mb = (working_set_size * page_size_kb) / 1024
     # 一個唯一page佔4kb 轉換成mb
 
-    # 輸出格式對齊 CFLRU Table 3 的主要資訊
+    stats = {
+        "mem_used_mb": mem_used_mb,
+        "working_set_size": working_set_size,
+        "total": total,
+        "instruction": instruction,
+        "read": read,
+        "write": write,
+    }
+    print_trace_summary(csv_file_path, stats)
+    if key is not None:
+        cache.put(key, stats)
+    return stats
+
+def print_trace_summary(csv_file_path, stats):
+    """輸出 analyze_trace 的結果，格式對齊 CFLRU Table 3 的主要資訊"""
+    total = stats['total']
     print(f"CSV Path: {csv_file_path}")
-    print(f"Memory used (MB): {mem_used_mb:.2f}")
+    print(f"Memory used (MB): {stats['mem_used_mb']:.2f}")
     print(f"Total: {total:,}")
-    print(f"Instruction Read: {instruction:,}")
-    print(f"Data Read: {read:,} ({read/total*100:.1f}%)")
-    print(f"Data Write: {write:,} ({write/total*100:.1f}%)")
-    print(f"Working Set Size: {working_set_size:,} 頁")
+    print(f"Instruction Read: {stats['instruction']:,}")
+    print(f"Data Read: {stats['read']:,} ({stats['read']/total*100:.1f}%)")
+    print(f"Data Write: {stats['write']:,} ({stats['write']/total*100:.1f}%)")
+    print(f"Working Set Size: {stats['working_set_size']:,} 頁")
+
+def _log2_histogram(values):
+    """log2 分桶: bucket b 代表 [2^b, 2^(b+1))，values 需 >= 1"""
+    if len(values) == 0:
+        return []
+    buckets = np.frexp(values.astype(np.float64))[1] - 1
+    return np.bincount(buckets).tolist()
+
+
+def trace_statistics(trace, page_size_kb=4, top_k=10, reuse_distance=False):
+    """
+    以 NumPy 向量化一次算出 trace 的統計資訊 (用來決定 capacity 與 CFLRU window ratio)
+    
+    Args:
+        trace: trace 路徑 (CSV / 二進位) 或已載入的 trace_format.Trace
+        page_size_kb: 頁面大小 (KB)，預設 4KB
+        top_k: 輸出存取次數最多的前 K 個 page
+        reuse_distance: 是否計算 reuse (stack) distance 分布，預設 False；
+                        這部分用 StackDistanceAnalyzer 逐筆以 Python 計算 (O(N log M))，
+                        大型 trace 會比其餘的向量化統計慢上好幾個數量級，需要時再開啟
+    
+    Returns:
+        dict: analyze_trace 的欄位，再加上
+            irg_histogram: inter-reference gap (兩次存取同一 page 的時間差) 的 log2 分桶次數
+            reuse_distance_histogram: stack distance 的 log2 分桶次數 (reuse_distance=False 時為 None)
+            cold_accesses: 第一次存取 (沒有 gap / distance) 的次數
+            pages / page_access_count / page_write_ratio: 每個 page 的存取次數與寫入比例 (NumPy array)
+            dirty_page_fraction: 至少被寫過一次的 page 比例
+            top_pages: [(page_id, 存取次數), ...]，依次數由大到小
+            runs: 連續存取同一個 page 合併後的筆數 (trace_format.collapse_runs，模擬時實際處理的次數)
+    """
+    if not isinstance(trace, Trace):
+        trace = load_trace(trace)
+    page_ids = np.asarray(trace.page_ids)
+    is_writes = np.asarray(trace.is_writes)
+    total = len(page_ids)
+
+    # 每個 page 的存取次數 / 寫入次數
+    pages, inverse, counts = np.unique(page_ids, return_inverse=True, return_counts=True)
+    writes_per_page = np.bincount(inverse, weights=is_writes, minlength=len(pages))
+    page_write_ratio = writes_per_page / np.maximum(counts, 1)
+    write = int(writes_per_page.sum())
 
+    # Inter-reference gap: 依 page 穩定排序後，相鄰且同 page 的位置相減
+    order = np.argsort(inverse, kind='stable')
+    same = inverse[order[1:]] == inverse[order[:-1]]
+    gaps = (order[1:] - order[:-1])[same]
+
+    # Top-K hottest pages
+    k = min(top_k, len(pages))
+    top = np.argpartition(-counts, k - 1)[:k] if k else np.empty(0, dtype=np.int64)
+    top = top[np.argsort(-counts[top], kind='stable')]
+
+    reuse_hist = None
+    if reuse_distance:
+        analyzer = StackDistanceAnalyzer().process(trace)
+        hist, _ = analyzer.distance_histogram()
+        distances = np.repeat(np.arange(len(hist)), hist)
+        reuse_hist = _log2_histogram(distances)
+
+    working_set_size = len(pages)
     return {
-        "mem_used_mb": mem_used_mb,
+        "mem_used_mb": (working_set_size * page_size_kb) / 1024,
         "working_set_size": working_set_size,
         "total": total,
-        "instruction": instruction,
-        "read": read,
+        "instruction": 0,
+        "read": total - write,
         "write": write,
+        "write_ratio": write / total if total else 0.0,
+        "cold_accesses": working_set_size,
+        "irg_histogram": _log2_histogram(gaps),
+        "reuse_distance_histogram": reuse_hist,
+        "pages": pages,
+        "page_access_count": counts,
+        "page_write_ratio": page_write_ratio,
+        "dirty_page_fraction": float(np.count_nonzero(writes_per_page)) / working_set_size if working_set_size else 0.0,
+        "top_pages": [(int(pages[i]), int(counts[i])) for i in top],
+        "runs": len(collapse_runs(page_ids, is_writes)[0]),
     }
 
+
+def print_trace_statistics(stats):
+    """把 trace_statistics 的結果印成易讀格式"""
+    print(f"Total: {stats['total']:,}")
+    print(f"Working Set Size: {stats['working_set_size']:,} 頁 ({stats['mem_used_mb']:.2f} MB)")
+    print(f"Write Ratio: {stats['write_ratio']:.1%}")
+    print(f"Dirty Page Fraction: {stats['dirty_page_fraction']:.1%}")
+    if stats['total']:
+        print(f"Runs (連續同一 page 合併後): {stats['runs']:,} ({stats['runs'] / stats['total']:.1%})")
+
+    def show(title, hist):
+        print(title)
+        for b, count in enumerate(hist):
+            if count:
+                print(f"  [{2**b:>10,}, {2**(b+1):>10,}): {count:,}")
+
+    show("Inter-Reference Gap (log2 buckets):", stats['irg_histogram'])
+    if stats['reuse_distance_histogram'] is not None:
+        show("Reuse Distance (log2 buckets):", stats['reuse_distance_histogram'])
+
+    print(f"Top {len(stats['top_pages'])} Pages:")
+    for page_id, count in stats['top_pages']:
+        print(f"  page {page_id}: {count:,}")
+
+
 def main():
     # 測試參數設定
     csv_file_path = "traces_cleaned/valgrind/trace_du.csv"  # 修改為你的 trace 檔案路徑
@@ -63,5 +196,8 @@ def main():
     print("\n=== Result Dictionary ===")
     print(result)
 
+    print("\n=== Detailed Statistics ===")
+    print_trace_statistics(trace_statistics(csv_file_path, page_size_kb, reuse_distance=True))
+
 if __name__ == "__main__":
     main()